@@ -0,0 +1,28 @@
+from contextlib import contextmanager
+
+import pytest
+
+
+@pytest.fixture
+def query_budget():
+    """Бюджет запросов представления::
+
+        with query_budget(3):
+            client.get('/')
+
+    Тест падает со списком повторов и медленных запросов, если их больше.
+    """
+    from core.querywatch import budget
+
+    @contextmanager
+    def check(limit, **kwargs):
+        try:
+            with budget(limit, **kwargs) as watcher:
+                yield watcher
+        except AssertionError as error:
+            report = str(error)
+        else:
+            return
+        pytest.fail(report, pytrace=False)
+
+    return check
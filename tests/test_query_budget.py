@@ -0,0 +1,32 @@
+import pytest
+from django.core.cache import cache
+
+from core.cache import get_cache
+
+pytestmark = [pytest.mark.django_db]
+
+
+@pytest.fixture(autouse=True)
+def clear_caches():
+    cache.clear()
+    get_cache().clear()
+
+
+class TestFeedQueryBudget:
+
+    @pytest.mark.parametrize('url, limit', [
+        ('/', 1),
+        ('/group/test-link/', 3),
+        ('/profile/TestUser/', 3),
+    ])
+    def test_feed_query_budget(self, client, few_posts_with_group,
+                               query_budget, url, limit):
+        with query_budget(limit):
+            response = client.get(url)
+        assert response.status_code == 200
+
+    def test_post_detail_query_budget(self, client, few_posts_with_group,
+                                      query_budget):
+        with query_budget(3):
+            response = client.get(f'/posts/{few_posts_with_group.pk}/')
+        assert response.status_code == 200
@@ -0,0 +1,110 @@
+"""Версии кэша и отдача устаревшего значения на время пересборки.
+
+Каждой ленте соответствует пространство имён с версией — отметкой
+времени последнего изменения. Сигналы моделей сдвигают версию, и ключи,
+собранные с новой версией, сразу перестают совпадать со старыми.
+
+``get_or_build`` хранит значение вместе с версией, под которой оно
+собрано. Когда версия устарела, пересобирает значение только процесс,
+захвативший блокировку, а остальные до конца пересборки отдают старую
+копию (stale-while-revalidate). Исходы обращений (попадание, старая
+копия, промах) считаются по именам в ``cache_stats()``.
+"""
+import threading
+import time
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.core.cache import caches
+
+from core import db_router, metrics
+
+VERSION_PREFIX = 'version:'
+LOCK_SUFFIX = ':lock'
+
+FRESH_TIMEOUT = 60 * 15
+STALE_TIMEOUT = 60 * 60
+LOCK_TIMEOUT = 30
+
+HIT = 'hit'
+STALE = 'stale'
+MISS = 'miss'
+
+_stats = defaultdict(Counter)
+_stats_lock = threading.Lock()
+
+
+def record(name, outcome):
+    with _stats_lock:
+        _stats[name][outcome] += 1
+    metrics.record_cache(outcome)
+
+
+def cache_stats():
+    """Счётчики обращений к кэшу в этом процессе по именам."""
+    with _stats_lock:
+        stats = {name: dict(counter) for name, counter in _stats.items()}
+    for counter in stats.values():
+        total = sum(counter.values())
+        counter['hit_rate'] = (
+            (counter.get(HIT, 0) + counter.get(STALE, 0)) / total
+            if total else 0.0
+        )
+    return stats
+
+
+def get_cache():
+    return caches[settings.FEED_CACHE_ALIAS]
+
+
+def get_versions(namespaces):
+    """Текущие версии пространств имён ``namespaces``."""
+    cache = get_cache()
+    keys = [VERSION_PREFIX + namespace for namespace in namespaces]
+    found = cache.get_many(keys)
+    missing = [key for key in keys if key not in found]
+    if missing:
+        # Версия, вытесненная из кэша, заводится заново: это
+        # равносильно сдвигу версии и никогда не отдаёт старых данных.
+        now = time.time()
+        for key in missing:
+            cache.add(key, now, None)
+        found.update(cache.get_many(missing))
+    return tuple(found.get(key) for key in keys)
+
+
+def bump_versions(*namespaces):
+    """Сдвигает версии: всё, что под ними закэшировано, устаревает."""
+    now = time.time()
+    get_cache().set_many(
+        {VERSION_PREFIX + namespace: now for namespace in namespaces}, None
+    )
+
+
+def get_or_build(key, version, build, timeout=FRESH_TIMEOUT,
+                 stale_timeout=STALE_TIMEOUT, lock_timeout=LOCK_TIMEOUT,
+                 name='default'):
+    """Значение ``key`` для ``version`` из ``get_versions()``, при
+    промахе — ``build()``."""
+    cache = get_cache()
+    entry = cache.get(key)
+    now = time.time()
+    if entry is not None:
+        entry_version, expires, value = entry
+        if entry_version == version and expires > now:
+            record(name, HIT)
+            return value
+        if not cache.add(key + LOCK_SUFFIX, True, lock_timeout):
+            # Значение уже пересобирает другой процесс.
+            record(name, STALE)
+            return value
+    record(name, MISS)
+    value = build()
+    # Отставшая реплика могла собрать значение без изменения, которое
+    # сдвинуло версию: под этой версией его не сохраняем.
+    changed = max(version) if isinstance(version, tuple) and version else None
+    if not db_router.may_lag(changed):
+        cache.set(key, (version, now + timeout, value),
+                  timeout + stale_timeout)
+    cache.delete(key + LOCK_SUFFIX)
+    return value
@@ -0,0 +1,200 @@
+"""Кэш в файле SQLite, общий для всех процессов на одной машине.
+
+В отличие от ``LocMemCache`` прогретый одним воркером кэш виден
+остальным, а в отличие от Redis или memcached не требует внешних
+служб. Файл открывается в режиме WAL: чтения не ждут записей.
+"""
+import os
+import pickle
+import sqlite3
+import threading
+import time
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+# Проверять размер таблицы раз в столько записей.
+CULL_EVERY = 100
+
+
+class SQLiteCache(BaseCache):
+    def __init__(self, location, params):
+        super().__init__(params)
+        self._path = location
+        self._local = threading.local()
+        self._writes = 0
+
+    @property
+    def _db(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            directory = os.path.dirname(self._path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            connection = sqlite3.connect(self._path, timeout=5,
+                                         isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS cache ('
+                'key TEXT PRIMARY KEY, value BLOB NOT NULL, expires REAL)'
+            )
+            connection.execute(
+                'CREATE INDEX IF NOT EXISTS cache_expires ON cache (expires)'
+            )
+            self._local.connection = connection
+        return connection
+
+    def _key(self, key, version):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return key
+
+    def _expires(self, timeout):
+        return self.get_backend_timeout(timeout)
+
+    @staticmethod
+    def _alive():
+        return '(expires IS NULL OR expires > ?)'
+
+    def get(self, key, default=None, version=None):
+        key = self._key(key, version)
+        row = self._db.execute(
+            f'SELECT value FROM cache WHERE key = ? AND {self._alive()}',
+            (key, time.time()),
+        ).fetchone()
+        if row is None:
+            return default
+        return pickle.loads(row[0])
+
+    def get_many(self, keys, version=None):
+        made = {self._key(key, version): key for key in keys}
+        if not made:
+            return {}
+        marks = ','.join('?' * len(made))
+        rows = self._db.execute(
+            f'SELECT key, value FROM cache '
+            f'WHERE key IN ({marks}) AND {self._alive()}',
+            (*made, time.time()),
+        )
+        return {made[key]: pickle.loads(value) for key, value in rows}
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self._db.execute(
+            'INSERT OR REPLACE INTO cache (key, value, expires) '
+            'VALUES (?, ?, ?)',
+            (self._key(key, version), self._dump(value),
+             self._expires(timeout)),
+        )
+        self._maybe_cull(1)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        expires = self._expires(timeout)
+        rows = [(self._key(key, version), self._dump(value), expires)
+                for key, value in data.items()]
+        with self._transaction() as db:
+            db.executemany(
+                'INSERT OR REPLACE INTO cache (key, value, expires) '
+                'VALUES (?, ?, ?)',
+                rows,
+            )
+        self._maybe_cull(len(rows))
+        return []
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        # Вставка удаётся, если ключа нет или его срок уже истёк.
+        cursor = self._db.execute(
+            'INSERT INTO cache (key, value, expires) VALUES (?, ?, ?) '
+            'ON CONFLICT (key) DO UPDATE SET '
+            'value = excluded.value, expires = excluded.expires '
+            'WHERE cache.expires IS NOT NULL AND cache.expires <= ?',
+            (self._key(key, version), self._dump(value),
+             self._expires(timeout), time.time()),
+        )
+        self._maybe_cull(1)
+        return cursor.rowcount == 1
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        cursor = self._db.execute(
+            f'UPDATE cache SET expires = ? WHERE key = ? AND {self._alive()}',
+            (self._expires(timeout), self._key(key, version), time.time()),
+        )
+        return cursor.rowcount == 1
+
+    def incr(self, key, delta=1, version=None):
+        key = self._key(key, version)
+        with self._transaction() as db:
+            row = db.execute(
+                f'SELECT value FROM cache WHERE key = ? AND {self._alive()}',
+                (key, time.time()),
+            ).fetchone()
+            if row is None:
+                raise ValueError(f"Key '{key}' not found")
+            value = pickle.loads(row[0]) + delta
+            db.execute('UPDATE cache SET value = ? WHERE key = ?',
+                       (self._dump(value), key))
+        return value
+
+    def has_key(self, key, version=None):
+        row = self._db.execute(
+            f'SELECT 1 FROM cache WHERE key = ? AND {self._alive()}',
+            (self._key(key, version), time.time()),
+        ).fetchone()
+        return row is not None
+
+    def delete(self, key, version=None):
+        self._db.execute('DELETE FROM cache WHERE key = ?',
+                         (self._key(key, version),))
+
+    def delete_many(self, keys, version=None):
+        with self._transaction() as db:
+            db.executemany('DELETE FROM cache WHERE key = ?',
+                           [(self._key(key, version),) for key in keys])
+
+    def clear(self):
+        self._db.execute('DELETE FROM cache')
+
+    def close(self, **kwargs):
+        # Соединение живёт в потоке воркера и переиспользуется запросами.
+        pass
+
+    @staticmethod
+    def _dump(value):
+        return pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+
+    def _transaction(self):
+        return _Transaction(self._db)
+
+    def _maybe_cull(self, writes):
+        self._writes += writes
+        if self._writes < CULL_EVERY:
+            return
+        self._writes = 0
+        with self._transaction() as db:
+            db.execute('DELETE FROM cache WHERE expires <= ?', (time.time(),))
+            count = db.execute('SELECT COUNT(*) FROM cache').fetchone()[0]
+            if count > self._max_entries:
+                # Как и встроенные бэкенды, удаляем 1/CULL_FREQUENCY
+                # записей, начиная с тех, что истекают раньше.
+                cull = count
+                if self._cull_frequency:
+                    cull = max(count - self._max_entries,
+                               count // self._cull_frequency)
+                db.execute(
+                    'DELETE FROM cache WHERE key IN (SELECT key FROM cache '
+                    'ORDER BY expires IS NULL, expires LIMIT ?)',
+                    (cull,),
+                )
+
+
+class _Transaction:
+    """BEGIN IMMEDIATE … COMMIT на соединении в режиме автофиксации."""
+
+    def __init__(self, db):
+        self.db = db
+
+    def __enter__(self):
+        self.db.execute('BEGIN IMMEDIATE')
+        return self.db
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.db.execute('ROLLBACK' if exc_type else 'COMMIT')
@@ -0,0 +1,46 @@
+"""Сборка ``settings.CACHES`` из названия бэкенда и политик псевдонимов."""
+import os
+
+BACKENDS = {
+    # Свой кэш у каждого процесса: разработка и тесты.
+    'locmem': 'django.core.cache.backends.locmem.LocMemCache',
+    # Общий для процессов кэш без внешних служб.
+    'file': 'django.core.cache.backends.filebased.FileBasedCache',
+    'sqlite': 'core.cache_backends.SQLiteCache',
+    # Redis и совместимые серверы; нужен пакет django-redis.
+    'redis': 'django_redis.cache.RedisCache',
+}
+
+
+def build_caches(backend, location, policies):
+    """Настройки кэшей для ``backend`` с политиками из ``policies``.
+
+    ``policies`` сопоставляет псевдониму кэша срок жизни записей
+    (``TIMEOUT``) и наибольшее число записей (``MAX_ENTRIES``).
+    Псевдонимы делят одно хранилище, но не пересекаются по ключам.
+    """
+    if backend not in BACKENDS:
+        raise ValueError(
+            f'Неизвестный бэкенд кэша {backend!r}, '
+            f'доступны: {", ".join(BACKENDS)}'
+        )
+    caches = {}
+    for alias, policy in policies.items():
+        config = {
+            'BACKEND': BACKENDS[backend],
+            'TIMEOUT': policy['TIMEOUT'],
+            'KEY_PREFIX': alias,
+            'OPTIONS': {'MAX_ENTRIES': policy['MAX_ENTRIES']},
+        }
+        if backend == 'locmem':
+            config['LOCATION'] = alias
+        elif backend == 'file':
+            config['LOCATION'] = os.path.join(location, alias)
+        elif backend == 'sqlite':
+            config['LOCATION'] = os.path.join(location, f'{alias}.sqlite3')
+        else:
+            # У Redis размер ограничивает maxmemory сервера.
+            config['LOCATION'] = location
+            config['OPTIONS'] = {}
+        caches[alias] = config
+    return caches
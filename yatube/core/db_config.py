@@ -0,0 +1,57 @@
+"""Сборка ``settings.DATABASES`` для SQLite по названию профиля."""
+
+PROFILES = {
+    # Настройки SQLite и Django по умолчанию: соединение на каждый запрос.
+    'default': {
+        'CONN_MAX_AGE': 0,
+        'PRAGMAS': {},
+        'IMMEDIATE_TRANSACTIONS': False,
+    },
+    # Несколько процессов и потоков, которые пишут одновременно.
+    'production': {
+        # Соединение живёт между запросами потока.
+        'CONN_MAX_AGE': 600,
+        'PRAGMAS': {
+            # Читатели не ждут писателя и наоборот.
+            'journal_mode': 'WAL',
+            # В WAL достаточно: после сбоя питания теряется лишь
+            # последняя транзакция, но база остаётся целой.
+            'synchronous': 'NORMAL',
+            # Ждать чужую запись до 5 секунд вместо «database is locked».
+            'busy_timeout': 5000,
+            # Кэш страниц 64 МБ (отрицательное — в килобайтах).
+            'cache_size': -64000,
+            'mmap_size': 256 * 1024 * 1024,
+            'temp_store': 'MEMORY',
+        },
+        'IMMEDIATE_TRANSACTIONS': True,
+    },
+}
+
+
+def build_databases(profile, name, replicas=()):
+    """Настройки базы ``name`` для профиля ``profile``.
+
+    ``replicas`` — файлы реплик, псевдонимы ``replica_1``, ``replica_2``...
+    В тестах реплики — зеркала основной базы.
+    """
+    if profile not in PROFILES:
+        raise ValueError(
+            f'Неизвестный профиль базы {profile!r}, '
+            f'доступны: {", ".join(PROFILES)}'
+        )
+    databases = {
+        'default': {
+            # sqlite3 Django с прагмами и BEGIN IMMEDIATE (core.sqlite).
+            'ENGINE': 'core.sqlite',
+            'NAME': name,
+            **PROFILES[profile],
+        },
+    }
+    for number, replica in enumerate(replicas, 1):
+        databases[f'replica_{number}'] = {
+            **databases['default'],
+            'NAME': replica,
+            'TEST': {'MIRROR': 'default'},
+        }
+    return databases
@@ -0,0 +1,132 @@
+"""Чтение из реплик базы для представлений, которые только читают.
+
+Реплики — псевдонимы ``settings.DATABASE_REPLICAS``. Запросы идут в
+реплику лишь внутри представлений с ``@read_replica`` (ленты, страница
+поста, поиск); всё остальное — middleware, формы, команды, потоки
+миниатюр — читает основную базу, где видит собственные записи.
+Пользователи, сессии и типы содержимого читаются из основной базы и в
+этих представлениях: ``request.user`` ленив и впервые нужен шаблону, а
+посетитель, заведённый недавно, не должен оказаться анонимом.
+
+Реплика отстаёт от основной базы. Чтобы автор после ``add_comment``
+увидел свой комментарий на странице, куда его перенаправили,
+``ReplicaPinMiddleware`` после любого запроса с записью ставит cookie,
+и ``REPLICA_PIN_SECONDS`` секунд запросы этого посетителя читают
+основную базу. Запись внутри ``@read_replica`` закрепляет за основной
+базой и остаток запроса.
+
+Другие посетители могут прочитать из отставшей реплики ленту без
+нового поста. Чтобы такая лента не легла в кэш под новой версией,
+``core.cache`` не сохраняет фрагменты запроса, читавшего реплику, если
+версия моложе ``REPLICA_PIN_SECONDS``: предполагается, что реплики
+отстают меньше.
+"""
+import random
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+from django.conf import settings
+
+PRIMARY = 'default'
+PIN_COOKIE = 'primary_until'
+PRIMARY_APPS = {'auth', 'contenttypes', 'sessions'}
+
+_local = threading.local()
+
+
+def replicas():
+    return getattr(settings, 'DATABASE_REPLICAS', ())
+
+
+def is_pinned():
+    return getattr(_local, 'pinned', False)
+
+
+def pin():
+    """Дальше в этом потоке читать основную базу."""
+    _local.pinned = True
+
+
+def may_lag(changed=None):
+    """Читал ли поток реплику, которая могла не застать изменение
+    в момент ``changed`` (отметка ``time.time()``; ``None`` — любое)."""
+    if not getattr(_local, 'used_replica', False):
+        return False
+    return (changed is None
+            or changed > time.time() - settings.REPLICA_PIN_SECONDS)
+
+
+@contextmanager
+def reading_replicas():
+    """Чтение из реплик внутри блока, если поток не закреплён."""
+    previous = getattr(_local, 'reading', False)
+    _local.reading = True
+    try:
+        yield
+    finally:
+        _local.reading = previous
+
+
+def read_replica(view):
+    """Представление читает из реплики."""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        with reading_replicas():
+            return view(request, *args, **kwargs)
+    return wrapper
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        aliases = replicas()
+        if (not aliases or model._meta.app_label in PRIMARY_APPS
+                or not getattr(_local, 'reading', False) or is_pinned()):
+            return PRIMARY
+        _local.used_replica = True
+        return random.choice(aliases)
+
+    def db_for_write(self, model, **hints):
+        # Прочитать только что записанное можно лишь в основной базе.
+        _local.wrote = True
+        pin()
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {PRIMARY, *replicas()}
+        if {obj1._state.db, obj2._state.db} <= databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, **hints):
+        # Схему реплики получают копированием основной базы.
+        return db not in replicas()
+
+
+class ReplicaPinMiddleware:
+    """Закрепляет посетителя за основной базой после его записи."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        _local.wrote = _local.used_replica = False
+        _local.pinned = self.pinned_by_cookie(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            wrote = _local.wrote
+            _local.wrote = _local.pinned = _local.used_replica = False
+        if wrote and replicas():
+            seconds = settings.REPLICA_PIN_SECONDS
+            response.set_cookie(PIN_COOKIE, str(int(time.time() + seconds)),
+                                max_age=seconds, httponly=True,
+                                samesite='Lax')
+        return response
+
+    def pinned_by_cookie(self, request):
+        try:
+            return float(request.COOKIES.get(PIN_COOKIE, 0)) > time.time()
+        except ValueError:
+            return False
@@ -0,0 +1,101 @@
+import json
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from itertools import islice
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from core import replay
+
+MODES = {'threads': ThreadPoolExecutor, 'processes': ProcessPoolExecutor}
+
+
+class Command(BaseCommand):
+    help = ('Воспроизводит журнал запросов в приложении этого процесса '
+            'или на запущенном сервере.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Журнал или «-» для stdin.')
+        parser.add_argument('--url',
+                            help='Адрес сервера, например '
+                                 'http://127.0.0.1:8000; по умолчанию '
+                                 'запросы идут в yatube.wsgi.application.')
+        parser.add_argument('--concurrency', type=int, default=1)
+        parser.add_argument('--mode', choices=MODES, default='threads')
+        parser.add_argument('--think-time', type=float, default=0,
+                            help='Средняя пауза между запросами одного '
+                                 'потока, секунды.')
+        parser.add_argument('--include-writes', action='store_true',
+                            help='Воспроизводить и POST: они меняют базу.')
+        parser.add_argument('--limit', type=int,
+                            help='Не больше стольких запросов.')
+        parser.add_argument('--seed', type=int)
+        parser.add_argument('--output', help='Записать сводку в JSON.')
+
+    def handle(self, *args, **options):
+        concurrency = options['concurrency']
+        if concurrency < 1:
+            raise CommandError('--concurrency должен быть больше нуля.')
+        try:
+            if options['path'] == '-':
+                records = self.select(sys.stdin, options)
+            else:
+                with open(options['path'], encoding='utf-8') as stream:
+                    records = self.select(stream, options)
+        except OSError as error:
+            raise CommandError(error)
+        if not records:
+            raise CommandError('В журнале нет запросов для воспроизведения.')
+
+        seeds = [None if options['seed'] is None else options['seed'] + number
+                 for number in range(concurrency)]
+        started = time.perf_counter()
+        if concurrency == 1:
+            results = replay.worker(records, options['url'],
+                                    options['think_time'], seeds[0])
+        else:
+            # Дочерние процессы не должны унаследовать открытые соединения.
+            connections.close_all()
+            with MODES[options['mode']](max_workers=concurrency) as executor:
+                futures = [
+                    executor.submit(
+                        replay.worker, records[number::concurrency],
+                        options['url'], options['think_time'], seeds[number],
+                    )
+                    for number in range(concurrency)
+                ]
+                results = [item for future in futures
+                           for item in future.result()]
+        summary = replay.summarize(results, time.perf_counter() - started)
+        summary['concurrency'] = concurrency
+        summary['mode'] = options['mode']
+        summary['target'] = options['url'] or 'wsgi'
+
+        self.write_table(summary)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as stream:
+                json.dump(summary, stream, ensure_ascii=False, indent=2)
+
+    def select(self, stream, options):
+        records = (
+            record for record in replay.read_log(stream)
+            if options['include_writes']
+            or record['method'] in replay.SAFE_METHODS
+        )
+        return list(islice(records, options['limit']))
+
+    def write_table(self, summary):
+        columns = ('requests', 'p50_ms', 'p95_ms', 'p99_ms', 'error_rate',
+                   'client_error_rate')
+        self.stdout.write(f'{"":<28}' + ''.join(
+            f'{name:>18}' for name in columns
+        ))
+        for name, row in summary['routes'].items():
+            self.stdout.write(f'{name:<28}' + ''.join(
+                f'{row[column]:>18}' for column in columns
+            ))
+        self.stdout.write(f'Всего {summary["requests"]} запросов за '
+                          f'{summary["elapsed"]} с, '
+                          f'{summary["rps"]} в секунду')
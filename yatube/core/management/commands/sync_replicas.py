@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from core.db_router import PRIMARY, replicas
+
+
+class Command(BaseCommand):
+    help = ('Копирует основную базу SQLite в файлы реплик: локальная '
+            'замена репликации для разработки и замеров.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('aliases', nargs='*',
+                            help='Только эти реплики.')
+
+    def handle(self, *args, **options):
+        aliases = options['aliases'] or replicas()
+        unknown = set(aliases) - set(replicas())
+        if unknown:
+            raise CommandError(f'Не реплики: {", ".join(unknown)}')
+        if not aliases:
+            raise CommandError('Реплики не настроены: YATUBE_DB_REPLICAS.')
+        primary = connections[PRIMARY]
+        primary.ensure_connection()
+        for alias in aliases:
+            replica = connections[alias]
+            replica.ensure_connection()
+            # Онлайн-копия SQLite: согласованный снимок без остановки записи.
+            primary.connection.backup(replica.connection)
+            self.stdout.write(f'{alias}: {replica.settings_dict["NAME"]}')
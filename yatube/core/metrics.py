@@ -0,0 +1,213 @@
+"""Метрики производительности запросов в памяти процесса.
+
+``RequestMetrics`` собирает время одного запроса по частям: запросы к
+базе, отрисовку шаблонов, обращения к кэшу и фоновые задачи вроде
+построения миниатюр. По завершении запроса ``MetricsMiddleware`` кладёт
+их в гистограммы по имени представления (``posts:index``...), а
+``render_prometheus()`` отдаёт гистограммы в текстовом формате
+Prometheus. Гистограммы у каждого процесса свои.
+"""
+import math
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+
+# Границы корзин: секунды и число запросов к базе.
+SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+QUERY_BUCKETS = (1, 2, 3, 5, 10, 20, 50, 100)
+
+_local = threading.local()
+
+
+class RequestMetrics:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_time = 0.0
+        self.template_time = 0.0
+        self.cache = Counter()
+        self.tasks = defaultdict(float)
+
+    @property
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    def execute_wrapper(self, execute, sql, params, many, context):
+        """Обёртка ``connection.execute_wrapper``: число и время запросов."""
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.db_time += time.perf_counter() - started
+
+    def server_timing(self, total):
+        """Значение заголовка ``Server-Timing``."""
+        parts = [
+            f'total;dur={total * 1000:.1f}',
+            f'db;dur={self.db_time * 1000:.1f};desc="{self.queries} queries"',
+            f'tpl;dur={self.template_time * 1000:.1f}',
+        ]
+        if self.cache:
+            outcomes = ' '.join(f'{outcome}={count}' for outcome, count
+                                in sorted(self.cache.items()))
+            parts.append(f'cache;desc="{outcomes}"')
+        parts += [f'{name};dur={seconds * 1000:.1f}'
+                  for name, seconds in sorted(self.tasks.items())]
+        return ', '.join(parts)
+
+
+def current():
+    """Метрики запроса, который обрабатывает этот поток, или ``None``."""
+    return getattr(_local, 'metrics', None)
+
+
+def start():
+    _local.metrics = RequestMetrics()
+    return _local.metrics
+
+
+def finish():
+    _local.metrics = None
+
+
+def record_cache(outcome):
+    metrics = current()
+    if metrics is not None:
+        metrics.cache[outcome] += 1
+
+
+def record_template(seconds):
+    metrics = current()
+    if metrics is not None:
+        metrics.template_time += seconds
+
+
+@contextmanager
+def timer(task):
+    """Замеряет задачу: в гистограмму задач и в текущий запрос, если он
+    есть (в пуле потоков запроса нет)."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - started
+        registry.observe('yatube_task_seconds', {'task': task}, seconds,
+                         SECONDS_BUCKETS)
+        metrics = current()
+        if metrics is not None:
+            metrics.tasks[task] += seconds
+
+
+def percentile(values, percent):
+    """Перцентиль по ближайшему рангу."""
+    ordered = sorted(values)
+    if not ordered:
+        return 0
+    index = max(math.ceil(percent / 100 * len(ordered)) - 1, 0)
+    return ordered[index]
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Registry:
+    """Гистограммы и счётчики с метками, общие для потоков процесса."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms = {}
+        self._counters = Counter()
+        self._help = {}
+
+    def observe(self, name, labels, value, buckets):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(buckets)
+            histogram.observe(value)
+
+    def increment(self, name, labels, amount=1):
+        with self._lock:
+            self._counters[(name, tuple(sorted(labels.items())))] += amount
+
+    def observe_request(self, view, metrics, total):
+        labels = {'view': view}
+        self.observe('yatube_request_seconds', labels, total,
+                     SECONDS_BUCKETS)
+        self.observe('yatube_request_db_seconds', labels, metrics.db_time,
+                     SECONDS_BUCKETS)
+        self.observe('yatube_request_db_queries', labels, metrics.queries,
+                     QUERY_BUCKETS)
+        self.observe('yatube_request_template_seconds', labels,
+                     metrics.template_time, SECONDS_BUCKETS)
+        for outcome, count in metrics.cache.items():
+            self.increment('yatube_request_cache_total',
+                           {'view': view, 'outcome': outcome}, count)
+
+    def clear(self):
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+
+    def render_prometheus(self):
+        """Текстовый формат Prometheus (exposition format 0.0.4)."""
+        with self._lock:
+            histograms = sorted(self._histograms.items())
+            counters = sorted(self._counters.items())
+        lines = []
+        typed = set()
+        for (name, labels), histogram in histograms:
+            if name not in typed:
+                typed.add(name)
+                lines.append(f'# TYPE {name} histogram')
+            cumulative = 0
+            bounds = [*map(_number, histogram.buckets), '+Inf']
+            for bound, count in zip(bounds, histogram.counts):
+                cumulative += count
+                lines.append(f'{name}_bucket'
+                             f'{_labels(labels, le=bound)} {cumulative}')
+            lines.append(f'{name}_sum{_labels(labels)} '
+                         f'{_number(histogram.sum)}')
+            lines.append(f'{name}_count{_labels(labels)} {histogram.count}')
+        for (name, labels), value in counters:
+            if name not in typed:
+                typed.add(name)
+                lines.append(f'# TYPE {name} counter')
+            lines.append(f'{name}{_labels(labels)} {value}')
+        return '\n'.join(lines) + '\n'
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _labels(labels, **extra):
+    pairs = [*labels, *extra.items()]
+    if not pairs:
+        return ''
+    inner = ','.join(
+        f'{key}="{_escape(value)}"' for key, value in pairs
+    )
+    return '{' + inner + '}'
+
+
+def _escape(value):
+    return (str(value).replace('\\', r'\\').replace('"', r'\"')
+            .replace('\n', r'\n'))
+
+
+registry = Registry()
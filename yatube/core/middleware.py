@@ -0,0 +1,60 @@
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+from core import metrics, querywatch
+
+
+class MetricsMiddleware:
+    """Замеряет запрос целиком и по частям.
+
+    Пишет заголовок ``Server-Timing`` (видно в инструментах браузера) и
+    гистограммы по имени представления для ``/metrics/``. Стоит первым в
+    ``MIDDLEWARE``, чтобы замер включал остальные middleware.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        current = metrics.start()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(
+                        connection.execute_wrapper(current.execute_wrapper)
+                    )
+                response = self.get_response(request)
+        finally:
+            metrics.finish()
+        total = current.elapsed
+        match = request.resolver_match
+        view = match.view_name if match else 'unresolved'
+        metrics.registry.observe_request(view, current, total)
+        response['Server-Timing'] = current.server_timing(total)
+        return response
+
+
+class QueryWatchMiddleware:
+    """Пишет в журнал повторяющиеся и медленные запросы каждой страницы.
+
+    Включается настройкой ``QUERY_WATCH``; порог медленного запроса —
+    ``QUERY_WATCH_SLOW_MS``.
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'QUERY_WATCH', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.slow_ms = getattr(settings, 'QUERY_WATCH_SLOW_MS',
+                               querywatch.SLOW_QUERY_MS)
+
+    def __call__(self, request):
+        with querywatch.watch(self.slow_ms) as watcher:
+            response = self.get_response(request)
+        match = request.resolver_match
+        view = match.view_name if match else request.path
+        querywatch.log(f'{request.method} {view}', watcher)
+        return response
@@ -0,0 +1,159 @@
+import base64
+import json
+
+from django.core.exceptions import ValidationError
+from django.core.paginator import Page, Paginator
+from django.db.models import Q
+
+POSTS_PER_PAGE = 10
+
+CURSOR_PARAM = 'cursor'
+PAGE_PARAM = 'page'
+
+NEXT = 'n'
+PREVIOUS = 'p'
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+class CursorPaginator(Paginator):
+    """Постраничная навигация по ключу вместо OFFSET и COUNT(*).
+
+    Записи упорядочены по убыванию ``fields`` — полей модели или
+    аннотаций выборки (последнее поле должно быть уникальным), а
+    следующая страница выбирается условием «строго меньше курсора»,
+    поэтому стоимость запроса не зависит от глубины страницы.
+    Курсор — непрозрачный токен с ключом граничной записи, номером
+    страницы и направлением перехода.
+    """
+
+    def __init__(self, object_list, per_page, fields=('pub_date', 'pk')):
+        super().__init__(object_list, per_page)
+        self.fields = tuple(fields)
+        self._num_pages = 1
+
+    @property
+    def num_pages(self):
+        # Общее число страниц не считаем: известно лишь, есть ли следующая.
+        return self._num_pages
+
+    def get_page(self, number=None, cursor=None):
+        if cursor:
+            try:
+                return self.page_for_cursor(cursor)
+            except InvalidCursor:
+                pass
+        return self.page_for_number(number)
+
+    def page_for_number(self, number):
+        """Страница по номеру из старых ссылок ``?page=``."""
+        try:
+            number = int(number)
+        except (TypeError, ValueError):
+            number = 1
+        number = max(number, 1)
+        rows = self._rows(descending=True, limit=self.per_page + 1,
+                          offset=(number - 1) * self.per_page)
+        if not rows and number > 1:
+            return self.page_for_number(1)
+        return self._build_page(rows, number)
+
+    def page_for_cursor(self, cursor):
+        values, number, direction = self.decode_cursor(cursor)
+        if direction == NEXT:
+            rows = self._rows(descending=True, limit=self.per_page + 1,
+                              after=values)
+            return self._build_page(rows, number)
+        rows = self._rows(descending=False, limit=self.per_page + 1,
+                          after=values)
+        if len(rows) <= self.per_page:
+            # Выше курсора осталась неполная страница: это начало ленты.
+            return self.page_for_number(1)
+        rows = rows[:self.per_page]
+        rows.reverse()
+        return self._build_page(rows, max(number, 2), has_next=True)
+
+    def encode_cursor(self, obj, number, direction):
+        values = [self._dump(getattr(obj, name)) for name in self.fields]
+        raw = json.dumps([values, number, direction], separators=(',', ':'))
+        token = base64.urlsafe_b64encode(raw.encode())
+        return token.decode().rstrip('=')
+
+    def decode_cursor(self, cursor):
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            raw = base64.urlsafe_b64decode(padded.encode())
+            values, number, direction = json.loads(raw.decode())
+            if (len(values) != len(self.fields)
+                    or direction not in (NEXT, PREVIOUS)
+                    or int(number) < 1):
+                raise ValueError(cursor)
+            values = [
+                self._get_field(name).to_python(value)
+                for name, value in zip(self.fields, values)
+            ]
+        except (ValueError, TypeError, ValidationError):
+            raise InvalidCursor(cursor)
+        return values, int(number), direction
+
+    def _build_page(self, rows, number, has_next=None):
+        if has_next is None:
+            has_next = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        self._num_pages = number + 1 if has_next else number
+        page = Page(rows, number, self)
+        page.next_cursor = None
+        page.previous_cursor = None
+        if rows and has_next:
+            page.next_cursor = self.encode_cursor(rows[-1], number + 1, NEXT)
+        if rows and number > 1:
+            page.previous_cursor = self.encode_cursor(
+                rows[0], number - 1, PREVIOUS
+            )
+        return page
+
+    def _rows(self, descending, limit, offset=0, after=None):
+        """Строки страницы; ``after`` — ключ, строго за которым они идут."""
+        rows = self._ordered(descending)
+        if after is not None:
+            lookup = 'lt' if descending else 'gt'
+            rows = rows.filter(self._keyset(after, lookup))
+        return list(rows[offset:offset + limit])
+
+    def _ordered(self, descending):
+        prefix = '-' if descending else ''
+        return self.object_list.order_by(
+            *(prefix + name for name in self.fields)
+        )
+
+    def _keyset(self, values, lookup):
+        """(a, b) < (A, B) в виде a < A OR (a = A AND b < B)."""
+        condition = Q()
+        for index, name in enumerate(self.fields):
+            exact = dict(zip(self.fields[:index], values[:index]))
+            exact[f'{name}__{lookup}'] = values[index]
+            condition |= Q(**exact)
+        return condition
+
+    def _get_field(self, name):
+        annotation = self.object_list.query.annotations.get(name)
+        if annotation is not None:
+            return annotation.output_field
+        opts = self.object_list.model._meta
+        return opts.pk if name == 'pk' else opts.get_field(name)
+
+    @staticmethod
+    def _dump(value):
+        if hasattr(value, 'isoformat'):
+            return value.isoformat()
+        return value
+
+
+def paginate(request, queryset, per_page=POSTS_PER_PAGE, **kwargs):
+    """Возвращает страницу ``queryset`` по параметрам запроса."""
+    paginator = CursorPaginator(queryset, per_page, **kwargs)
+    return paginator.get_page(
+        request.GET.get(PAGE_PARAM), request.GET.get(CURSOR_PARAM)
+    )
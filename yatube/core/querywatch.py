@@ -0,0 +1,158 @@
+"""Поиск медленных и повторяющихся запросов к базе.
+
+``QueryWatcher`` подключается через ``connection.execute_wrapper`` и
+сводит запросы к отпечаткам: SQL без значений, так что
+``... WHERE id = 1`` и ``... WHERE id = 2`` — один отпечаток. Один и тот
+же отпечаток несколько раз за запрос — почти всегда N+1: например, автор,
+загруженный отдельно для каждого поста ленты.
+
+Для повторов и медленных запросов запоминается, откуда они: строка
+шаблона, если запрос сделан при отрисовке, и ближайший кадр кода проекта.
+Обход стека дорогой, поэтому ``QueryWatchMiddleware`` работает только
+при ``QUERY_WATCH = True`` — на отладке и на стенде, не в бою.
+"""
+import logging
+import os
+import re
+import sys
+import time
+from collections import OrderedDict
+from contextlib import ExitStack, contextmanager
+
+from django.db import connections
+from django.template.base import Node
+
+logger = logging.getLogger(__name__)
+
+SLOW_QUERY_MS = 100
+
+# Значения в SQL: строки, числа, списки параметров IN (...).
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+_IN_LIST = re.compile(r'\bIN \((?:\s*(?:%s|\?)\s*,?)+\)', re.IGNORECASE)
+_SPACES = re.compile(r'\s+')
+
+_PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_SKIP_DIRS = (os.path.dirname(os.path.abspath(__file__)) + os.sep,)
+
+
+def fingerprint(sql):
+    """SQL без значений: запросы, которые отличаются только параметрами,
+    получают один отпечаток."""
+    sql = _STRING.sub('?', sql)
+    sql = _NUMBER.sub('?', sql)
+    sql = sql.replace('%s', '?')
+    sql = _IN_LIST.sub('IN (...)', sql)
+    return _SPACES.sub(' ', sql).strip()
+
+
+def origin():
+    """Откуда сделан запрос: строка шаблона и кадр кода проекта."""
+    template = code = None
+    frame = sys._getframe(1)
+    while frame is not None and (template is None or code is None):
+        node = frame.f_locals.get('self')
+        if template is None and isinstance(node, Node):
+            token = getattr(node, 'token', None)
+            source = getattr(node, 'origin', None)
+            name = source and (source.template_name or source.name)
+            if token is not None and name:
+                template = f'{name}:{token.lineno}'
+        filename = os.path.abspath(frame.f_code.co_filename)
+        if (code is None and filename.startswith(_PROJECT_DIR)
+                and not filename.startswith(_SKIP_DIRS)):
+            code = (f'{os.path.relpath(filename, _PROJECT_DIR)}:'
+                    f'{frame.f_lineno} in {frame.f_code.co_name}')
+        frame = frame.f_back
+    return ' ← '.join(part for part in (template, code) if part) or '?'
+
+
+class QueryStat:
+    def __init__(self, sql):
+        self.sql = sql
+        self.count = 0
+        self.seconds = 0.0
+        self.origins = []
+
+
+class QueryWatcher:
+    """Отпечатки запросов одного запроса или одного теста."""
+
+    def __init__(self, slow_ms=SLOW_QUERY_MS):
+        self.slow = slow_ms / 1000
+        self.stats = OrderedDict()
+        self.slow_queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            seconds = time.perf_counter() - started
+            self._record(sql, seconds)
+
+    def _record(self, sql, seconds):
+        key = fingerprint(sql)
+        stat = self.stats.get(key)
+        if stat is None:
+            stat = self.stats[key] = QueryStat(key)
+        stat.count += 1
+        stat.seconds += seconds
+        where = None
+        # Стек обходится только ради повторов и медленных запросов.
+        if stat.count > 1:
+            where = origin()
+            stat.origins.append(where)
+        if seconds >= self.slow:
+            self.slow_queries.append(
+                (sql, seconds, where or origin())
+            )
+
+    @property
+    def count(self):
+        return sum(stat.count for stat in self.stats.values())
+
+    @property
+    def duplicates(self):
+        return [stat for stat in self.stats.values() if stat.count > 1]
+
+    def report(self):
+        """Сводка для журнала и сообщения об ошибке теста."""
+        lines = [f'{self.count} запросов, '
+                 f'{len(self.stats)} разных']
+        for stat in self.duplicates:
+            lines.append(f'  ×{stat.count} {stat.sql}')
+            for where in sorted(set(stat.origins)):
+                lines.append(f'      {where}')
+        for sql, seconds, where in self.slow_queries:
+            lines.append(f'  {seconds * 1000:.0f} мс {sql}')
+            lines.append(f'      {where}')
+        return '\n'.join(lines)
+
+
+@contextmanager
+def watch(slow_ms=SLOW_QUERY_MS):
+    """Следит за запросами всех подключений внутри блока."""
+    watcher = QueryWatcher(slow_ms)
+    with ExitStack() as stack:
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(watcher))
+        yield watcher
+
+
+def log(label, watcher):
+    """Пишет повторы и медленные запросы в журнал ``core.querywatch``."""
+    if watcher.duplicates or watcher.slow_queries:
+        logger.warning('%s: %s', label, watcher.report())
+
+
+@contextmanager
+def budget(limit, slow_ms=SLOW_QUERY_MS):
+    """Падает с ``AssertionError`` и сводкой, если запросов внутри блока
+    больше ``limit``."""
+    with watch(slow_ms) as watcher:
+        yield watcher
+    if watcher.count > limit:
+        raise AssertionError(
+            f'Бюджет {limit} запросов превышен: {watcher.report()}'
+        )
@@ -0,0 +1,251 @@
+"""Воспроизведение записанных запросов для оценки нагрузки.
+
+Журнал — строки JSONL::
+
+    {"method": "GET", "path": "/profile/leo/?page=2", "user": "anna"}
+    {"method": "POST", "path": "/posts/5/comment", "user": "anna",
+     "data": {"text": "..."}}
+
+или журнал доступа nginx/Apache в формате common/combined: из него
+берутся метод, путь и имя пользователя (``%u``), если оно есть.
+
+Запросы идут либо прямо в ``yatube.wsgi.application`` в этом процессе,
+либо на запущенный сервер по ``base_url``. Запросы пользователя из
+журнала отправляются с cookie его сессии, которую ``Sessions`` заводит
+так же, как ``Client.force_login``; для записи (POST) добавляется токен
+CSRF. Сервер должен работать с той же базой, иначе сессии не найдутся.
+"""
+import io
+import json
+import random
+import re
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import defaultdict
+from urllib.parse import urlencode, urlsplit
+from wsgiref.util import setup_testing_defaults
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connections
+from django.http import HttpRequest
+from django.middleware.csrf import get_token
+from django.test import Client
+from django.urls import Resolver404, resolve
+
+from core.metrics import percentile
+
+PERCENTILES = (50, 95, 99)
+SAFE_METHODS = ('GET', 'HEAD')
+UNRESOLVED = 'unresolved'
+
+_ACCESS_LOG = re.compile(
+    r'^\S+ \S+ (?P<user>\S+) \[[^\]]+\] '
+    r'"(?P<method>[A-Z]+) (?P<path>\S+)[^"]*" (?P<status>\d{3})'
+)
+
+
+def read_log(stream):
+    """Записи журнала по одной; строки, которые не разобрать, пропускаются."""
+    for line in stream:
+        line = line.strip()
+        if not line:
+            continue
+        if line.startswith('{'):
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if isinstance(record, dict) and record.get('path'):
+                yield {
+                    'method': record.get('method', 'GET').upper(),
+                    'path': record['path'],
+                    'user': record.get('user') or None,
+                    'data': record.get('data') or {},
+                }
+            continue
+        match = _ACCESS_LOG.match(line)
+        if match:
+            user = match.group('user')
+            yield {
+                'method': match.group('method'),
+                'path': match.group('path'),
+                'user': None if user == '-' else user,
+                'data': {},
+            }
+
+
+def route(path):
+    """Имя маршрута для сводки: ``posts:profile``, а не каждый адрес."""
+    try:
+        return resolve(urlsplit(path).path).view_name
+    except Resolver404:
+        return UNRESOLVED
+
+
+class Sessions:
+    """Cookie сессий пользователей журнала, заведённые по одной на имя."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._cookies = {}
+
+    def cookies(self, username):
+        """Cookie сессии и CSRF или ``None``, если пользователя нет."""
+        with self._lock:
+            if username not in self._cookies:
+                self._cookies[username] = self._login(username)
+            return self._cookies[username]
+
+    def _login(self, username):
+        user = get_user_model().objects.filter(username=username).first()
+        if user is None:
+            return None
+        client = Client()
+        client.force_login(user)
+        request = HttpRequest()
+        token = get_token(request)
+        return {
+            settings.SESSION_COOKIE_NAME:
+                client.cookies[settings.SESSION_COOKIE_NAME].value,
+            settings.CSRF_COOKIE_NAME: request.META['CSRF_COOKIE'],
+            'csrf_token': token,
+        }
+
+
+def _headers(record, sessions):
+    cookies = sessions.cookies(record['user']) if record['user'] else None
+    headers = {}
+    if cookies:
+        headers['Cookie'] = '; '.join(
+            f'{name}={value}' for name, value in cookies.items()
+            if name != 'csrf_token'
+        )
+        headers['X-CSRFToken'] = cookies['csrf_token']
+    return headers
+
+
+def call_wsgi(application, record, headers):
+    """Запрос прямо в WSGI-приложение; возвращает код ответа."""
+    parts = urlsplit(record['path'])
+    body = urlencode(record['data'], doseq=True).encode()
+    environ = {
+        'REQUEST_METHOD': record['method'],
+        'PATH_INFO': parts.path,
+        'QUERY_STRING': parts.query,
+        'CONTENT_TYPE': 'application/x-www-form-urlencoded',
+        'CONTENT_LENGTH': str(len(body)),
+        'wsgi.input': io.BytesIO(body),
+    }
+    for name, value in headers.items():
+        environ['HTTP_' + name.upper().replace('-', '_')] = value
+    setup_testing_defaults(environ)
+    status = []
+
+    def start_response(value, response_headers, exc_info=None):
+        status.append(value)
+
+    response = application(environ, start_response)
+    try:
+        for _ in response:
+            pass
+    finally:
+        if hasattr(response, 'close'):
+            response.close()
+    return int(status[0].split()[0])
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    # Переход по редиректу — уже другой запрос журнала.
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+_opener = urllib.request.build_opener(_NoRedirect)
+
+
+def call_http(base_url, record, headers):
+    """Запрос на запущенный сервер; возвращает код ответа."""
+    data = None
+    if record['method'] not in SAFE_METHODS:
+        data = urlencode(record['data'], doseq=True).encode()
+        headers = {**headers,
+                   'Content-Type': 'application/x-www-form-urlencoded',
+                   'Referer': base_url}
+    request = urllib.request.Request(
+        base_url.rstrip('/') + record['path'], data=data, headers=headers,
+        method=record['method'],
+    )
+    try:
+        with _opener.open(request) as response:
+            response.read()
+            return response.status
+    except urllib.error.HTTPError as error:
+        return error.code
+
+
+def replay(records, send, sessions, think_time=0, seed=None):
+    """Отправляет записи по очереди с паузами «на раздумье» и возвращает
+    ``(маршрут, код ответа, секунды)`` для каждой. Пауза случайная,
+    в среднем ``think_time`` секунд."""
+    rng = random.Random(seed)
+    results = []
+    for record in records:
+        headers = _headers(record, sessions)
+        started = time.perf_counter()
+        try:
+            status = send(record, headers)
+        except OSError:
+            status = 0
+        results.append((route(record['path']), status,
+                        time.perf_counter() - started))
+        if think_time:
+            time.sleep(rng.expovariate(1 / think_time))
+    return results
+
+
+def worker(records, base_url=None, think_time=0, seed=None):
+    """Один поток или процесс нагрузки: свои сессии, свои соединения."""
+    sessions = Sessions()
+    if base_url:
+        def send(record, headers):
+            return call_http(base_url, record, headers)
+    else:
+        from yatube.wsgi import application
+
+        def send(record, headers):
+            return call_wsgi(application, record, headers)
+    try:
+        return replay(records, send, sessions, think_time, seed)
+    finally:
+        connections.close_all()
+
+
+def summarize(results, elapsed):
+    """Распределение задержек и доля ошибок по маршрутам."""
+    by_route = defaultdict(list)
+    for name, status, seconds in results:
+        by_route[name].append((status, seconds))
+    summary = {}
+    for name, items in sorted(by_route.items()):
+        latencies = [seconds for _, seconds in items]
+        errors = sum(1 for status, _ in items
+                     if status == 0 or status >= 500)
+        client_errors = sum(1 for status, _ in items if 400 <= status < 500)
+        summary[name] = {
+            'requests': len(items),
+            'error_rate': round(errors / len(items), 4),
+            'client_error_rate': round(client_errors / len(items), 4),
+            **{f'p{percent}_ms': round(percentile(latencies, percent)
+                                       * 1000, 3)
+               for percent in PERCENTILES},
+            'mean_ms': round(sum(latencies) / len(latencies) * 1000, 3),
+        }
+    return {
+        'requests': len(results),
+        'elapsed': round(elapsed, 3),
+        'rps': round(len(results) / elapsed, 1) if elapsed else 0,
+        'routes': summary,
+    }
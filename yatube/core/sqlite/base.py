@@ -0,0 +1,30 @@
+"""SQLite с настройками соединения из ``DATABASES``.
+
+Ключи настроек базы сверх стандартных:
+
+``PRAGMAS`` — прагмы, которые выполняются на каждом новом соединении
+(``journal_mode``, ``synchronous``, ``busy_timeout``...);
+
+``IMMEDIATE_TRANSACTIONS`` — открывать ``atomic()`` через ``BEGIN
+IMMEDIATE``. Обычный ``BEGIN`` берёт блокировку записи только на первой
+записи, и если её уже держит другое соединение, SQLite сразу отвечает
+``database is locked``, не дожидаясь ``busy_timeout``. ``IMMEDIATE``
+берёт блокировку в начале транзакции, где ожидание работает.
+"""
+from django.db.backends.sqlite3 import base
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def init_connection_state(self):
+        super().init_connection_state()
+        pragmas = self.settings_dict.get('PRAGMAS') or {}
+        if not pragmas:
+            return
+        for name, value in pragmas.items():
+            self.connection.execute(f'PRAGMA {name} = {value}')
+
+    def _start_transaction_under_autocommit(self):
+        if self.settings_dict.get('IMMEDIATE_TRANSACTIONS'):
+            self.cursor().execute('BEGIN IMMEDIATE')
+        else:
+            super()._start_transaction_under_autocommit()
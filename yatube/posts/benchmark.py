@@ -0,0 +1,361 @@
+"""Замер скорости лент и страницы поста на синтетических данных.
+
+``seed()`` наполняет пустую базу: пользователи, группы, посты с
+картинками и без, комментарии и подписки. Число подписчиков авторов
+распределено по степенному закону (закон Ципфа): у немногих авторов
+подписчиков много, у большинства — единицы; посты пишут так же.
+Посты и комментарии загружает ``Importer``, поэтому счётчики, «входящие»
+лент и варианты картинок готовы так же, как после настоящего импорта.
+
+``run()`` открывает страницы тестовым клиентом — через все middleware и
+шаблоны — и считает задержку, число запросов к базе и пропускную
+способность для каждого представления. ``db_workload()`` нагружает
+саму базу: потоки читают ленту и пишут комментарии одновременно.
+
+Всё это делается внутри ``isolated()``, в отдельной базе.
+"""
+import datetime
+import io
+import random
+import shutil
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import (OperationalError, close_old_connections, connection,
+                       connections, transaction)
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+
+from core.cache_config import build_caches
+from core.db_config import PROFILES
+from core.metrics import percentile
+from core.paginator import POSTS_PER_PAGE
+
+from . import counters, timeline
+from .importer import Importer
+from .models import Comment, Follow, Group, Post, User
+
+VIEWS = ('index', 'group_posts', 'profile', 'follow_index', 'post_detail')
+PERCENTILES = (50, 95, 99)
+IMAGES = 8
+READERS = 20
+WORDS = (
+    'лето', 'город', 'кот', 'утро', 'море', 'дорога', 'книга', 'чай',
+    'дождь', 'поезд', 'сад', 'письмо', 'окно', 'лес', 'песня', 'друг',
+    'вечер', 'мост', 'река', 'снег', 'свет', 'дом', 'небо', 'ветер',
+)
+
+
+@contextmanager
+def isolated(cache_backend='locmem', db_file=None, db_profile=None,
+             **overrides):
+    """Отдельные база, кэш и каталог картинок: рабочие данные замер не
+    трогает. Возвращает псевдонимы кэшей.
+
+    ``db_file`` — файл базы вместо базы в памяти, ``db_profile`` —
+    профиль из ``core.db_config`` вместо профиля из настроек.
+    """
+    media = tempfile.mkdtemp(prefix='yatube-bench-')
+    cache_settings = build_caches(cache_backend, media,
+                                  settings.CACHE_POLICIES)
+    database = connection.settings_dict
+    saved = {key: database.get(key) for key in ('TEST', *PROFILES['default'])}
+    database['TEST'] = {**(database.get('TEST') or {})}
+    if db_file:
+        database['TEST']['NAME'] = db_file
+    if db_profile:
+        database.update(PROFILES[db_profile])
+    connection.close()
+    old_name = connection.creation.create_test_db(
+        verbosity=0, autoclobber=True, serialize=False,
+    )
+    try:
+        # Без DEBUG Django не копит текст запросов в connection.queries.
+        with override_settings(DEBUG=False, MEDIA_ROOT=media,
+                               CACHES=cache_settings, THUMBNAIL_WORKERS=0,
+                               **overrides):
+            try:
+                yield list(cache_settings)
+            finally:
+                for alias in cache_settings:
+                    caches[alias].clear()
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        database.update(saved)
+        shutil.rmtree(media, ignore_errors=True)
+
+
+def zipf_weights(count, exponent):
+    """Вес ``k``-го по популярности элемента — ``1 / k ** exponent``."""
+    return [1 / (rank + 1) ** exponent for rank in range(count)]
+
+
+def _image(rng, number):
+    color = tuple(rng.randrange(256) for _ in range(3))
+    picture = Image.new('RGB', (1200, 800), color)
+    buffer = io.BytesIO()
+    picture.save(buffer, 'JPEG', quality=85)
+    return default_storage.save(f'posts/bench-{number}.jpg',
+                                ContentFile(buffer.getvalue()))
+
+
+def seed(users=200, groups=10, posts=5000, comments=20000,
+         image_share=0.1, follows=20, exponent=1.1, random_seed=1):
+    """Наполняет пустую базу данными для замера и возвращает их объём."""
+    rng = random.Random(random_seed)
+    now = timezone.now()
+    User.objects.bulk_create(
+        [User(username=f'user-{number}') for number in range(users)]
+    )
+    Group.objects.bulk_create(
+        [Group(title=f'Группа {number}', slug=f'group-{number}',
+               description='Группа для замера')
+         for number in range(groups)]
+    )
+    usernames = [f'user-{number}' for number in range(users)]
+    slugs = [f'group-{number}' for number in range(groups)]
+    weights = zipf_weights(users, exponent)
+    images = ([_image(rng, number) for number in range(IMAGES)]
+              if image_share else [])
+
+    def text():
+        return ' '.join(rng.choices(WORDS, k=rng.randint(5, 60)))
+
+    def records():
+        for number in range(1, posts + 1):
+            yield {
+                'type': 'post',
+                'id': number,
+                'author': rng.choices(usernames, weights)[0],
+                'group': rng.choice(slugs) if slugs and rng.random() < 0.7
+                else None,
+                'text': text(),
+                'pub_date': (now - datetime.timedelta(
+                    seconds=rng.randrange(365 * 24 * 60 * 60)
+                )).isoformat(),
+                'image': rng.choice(images)
+                if images and rng.random() < image_share else None,
+            }
+        for _ in range(comments if posts else 0):
+            yield {
+                'type': 'comment',
+                'post': rng.randint(1, posts),
+                'author': rng.choice(usernames),
+                'text': text(),
+            }
+
+    Importer().run(records())
+
+    ids = dict(User.objects.values_list('username', 'pk'))
+    pairs = set()
+    for username in usernames:
+        wanted = min(rng.randint(1, 2 * follows), users - 1)
+        for author in rng.choices(usernames, weights, k=wanted):
+            if author != username:
+                pairs.add((ids[username], ids[author]))
+    Follow.objects.bulk_create(
+        [Follow(user_id=user_id, author_id=author_id)
+         for user_id, author_id in pairs],
+        ignore_conflicts=True,
+    )
+    counters.reconcile(user_ids=ids.values())
+    if timeline.is_enabled():
+        for user in User.objects.filter(follower__isnull=False).distinct():
+            timeline.rebuild(user)
+    return {
+        'users': users, 'groups': groups, 'posts': posts,
+        'comments': comments if posts else 0, 'follows': len(pairs),
+        'image_share': image_share, 'exponent': exponent,
+        'seed': random_seed,
+    }
+
+
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+class Targets:
+    """Адреса страниц с популярностью, как у настоящих посетителей:
+    чаще первые страницы лент и авторы с большим числом подписчиков."""
+
+    def __init__(self, rng, exponent=1.1):
+        self.rng = rng
+        self.authors = list(User.objects.order_by('-counters__followers')
+                            .values_list('username', flat=True))
+        self.author_weights = zipf_weights(len(self.authors), exponent)
+        self.slugs = list(Group.objects.values_list('slug', flat=True))
+        self.post_ids = list(Post.objects.values_list('pk', flat=True))
+        # Читатели ленты подписок — те, кто на кого-то подписан.
+        self.readers = []
+        followers = User.objects.filter(follower__isnull=False).distinct()
+        for user in followers[:READERS]:
+            client = Client()
+            client.force_login(user)
+            self.readers.append(client)
+
+    def page(self):
+        return self.rng.choices((1, 2, 3, 5), (70, 15, 10, 5))[0]
+
+    def request(self, view, anonymous):
+        """Клиент и адрес очередного запроса к ``view``."""
+        if view == 'index':
+            url = f'{reverse("posts:index")}?page={self.page()}'
+        elif view == 'group_posts':
+            url = reverse('posts:group_posts',
+                          kwargs={'slug': self.rng.choice(self.slugs)})
+        elif view == 'profile':
+            username = self.rng.choices(self.authors,
+                                        self.author_weights)[0]
+            url = reverse('posts:profile', kwargs={'username': username})
+        elif view == 'post_detail':
+            url = reverse('posts:post_detail',
+                          kwargs={'post_id': self.rng.choice(self.post_ids)})
+        else:
+            url = reverse(f'posts:{view}')
+        if view == 'follow_index':
+            return self.rng.choice(self.readers), url
+        return anonymous, url
+
+
+def run(views=VIEWS, requests=200, warmup=20, clear_cache=None,
+        random_seed=1):
+    """Открывает страницы ``views`` по ``requests`` раз и возвращает
+    сводку по каждой. ``clear_cache`` вызывается перед каждым запросом —
+    для замера без кэша."""
+    targets = Targets(random.Random(random_seed))
+    anonymous = Client()
+    results = {}
+    for view in views:
+        if (view == 'group_posts' and not targets.slugs
+                or view == 'post_detail' and not targets.post_ids
+                or view == 'follow_index' and not targets.readers):
+            continue
+        for _ in range(warmup):
+            client, url = targets.request(view, anonymous)
+            client.get(url)
+        latencies, queries, errors = [], [], 0
+        started = time.perf_counter()
+        for _ in range(requests):
+            client, url = targets.request(view, anonymous)
+            if clear_cache:
+                clear_cache()
+            counter = QueryCounter()
+            with connections['default'].execute_wrapper(counter):
+                request_started = time.perf_counter()
+                response = client.get(url)
+                latencies.append(time.perf_counter() - request_started)
+            queries.append(counter.count)
+            if response.status_code != 200:
+                errors += 1
+        elapsed = time.perf_counter() - started
+        summary = {'requests': requests, 'errors': errors}
+        for percent in PERCENTILES:
+            summary[f'p{percent}_ms'] = round(
+                percentile(latencies, percent) * 1000, 3
+            )
+        summary.update({
+            'mean_ms': round(sum(latencies) / len(latencies) * 1000, 3)
+            if latencies else 0,
+            'queries_mean': round(sum(queries) / len(queries), 2)
+            if queries else 0,
+            'queries_max': max(queries, default=0),
+            'rps': round(requests / elapsed, 1) if elapsed else 0,
+        })
+        results[view] = summary
+    return results
+
+
+def compare(previous, current):
+    """Строки сравнения двух прогонов по общим представлениям."""
+    lines = []
+    for view, summary in current.items():
+        before = previous.get(view)
+        if not before:
+            continue
+        for key in ('p50_ms', 'p95_ms', 'queries_mean', 'rps'):
+            old, new = before.get(key), summary.get(key)
+            if old is None or new is None:
+                continue
+            change = f'{(new - old) / old * 100:+.0f}%' if old else '—'
+            lines.append(f'{view:<13} {key:<13} {old:>9} → {new:<9} {change}')
+    return lines
+
+
+def _latency(latencies, errors, elapsed):
+    return {
+        'ops': len(latencies),
+        'errors': errors,
+        'ops_per_s': round(len(latencies) / elapsed, 1) if elapsed else 0,
+        **{f'p{percent}_ms': round(percentile(latencies, percent) * 1000, 3)
+           for percent in PERCENTILES},
+    }
+
+
+def db_workload(readers=4, writers=2, duration=5.0, random_seed=1):
+    """Потоки ``readers`` читают первую страницу ленты, ``writers`` —
+    добавляют комментарии, как ``add_comment``: прочитать пост и записать
+    комментарий в одной транзакции. После каждой операции — граница
+    запроса: соединение закрывается, если ``CONN_MAX_AGE`` это велит.
+    Возвращает пропускную способность, задержки и число ошибок
+    ``database is locked`` для чтения и записи."""
+    post_ids = list(Post.objects.values_list('pk', flat=True)[:1000])
+    user_ids = list(User.objects.values_list('pk', flat=True)[:1000])
+    deadline = time.monotonic() + duration
+
+    def read(rng):
+        list(Post.objects.for_feed()[:POSTS_PER_PAGE])
+
+    def write(rng):
+        with transaction.atomic():
+            post = Post.objects.get(pk=rng.choice(post_ids))
+            Comment.objects.create(post=post, author_id=rng.choice(user_ids),
+                                   text='Комментарий для замера')
+
+    def loop(operation, number):
+        rng = random.Random(random_seed + number)
+        latencies, errors = [], 0
+        try:
+            while time.monotonic() < deadline:
+                started = time.perf_counter()
+                try:
+                    operation(rng)
+                except OperationalError:
+                    errors += 1
+                else:
+                    latencies.append(time.perf_counter() - started)
+                close_old_connections()
+        finally:
+            connections.close_all()
+        return latencies, errors
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=readers + writers) as executor:
+        reads = [executor.submit(loop, read, number)
+                 for number in range(readers)]
+        writes = [executor.submit(loop, write, readers + number)
+                  for number in range(writers)]
+        results = {}
+        for kind, futures in (('reads', reads), ('writes', writes)):
+            latencies, errors = [], 0
+            for future in futures:
+                items, failed = future.result()
+                latencies += items
+                errors += failed
+            results[kind] = (latencies, errors)
+    elapsed = time.perf_counter() - started
+    return {kind: _latency(latencies, errors, elapsed)
+            for kind, (latencies, errors) in results.items()}
@@ -0,0 +1,55 @@
+"""Пространства имён версий кэша для лент постов."""
+from core.cache import bump_versions
+
+INDEX = 'feed:index'
+# Каталог групп (posts.directory).
+DIRECTORY = 'groups:directory'
+
+
+def group_namespace(group_id):
+    return f'feed:group:{group_id}'
+
+
+def author_namespace(author_id):
+    return f'feed:author:{author_id}'
+
+
+def follow_namespace(user_id):
+    return f'feed:follow:{user_id}'
+
+
+def post_namespace(post_id):
+    # Страница поста: сам пост и его комментарии.
+    return f'post:{post_id}'
+
+
+def user_namespace(user_id):
+    # Карточка пользователя: счётчики подписок.
+    return f'user:{user_id}'
+
+
+def feed_namespaces(feed, key=None):
+    """Версии, от которых зависит содержимое ленты ``feed``."""
+    if feed == 'group':
+        return [group_namespace(key)]
+    if feed == 'profile':
+        return [author_namespace(key)]
+    if feed == 'follow':
+        # Посты подписок могут прийти от любого автора, поэтому лента
+        # подписок устаревает вместе с общей и при смене подписок.
+        return [INDEX, follow_namespace(key)]
+    return [INDEX]
+
+
+def post_namespaces(author_id, *group_ids):
+    """Ленты, в которых виден пост автора ``author_id`` из ``group_ids``."""
+    namespaces = [INDEX, author_namespace(author_id)]
+    namespaces += [group_namespace(pk) for pk in set(group_ids) if pk]
+    return namespaces
+
+
+def invalidate_post(author_id, *group_ids, post_id=None):
+    namespaces = post_namespaces(author_id, *group_ids)
+    if post_id is not None:
+        namespaces.append(post_namespace(post_id))
+    bump_versions(*namespaces)
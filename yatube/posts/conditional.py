@@ -0,0 +1,122 @@
+"""Условные ответы (ETag, Last-Modified) для лент и страницы поста.
+
+Меткой страницы служат версии пространств имён кэша из ``posts.cache``:
+сигналы сдвигают их при каждом изменении постов, комментариев и
+подписок, а прочитать их — одно обращение к кэшу. Имя группы или автора
+переводится в ключ одним запросом по индексу, без выборки ленты. Если
+метка не изменилась, представление отвечает ``304 Not Modified``, не
+выполняя основных запросов и не рисуя шаблон. Last-Modified точен лишь
+до секунды, поэтому отдаётся только за уже прошедшую секунду.
+
+Версии в locmem у каждого процесса свои: другой процесс ответил бы 304
+на уже изменившуюся страницу. Поэтому ``CONDITIONAL_GET`` по умолчанию
+включён только при общем кэше.
+
+Страница зависит от посетителя (кнопки, ссылки меню), поэтому в ETag
+входит его ключ, а ответ помечается ``private, no-cache``: браузер
+хранит копию у себя, но перед показом всякий раз её сверяет. Ленты
+``posts.syndication`` от посетителя не зависят и помечаются ``public``.
+"""
+import datetime
+import hashlib
+import time
+from functools import partial, wraps
+
+from django.conf import settings
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition
+
+from core.cache import get_versions
+
+from .cache import (INDEX, author_namespace, group_namespace,
+                    post_namespace, user_namespace)
+from .models import Group, Post, User
+
+
+def index_namespaces(request, **kwargs):
+    return [INDEX]
+
+
+def group_namespaces(request, slug, **kwargs):
+    pk = Group.objects.filter(slug=slug).values_list('pk', flat=True).first()
+    return None if pk is None else [group_namespace(pk)]
+
+
+def profile_namespaces(request, username, **kwargs):
+    pk = (User.objects.filter(username=username)
+          .values_list('pk', flat=True).first())
+    if pk is None:
+        return None
+    return [author_namespace(pk), user_namespace(pk)]
+
+
+def post_namespaces(request, post_id, **kwargs):
+    author_id = (Post.objects.filter(pk=post_id)
+                 .values_list('author_id', flat=True).first())
+    if author_id is None:
+        return None
+    # Число постов автора сдвигает его ленту, подписчиков — его карточку.
+    return [post_namespace(post_id), author_namespace(author_id),
+            user_namespace(author_id)]
+
+
+def _versions(resolve, request, *args, **kwargs):
+    # condition() спрашивает ETag и дату по отдельности.
+    if not hasattr(request, '_stamp_versions'):
+        namespaces = resolve(request, *args, **kwargs)
+        request._stamp_versions = (
+            None if namespaces is None else get_versions(namespaces)
+        )
+    return request._stamp_versions
+
+
+def _etag(resolve, private, request, *args, **kwargs):
+    stamps = _versions(resolve, request, *args, **kwargs)
+    if stamps is None:
+        return None
+    viewer = ''
+    if private:
+        viewer = request.user.pk if request.user.is_authenticated else 0
+    # Аргументы адреса различают, например, Atom и JSON одной ленты.
+    key = f'{stamps}:{viewer}:{args}:{sorted(kwargs.items())}'
+    return hashlib.md5(key.encode()).hexdigest()
+
+
+def _last_modified(resolve, request, *args, **kwargs):
+    stamps = _versions(resolve, request, *args, **kwargs)
+    if stamps is None:
+        return None
+    second = int(max(stamps))
+    if second >= int(time.time()):
+        # Секунда ещё не кончилась: следующая правка получила бы ту же
+        # дату, и If-Modified-Since ответил бы 304. Хватит ETag.
+        return None
+    return datetime.datetime.fromtimestamp(second, tz=datetime.timezone.utc)
+
+
+def stamped(resolve, private=True):
+    """Условный GET по версиям ``resolve(request, *args, **kwargs)``.
+
+    ``resolve`` получает аргументы адреса и возвращает пространства
+    имён или ``None``, если объекта нет: тогда метки нет и представление
+    само ответит 404. Ответ с ``private=False`` одинаков для всех
+    посетителей (ленты Atom и JSON) и может храниться в общих кэшах.
+    Без ``CONDITIONAL_GET`` представление отдаётся как есть.
+    """
+    def decorator(view):
+        conditional = condition(
+            etag_func=partial(_etag, resolve, private),
+            last_modified_func=partial(_last_modified, resolve),
+        )(view)
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if not settings.CONDITIONAL_GET:
+                return view(request, *args, **kwargs)
+            response = conditional(request, *args, **kwargs)
+            if getattr(request, '_stamp_versions', None) is not None:
+                scope = 'private' if private else 'public'
+                patch_cache_control(response, no_cache=True, **{scope: True})
+            return response
+        return wrapper
+    return decorator
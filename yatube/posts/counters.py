@@ -0,0 +1,100 @@
+"""Денормализованные счётчики постов, подписок и комментариев.
+
+Сигналы меняют их атомарно, выражением ``F() + delta`` в самой базе,
+поэтому параллельные запросы не теряют приращений. Если счётчики всё же
+разошлись с данными (правка в обход ORM, сбой между запросами), их
+пересчитывает ``reconcile()`` — команда ``reconcile_counters``.
+"""
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, IntegerField, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import Comment, Follow, Post, User, UserCounter
+
+
+def for_user(user):
+    """Счётчики ``user``; нулевые, если строки ещё нет."""
+    try:
+        return user.counters
+    except UserCounter.DoesNotExist:
+        return UserCounter(user=user)
+
+
+def bump_user(user_id, **deltas):
+    """Прибавляет ``deltas`` к счётчикам пользователя.
+
+    Строка счётчиков заводится только при увеличении: уменьшать без
+    строки нечего, а при удалении пользователя каскад удаляет её раньше,
+    чем его посты и подписки.
+    """
+    changes = {name: F(name) + delta for name, delta in deltas.items()}
+    if UserCounter.objects.filter(user_id=user_id).update(**changes):
+        return
+    if min(deltas.values()) < 0:
+        return
+    try:
+        with transaction.atomic():
+            UserCounter.objects.create(user_id=user_id, **deltas)
+    except IntegrityError:
+        # Строку успел создать параллельный запрос.
+        UserCounter.objects.filter(user_id=user_id).update(**changes)
+
+
+def bump_comments(post_id, delta):
+    Post.objects.filter(pk=post_id).update(
+        comment_count=F('comment_count') + delta
+    )
+
+
+def _count(model, field):
+    """Число строк ``model``, у которых ``field`` — текущая запись."""
+    return Coalesce(Subquery(
+        model.objects.filter(**{field: OuterRef('pk')})
+        .order_by().values(field)
+        .annotate(count=Count('pk')).values('count'),
+        output_field=IntegerField(),
+    ), 0)
+
+
+def reconcile(user_ids=None, post_ids=None):
+    """Пересчитывает счётчики, возвращает число исправленных строк.
+
+    ``user_ids`` и ``post_ids`` ограничивают пересчёт этими строками,
+    по умолчанию проверяются все.
+    """
+    users = User.objects.all()
+    posts = Post.objects.all()
+    if user_ids is not None:
+        users = users.filter(pk__in=user_ids)
+    if post_ids is not None:
+        posts = posts.filter(pk__in=post_ids)
+    UserCounter.objects.bulk_create(
+        [UserCounter(user_id=pk) for pk in users.filter(
+            counters__isnull=True
+        ).values_list('pk', flat=True)],
+        ignore_conflicts=True,
+    )
+    actual = {
+        'posts': _count(Post, 'author'),
+        'followers': _count(Follow, 'author'),
+        'following': _count(Follow, 'user'),
+    }
+    drifted_users = UserCounter.objects.filter(user__in=users).annotate(
+        **{f'actual_{name}': value for name, value in actual.items()}
+    ).filter(
+        ~Q(posts=F('actual_posts'))
+        | ~Q(followers=F('actual_followers'))
+        | ~Q(following=F('actual_following'))
+    ).values_list('pk', flat=True)
+    drifted_posts = posts.annotate(
+        actual=_count(Comment, 'post')
+    ).exclude(comment_count=F('actual')).values_list('pk', flat=True)
+    with transaction.atomic():
+        return {
+            'users': UserCounter.objects.filter(
+                pk__in=drifted_users
+            ).update(**actual),
+            'posts': Post.objects.filter(
+                pk__in=drifted_posts
+            ).update(comment_count=_count(Comment, 'post')),
+        }
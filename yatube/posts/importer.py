@@ -0,0 +1,295 @@
+"""Пакетный импорт постов и комментариев из JSONL или CSV.
+
+Каждая запись — пост или комментарий::
+
+    {"type": "post", "id": 10, "author": "leo", "group": "cats",
+     "text": "...", "pub_date": "2021-07-04T15:57:00", "image": "posts/a.jpg"}
+    {"type": "comment", "post": 10, "author": "anna", "text": "..."}
+
+В CSV те же поля — колонки. ``id`` поста необязателен, но без него на
+пост не сослаться из комментария того же файла.
+
+Записи пишутся ``bulk_create`` пачками, каждая в своей транзакции.
+Авторы и группы пачки находятся одним запросом и запоминаются. Сигналы
+при ``bulk_create`` не срабатывают, поэтому их работа — счётчики, доски
+лидеров, сброс кэша лент, «входящие» подписчиков, варианты картинок —
+выполняется один раз в конце импорта. Поисковый индекс обновляют
+триггеры базы.
+"""
+import csv
+import json
+import time
+from contextlib import contextmanager
+
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from core.cache import bump_versions
+
+from . import counters, rankings, thumbnails, timeline
+from .cache import DIRECTORY, post_namespace, post_namespaces
+from .models import Comment, Follow, Group, Post, User
+
+POST = 'post'
+COMMENT = 'comment'
+FORMATS = ('jsonl', 'csv')
+BATCH_SIZE = 1000
+
+
+def read_records(stream, format_):
+    """Записи файла по одной, не читая его в память целиком."""
+    if format_ == 'csv':
+        for row in csv.DictReader(stream):
+            yield {key: value for key, value in row.items() if value != ''}
+        return
+    for line in stream:
+        if not line.strip():
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError:
+            # Битая строка не должна срывать весь импорт.
+            yield None
+
+
+@contextmanager
+def keep_dates(*fields):
+    """Сохраняет даты из источника: ``auto_now_add`` заменил бы их
+    текущим временем."""
+    saved = [(field, field.auto_now_add) for field in fields]
+    for field, _ in saved:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now_add in saved:
+            field.auto_now_add = auto_now_add
+
+
+def _parse_date(value):
+    if not value:
+        return timezone.now()
+    date = parse_datetime(value)
+    if date is None:
+        raise ValueError(f'Неверная дата: {value}')
+    if timezone.is_naive(date):
+        date = timezone.make_aware(date)
+    return date
+
+
+def _parse_id(value):
+    # В CSV все поля — строки, а ключи из базы — числа.
+    if value is None:
+        return None
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f'Неверный id: {value}') from None
+
+
+class Importer:
+    def __init__(self, batch_size=BATCH_SIZE, create_authors=False,
+                 progress=None):
+        self.batch_size = batch_size
+        self.create_authors = create_authors
+        self.progress = progress
+        self.authors = {}
+        self.groups = {}
+        self.records = []
+        self.created = {POST: 0, COMMENT: 0}
+        self.skipped = []
+        self.started = time.monotonic()
+        # Что нужно доделать за сигналы после импорта.
+        self.touched_users = set()
+        self.touched_posts = set()
+        self.feeds = set()
+        self.images = []
+
+    @property
+    def rows(self):
+        return self.created[POST] + self.created[COMMENT]
+
+    @property
+    def rate(self):
+        elapsed = time.monotonic() - self.started
+        return self.rows / elapsed if elapsed else 0
+
+    def run(self, records):
+        with keep_dates(Post._meta.get_field('pub_date'),
+                        Comment._meta.get_field('created')):
+            try:
+                for number, record in enumerate(records, 1):
+                    if not isinstance(record, dict):
+                        self.skipped.append((number,
+                                             'Неверный формат записи'))
+                        continue
+                    self.records.append((number, record))
+                    if len(self.records) >= self.batch_size:
+                        self.flush()
+                self.flush()
+            finally:
+                # Записанные пачки уже зафиксированы, даже если импорт
+                # прервался: счётчики и кэши должны их учесть.
+                self.replay_signals()
+        return self
+
+    def flush(self):
+        if not self.records:
+            return
+        batch, self.records = self.records, []
+        self._resolve_authors(record.get('author') for _, record in batch)
+        self._resolve_groups(record.get('group') for _, record in batch)
+        posts, comments = self._build(batch)
+        posts = self._drop_duplicates(posts)
+        comments = self._drop_orphans(comments, posts)
+        try:
+            with transaction.atomic():
+                Post.objects.bulk_create(posts)
+                Comment.objects.bulk_create(comments)
+        except IntegrityError as error:
+            # Например, пост с тем же id успели записать параллельно.
+            skipped = {number for number, _ in self.skipped}
+            self.skipped += [(number, f'Пачка не записана: {error}')
+                             for number, _ in batch if number not in skipped]
+            return
+        self.created[POST] += len(posts)
+        self.created[COMMENT] += len(comments)
+        for post in posts:
+            self.touched_users.add(post.author_id)
+            self.feeds.add((post.author_id, post.group_id))
+            if post.image:
+                self.images.append(post.image.name)
+        self.touched_posts.update(comment.post_id for comment in comments)
+        if self.progress:
+            self.progress(self)
+
+    def _build(self, batch):
+        """Посты и комментарии пачки с номерами записей."""
+        posts, comments = [], []
+        for number, record in batch:
+            try:
+                kind = record.get('type', POST)
+                if kind == COMMENT:
+                    comments.append((number, self._build_comment(record)))
+                elif kind == POST:
+                    posts.append((number, self._build_post(record)))
+                else:
+                    raise ValueError(f'Тип {kind} не импортируется')
+            except (KeyError, ValueError, TypeError) as error:
+                self.skipped.append((number, str(error)))
+        return posts, comments
+
+    def replay_signals(self):
+        """Работа сигналов сохранения, сделанная разом для всего импорта."""
+        if self.touched_posts:
+            self.feeds.update(
+                Post.objects.filter(pk__in=self.touched_posts)
+                .values_list('author_id', 'group_id')
+            )
+        counters.reconcile(user_ids=self.touched_users,
+                           post_ids=self.touched_posts)
+        if self.rows:
+            rankings.rebuild()
+        namespaces = set()
+        for author_id, group_id in self.feeds:
+            namespaces.update(post_namespaces(author_id, group_id))
+            if group_id:
+                namespaces.add(DIRECTORY)
+        namespaces.update(post_namespace(pk) for pk in self.touched_posts)
+        if namespaces:
+            bump_versions(*namespaces)
+        if timeline.is_enabled() and self.touched_users:
+            follows = Follow.objects.filter(
+                author_id__in=self.touched_users
+            ).select_related('user', 'author')
+            for follow in follows.iterator():
+                timeline.backfill(follow.user, follow.author)
+        thumbnails.enqueue_many(self.images)
+
+    def _resolve_authors(self, usernames):
+        missing = {name for name in usernames
+                   if name and name not in self.authors}
+        if not missing:
+            return
+        found = dict(User.objects.filter(username__in=missing)
+                     .values_list('username', 'pk'))
+        new = missing - set(found)
+        if new and self.create_authors:
+            users = [User(username=name) for name in new]
+            for user in users:
+                user.set_unusable_password()
+            User.objects.bulk_create(users)
+            # SQLite не возвращает ключи из bulk_create.
+            found.update(User.objects.filter(username__in=new)
+                         .values_list('username', 'pk'))
+        self.authors.update(found)
+
+    def _resolve_groups(self, slugs):
+        missing = {slug for slug in slugs
+                   if slug and slug not in self.groups}
+        if missing:
+            self.groups.update(Group.objects.filter(slug__in=missing)
+                               .values_list('slug', 'pk'))
+
+    def _author(self, record):
+        username = record['author']
+        if username not in self.authors:
+            raise ValueError(f'Неизвестный автор: {username}')
+        return self.authors[username]
+
+    def _build_post(self, record):
+        group = record.get('group')
+        if group and group not in self.groups:
+            raise ValueError(f'Неизвестная группа: {group}')
+        if not record.get('text'):
+            raise ValueError('Пустой текст поста')
+        return Post(
+            pk=_parse_id(record.get('id')),
+            author_id=self._author(record),
+            group_id=self.groups.get(group),
+            text=record['text'],
+            pub_date=_parse_date(record.get('pub_date')),
+            image=record.get('image') or None,
+        )
+
+    def _build_comment(self, record):
+        if not record.get('text'):
+            raise ValueError('Пустой текст комментария')
+        return Comment(
+            post_id=int(record['post']),
+            author_id=self._author(record),
+            text=record['text'],
+            created=_parse_date(record.get('created')),
+        )
+
+    def _drop_duplicates(self, posts):
+        """Посты пачки, кроме тех, чей ``id`` уже занят в базе или выше
+        в файле."""
+        ids = {post.pk for _, post in posts if post.pk is not None}
+        taken = set(Post.objects.filter(pk__in=ids)
+                    .values_list('pk', flat=True))
+        kept = []
+        for number, post in posts:
+            if post.pk is not None and post.pk in taken:
+                self.skipped.append((number, f'Пост {post.pk} уже есть'))
+                continue
+            if post.pk is not None:
+                taken.add(post.pk)
+            kept.append(post)
+        return kept
+
+    def _drop_orphans(self, comments, posts):
+        # Комментарий к несуществующему посту сорвал бы всю пачку на
+        # проверке внешнего ключа при фиксации транзакции.
+        wanted = {comment.post_id for _, comment in comments}
+        known = {post.pk for post in posts if post.pk is not None}
+        known |= set(Post.objects.filter(pk__in=wanted - known)
+                     .values_list('pk', flat=True))
+        kept = []
+        for number, comment in comments:
+            if comment.post_id in known:
+                kept.append(comment)
+            else:
+                self.skipped.append((number, f'Нет поста {comment.post_id}'))
+        return kept
@@ -0,0 +1,75 @@
+import json
+import os
+import shutil
+import tempfile
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.db_config import PROFILES
+from posts import benchmark
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает профили SQLite при одновременных чтении ленты '
+            'и записи комментариев.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('profiles', nargs='*',
+                            help=f'Из {", ".join(PROFILES)}; '
+                                 f'по умолчанию все.')
+        parser.add_argument('--readers', type=int, default=4)
+        parser.add_argument('--writers', type=int, default=4)
+        parser.add_argument('--duration', type=float, default=5,
+                            help='Секунд на профиль.')
+        parser.add_argument('--posts', type=int, default=2000)
+        parser.add_argument('--output', help='Записать результаты в JSON.')
+
+    def handle(self, *args, **options):
+        profiles = options['profiles'] or list(PROFILES)
+        unknown = set(profiles) - set(PROFILES)
+        if unknown:
+            raise CommandError(f'Неизвестные профили: {", ".join(unknown)}')
+        if options['readers'] < 0 or options['writers'] < 0 or not (
+                options['readers'] + options['writers']):
+            raise CommandError('Нужен хотя бы один читатель или писатель.')
+        results = {}
+        for profile in profiles:
+            self.stderr.write(f'Профиль {profile}...')
+            # WAL работает только с файлом, поэтому база — на диске.
+            directory = tempfile.mkdtemp(prefix='yatube-bench-db-')
+            try:
+                with benchmark.isolated(
+                    db_file=os.path.join(directory, 'bench.sqlite3'),
+                    db_profile=profile,
+                ):
+                    benchmark.seed(users=100, groups=5,
+                                   posts=options['posts'], comments=0,
+                                   image_share=0, follows=5)
+                    results[profile] = benchmark.db_workload(
+                        readers=options['readers'],
+                        writers=options['writers'],
+                        duration=options['duration'],
+                    )
+            finally:
+                shutil.rmtree(directory, ignore_errors=True)
+        self.write_table(results)
+        if options['output']:
+            report = {
+                'readers': options['readers'],
+                'writers': options['writers'],
+                'duration': options['duration'],
+                'profiles': results,
+            }
+            with open(options['output'], 'w', encoding='utf-8') as stream:
+                json.dump(report, stream, ensure_ascii=False, indent=2)
+
+    def write_table(self, results):
+        columns = ('ops_per_s', 'p50_ms', 'p95_ms', 'p99_ms', 'errors')
+        self.stdout.write(f'{"":<20}' + ''.join(
+            f'{name:>12}' for name in columns
+        ))
+        for profile, kinds in results.items():
+            for kind, summary in kinds.items():
+                self.stdout.write(f'{profile + " " + kind:<20}' + ''.join(
+                    f'{summary[name]:>12}' for name in columns
+                ))
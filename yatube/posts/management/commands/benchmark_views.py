@@ -0,0 +1,130 @@
+import json
+
+from django.core.cache import caches
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from core.db_config import PROFILES
+from posts import benchmark
+
+CACHE_BACKENDS = ('locmem', 'file', 'sqlite')
+
+
+class Command(BaseCommand):
+    help = ('Замеряет ленты и страницу поста на синтетических данных '
+            'в отдельной базе.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('views', nargs='*',
+                            help=f'Из {", ".join(benchmark.VIEWS)}; '
+                                 f'по умолчанию все.')
+        data = parser.add_argument_group('данные')
+        data.add_argument('--users', type=int, default=200)
+        data.add_argument('--groups', type=int, default=10)
+        data.add_argument('--posts', type=int, default=5000)
+        data.add_argument('--comments', type=int, default=20000)
+        data.add_argument('--image-share', type=float, default=0.1,
+                          help='Доля постов с картинкой.')
+        data.add_argument('--follows', type=int, default=20,
+                          help='Среднее число подписок пользователя.')
+        data.add_argument('--exponent', type=float, default=1.1,
+                          help='Показатель степенного закона популярности.')
+        data.add_argument('--seed', type=int, default=1)
+        run = parser.add_argument_group('замер')
+        run.add_argument('--requests', type=int, default=200)
+        run.add_argument('--warmup', type=int, default=20)
+        run.add_argument('--cold', action='store_true',
+                         help='Очищать кэш перед каждым запросом.')
+        # Redis не предлагается: очистка кэша стёрла бы рабочие ключи.
+        run.add_argument('--cache-backend', choices=CACHE_BACKENDS,
+                         default='locmem')
+        run.add_argument('--timeline', action='store_true',
+                         help='Лента подписок из «входящих».')
+        run.add_argument('--db-file',
+                         help='Файл базы вместо базы в памяти.')
+        run.add_argument('--db-profile', choices=PROFILES,
+                         help='Профиль SQLite вместо профиля из настроек.')
+        parser.add_argument('--output', help='Записать результаты в JSON.')
+        parser.add_argument('--compare',
+                            help='JSON прошлого прогона для сравнения.')
+
+    def validate(self, options):
+        """Представления для замера и прошлый прогон из ``--compare``."""
+        views = options['views'] or list(benchmark.VIEWS)
+        unknown = set(views) - set(benchmark.VIEWS)
+        if unknown:
+            raise CommandError(
+                f'Неизвестные представления: {", ".join(unknown)}'
+            )
+        if options['requests'] < 1:
+            raise CommandError('--requests должен быть больше нуля.')
+        previous = None
+        if options['compare']:
+            try:
+                with open(options['compare'], encoding='utf-8') as stream:
+                    previous = json.load(stream)
+            except (OSError, ValueError) as error:
+                raise CommandError(error)
+        return views, previous
+
+    def handle(self, *args, **options):
+        views, previous = self.validate(options)
+        with benchmark.isolated(
+            options['cache_backend'], options['db_file'],
+            options['db_profile'],
+            FOLLOW_TIMELINE_ENABLED=options['timeline'],
+        ) as cache_aliases:
+            self.stderr.write('Наполняю базу...')
+            dataset = benchmark.seed(
+                users=options['users'], groups=options['groups'],
+                posts=options['posts'], comments=options['comments'],
+                image_share=options['image_share'],
+                follows=options['follows'], exponent=options['exponent'],
+                random_seed=options['seed'],
+            )
+            self.stderr.write('Замеряю...')
+
+            def clear_cache():
+                for alias in cache_aliases:
+                    caches[alias].clear()
+
+            results = benchmark.run(
+                views, requests=options['requests'],
+                warmup=options['warmup'],
+                clear_cache=clear_cache if options['cold'] else None,
+                random_seed=options['seed'],
+            )
+
+        report = {
+            'started': timezone.now().isoformat(),
+            'dataset': dataset,
+            'options': {
+                'requests': options['requests'],
+                'warmup': options['warmup'],
+                'cold': options['cold'],
+                'cache_backend': options['cache_backend'],
+                'timeline': options['timeline'],
+                'db_file': bool(options['db_file']),
+                'db_profile': options['db_profile'],
+            },
+            'views': results,
+        }
+        self.write_table(results)
+        if previous is not None:
+            for line in benchmark.compare(previous.get('views', {}),
+                                          results):
+                self.stdout.write(line)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as stream:
+                json.dump(report, stream, ensure_ascii=False, indent=2)
+
+    def write_table(self, results):
+        columns = ('p50_ms', 'p95_ms', 'p99_ms', 'queries_mean', 'rps',
+                   'errors')
+        self.stdout.write(f'{"":<13}' + ''.join(
+            f'{name:>13}' for name in columns
+        ))
+        for view, summary in results.items():
+            self.stdout.write(f'{view:<13}' + ''.join(
+                f'{summary[name]:>13}' for name in columns
+            ))
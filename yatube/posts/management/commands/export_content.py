@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.exporter import CHUNK_SIZE, FORMATS, KINDS, lines, parse_since
+
+
+class Command(BaseCommand):
+    help = 'Потоково выгружает посты, комментарии, подписки и группы.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('kinds', nargs='*',
+                            help=f'Из {", ".join(KINDS)}; по умолчанию все.')
+        parser.add_argument('--format', choices=FORMATS, default='jsonl')
+        parser.add_argument('--since',
+                            help='Только посты и комментарии новее даты.')
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+        parser.add_argument('--output', help='Файл вместо stdout.')
+
+    def handle(self, *args, **options):
+        kinds = options['kinds'] or list(KINDS)
+        unknown = set(kinds) - set(KINDS)
+        if unknown:
+            raise CommandError(f'Неизвестные типы: {", ".join(unknown)}')
+        since = None
+        if options['since']:
+            try:
+                since = parse_since(options['since'])
+            except ValueError as error:
+                raise CommandError(error)
+        output = lines(kinds, options['format'],
+                       since=since, chunk_size=options['chunk_size'])
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8',
+                      newline='') as stream:
+                stream.writelines(output)
+        else:
+            for line in output:
+                self.stdout.write(line, ending='')
@@ -0,0 +1,53 @@
+import os
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.importer import BATCH_SIZE, FORMATS, Importer, read_records
+
+
+class Command(BaseCommand):
+    help = 'Импортирует посты и комментарии из JSONL или CSV.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Файл или «-» для stdin.')
+        parser.add_argument('--format', choices=FORMATS,
+                            help='По умолчанию — по расширению файла.')
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+        parser.add_argument('--create-authors', action='store_true',
+                            help='Заводить неизвестных авторов.')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        format_ = options['format']
+        if format_ is None:
+            extension = os.path.splitext(path)[1].lstrip('.').lower()
+            format_ = 'csv' if extension == 'csv' else 'jsonl'
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size должен быть больше нуля.')
+        importer = Importer(
+            batch_size=options['batch_size'],
+            create_authors=options['create_authors'],
+            progress=self.progress if options['verbosity'] > 1 else None,
+        )
+        try:
+            if path == '-':
+                importer.run(read_records(sys.stdin, format_))
+            else:
+                with open(path, encoding='utf-8', newline='') as stream:
+                    importer.run(read_records(stream, format_))
+        except (OSError, ValueError) as error:
+            raise CommandError(error)
+        for number, reason in importer.skipped:
+            self.stderr.write(f'Запись {number} пропущена: {reason}')
+        self.stdout.write(
+            f'Постов: {importer.created["post"]}, '
+            f'комментариев: {importer.created["comment"]}, '
+            f'пропущено: {len(importer.skipped)}, '
+            f'{importer.rate:.0f} записей/с'
+        )
+
+    def progress(self, importer):
+        self.stdout.write(
+            f'… {importer.rows} записей, {importer.rate:.0f} записей/с'
+        )
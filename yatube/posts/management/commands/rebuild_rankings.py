@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from posts import rankings
+
+
+class Command(BaseCommand):
+    help = ('Пересчитывает доски лидеров за скользящее окно; '
+            'запускается по расписанию.')
+
+    def handle(self, *args, **options):
+        count = rankings.rebuild()
+        self.stdout.write(f'Строк в досках: {count}')
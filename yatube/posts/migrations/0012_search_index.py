@@ -0,0 +1,80 @@
+from django.db import migrations
+
+# Пост лежит в индексе под rowid 2 * id, комментарий — под 2 * id + 1.
+CREATE = [
+    """
+    CREATE VIRTUAL TABLE posts_search USING fts5(
+        text, post_id UNINDEXED,
+        tokenize = 'unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    INSERT INTO posts_search (rowid, text, post_id)
+    SELECT 2 * id, text, id FROM posts_post
+    """,
+    """
+    INSERT INTO posts_search (rowid, text, post_id)
+    SELECT 2 * id + 1, text, post_id FROM posts_comment
+    """,
+    """
+    CREATE TRIGGER posts_post_search_insert AFTER INSERT ON posts_post
+    BEGIN
+        INSERT INTO posts_search (rowid, text, post_id)
+        VALUES (2 * new.id, new.text, new.id);
+    END
+    """,
+    """
+    CREATE TRIGGER posts_post_search_update AFTER UPDATE OF text ON posts_post
+    BEGIN
+        UPDATE posts_search SET text = new.text WHERE rowid = 2 * new.id;
+    END
+    """,
+    """
+    CREATE TRIGGER posts_post_search_delete AFTER DELETE ON posts_post
+    BEGIN
+        DELETE FROM posts_search WHERE rowid = 2 * old.id;
+    END
+    """,
+    """
+    CREATE TRIGGER posts_comment_search_insert AFTER INSERT ON posts_comment
+    BEGIN
+        INSERT INTO posts_search (rowid, text, post_id)
+        VALUES (2 * new.id + 1, new.text, new.post_id);
+    END
+    """,
+    """
+    CREATE TRIGGER posts_comment_search_update
+    AFTER UPDATE OF text, post_id ON posts_comment
+    BEGIN
+        UPDATE posts_search SET text = new.text, post_id = new.post_id
+        WHERE rowid = 2 * new.id + 1;
+    END
+    """,
+    """
+    CREATE TRIGGER posts_comment_search_delete AFTER DELETE ON posts_comment
+    BEGIN
+        DELETE FROM posts_search WHERE rowid = 2 * old.id + 1;
+    END
+    """,
+]
+
+DROP = [
+    'DROP TRIGGER IF EXISTS posts_comment_search_delete',
+    'DROP TRIGGER IF EXISTS posts_comment_search_update',
+    'DROP TRIGGER IF EXISTS posts_comment_search_insert',
+    'DROP TRIGGER IF EXISTS posts_post_search_delete',
+    'DROP TRIGGER IF EXISTS posts_post_search_update',
+    'DROP TRIGGER IF EXISTS posts_post_search_insert',
+    'DROP TABLE IF EXISTS posts_search',
+]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0011_post_renditions'),
+    ]
+
+    operations = [
+        migrations.RunSQL(CREATE, DROP),
+    ]
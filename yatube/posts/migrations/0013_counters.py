@@ -0,0 +1,88 @@
+# Generated by Django 2.2.16 on 2026-10-18 05:34
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+import django.db.models.deletion
+
+# AddField в SQLite пересоздаёт posts_post, и триггеры поискового индекса
+# (0012_search_index) пропадают вместе со старой таблицей.
+POST_SEARCH_TRIGGERS = [
+    """
+    CREATE TRIGGER IF NOT EXISTS posts_post_search_insert
+    AFTER INSERT ON posts_post
+    BEGIN
+        INSERT INTO posts_search (rowid, text, post_id)
+        VALUES (2 * new.id, new.text, new.id);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS posts_post_search_update
+    AFTER UPDATE OF text ON posts_post
+    BEGIN
+        UPDATE posts_search SET text = new.text WHERE rowid = 2 * new.id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS posts_post_search_delete
+    AFTER DELETE ON posts_post
+    BEGIN
+        DELETE FROM posts_search WHERE rowid = 2 * old.id;
+    END
+    """,
+]
+
+
+def _count(model, field):
+    return Coalesce(Subquery(
+        model.objects.filter(**{field: OuterRef('pk')})
+        .order_by().values(field)
+        .annotate(count=Count('pk')).values('count'),
+        output_field=IntegerField(),
+    ), 0)
+
+
+def fill_counters(apps, schema_editor):
+    User = apps.get_model(*settings.AUTH_USER_MODEL.split('.'))
+    Post = apps.get_model('posts', 'Post')
+    Comment = apps.get_model('posts', 'Comment')
+    Follow = apps.get_model('posts', 'Follow')
+    UserCounter = apps.get_model('posts', 'UserCounter')
+    UserCounter.objects.bulk_create(
+        [UserCounter(user_id=pk)
+         for pk in User.objects.values_list('pk', flat=True)]
+    )
+    UserCounter.objects.update(
+        posts=_count(Post, 'author'),
+        followers=_count(Follow, 'author'),
+        following=_count(Follow, 'user'),
+    )
+    Post.objects.update(comment_count=_count(Comment, 'post'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0011_update_proxy_permissions'),
+        ('posts', '0012_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserCounter',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='counters', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('posts', models.IntegerField(default=0, verbose_name='Записей')),
+                ('followers', models.IntegerField(default=0, verbose_name='Подписчиков')),
+                ('following', models.IntegerField(default=0, verbose_name='Подписан')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='comment_count',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.RunSQL(POST_SEARCH_TRIGGERS, migrations.RunSQL.noop),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
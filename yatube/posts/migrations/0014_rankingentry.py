@@ -0,0 +1,68 @@
+# Generated by Django 2.2.16 on 2026-10-18 05:49
+
+import datetime
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Max
+from django.utils import timezone
+import django.db.models.deletion
+
+
+def fill_rankings(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+    Comment = apps.get_model('posts', 'Comment')
+    RankingEntry = apps.get_model('posts', 'RankingEntry')
+    start = timezone.now() - datetime.timedelta(
+        days=settings.RANKING_WINDOW_DAYS
+    )
+    entries = [
+        RankingEntry(board='rating', post_id=pk, group_id=group_id,
+                     score=rating, updated=pub_date)
+        for pk, group_id, rating, pub_date in
+        Post.objects.filter(pub_date__gte=start)
+        .values_list('pk', 'group_id', 'rating', 'pub_date')
+    ]
+    entries += [
+        RankingEntry(board='comments', post_id=row['post_id'],
+                     group_id=row['post__group_id'], score=row['score'],
+                     updated=row['updated'])
+        for row in Comment.objects.filter(created__gte=start).order_by()
+        .values('post_id', 'post__group_id')
+        .annotate(score=Count('pk'), updated=Max('created'))
+    ]
+    RankingEntry.objects.bulk_create(entries, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0013_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RankingEntry',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('board', models.CharField(choices=[('rating', 'Лучшие по оценке'), ('comments', 'Самые обсуждаемые')], max_length=16, verbose_name='Доска')),
+                ('score', models.IntegerField(default=0, verbose_name='Счёт')),
+                ('updated', models.DateTimeField(verbose_name='Последнее событие')),
+                ('group', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='posts.Group')),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ranking_entries', to='posts.Post')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='rankingentry',
+            index=models.Index(fields=['board', 'score'], name='ranking_board_score_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='rankingentry',
+            index=models.Index(fields=['board', 'group', 'score'], name='ranking_group_score_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='rankingentry',
+            constraint=models.UniqueConstraint(fields=('board', 'post'), name='unique_ranking_entry'),
+        ),
+        migrations.RunPython(fill_rankings, migrations.RunPython.noop),
+    ]
@@ -15,6 +15,28 @@ class Group(models.Model):
         return f"{self.title}"
 
 
+class PostQuerySet(models.QuerySet):
+    # Поля автора и группы, которые ленты не показывают.
+    FEED_DEFERRED_FIELDS = (
+        'author__password',
+        'author__last_login',
+        'author__is_superuser',
+        'author__is_staff',
+        'author__is_active',
+        'author__email',
+        'author__date_joined',
+        'group__description',
+    )
+
+    def for_feed(self):
+        """Посты для лент: автор и группа в том же запросе,
+        число комментариев — из счётчика в самом посте."""
+        return (
+            self.select_related('author', 'group')
+            .defer(*self.FEED_DEFERRED_FIELDS)
+        )
+
+
 class Post(models.Model):
     text = models.TextField(
         'Текст поста',
@@ -55,11 +77,27 @@ class Post(models.Model):
     )  
     # Аргумент upload_to указывает директорию, 
     # в которую будут загружаться пользовательские файлы. 
+    # Варианты картинки разных размеров и форматов (JSON), см. renditions.
+    renditions = models.TextField(blank=True, default='', editable=False)
+    # Счётчик комментариев, его ведут сигналы (см. counters).
+    comment_count = models.IntegerField(default=0, editable=False)
+
+    objects = PostQuerySet.as_manager()
 
     class Meta:
         ordering = ('-pub_date',)
         verbose_name = 'Пост'
         verbose_name_plural = 'Посты'
+        # Индексы под ленты: общая, автора и группы. SQLite дописывает
+        # rowid в конец индекса, так что обратный проход по ним даёт
+        # порядок (-pub_date, -id) для курсорной пагинации без сортировки.
+        indexes = [
+            models.Index(fields=['pub_date'], name='post_pub_date_idx'),
+            models.Index(fields=['author', 'pub_date'],
+                         name='post_author_pub_date_idx'),
+            models.Index(fields=['group', 'pub_date'],
+                         name='post_group_pub_date_idx'),
+        ]
 
     def __str__(self):
         return self.text[:15] 
@@ -89,6 +127,10 @@ class Comment(models.Model):
         ordering = ('-created',)
         verbose_name = 'Коммент'
         verbose_name_plural = 'Комменты'
+        indexes = [
+            models.Index(fields=['post', 'created'],
+                         name='comment_post_created_idx'),
+        ]
 
     def __str__(self):
         return self.text[:15] 
@@ -106,5 +148,97 @@ class Follow(models.Model):
         related_name="following"
     )
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'author'],
+                                    name='unique_follow'),
+        ]
+
     def __str__(self):
-        return f"{self.title}"
\ No newline at end of file
+        return f"{self.title}"
+
+
+class TimelineEntry(models.Model):
+    """Пост во «входящих» подписчика (лента подписок, fan-out on write)."""
+    owner = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name="timeline"
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name="timeline_entries"
+    )
+    pub_date = models.DateTimeField('Дата публикации')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['owner', 'post'],
+                                    name='unique_timeline_entry'),
+        ]
+        indexes = [
+            models.Index(fields=['owner', 'pub_date'],
+                         name='timeline_owner_pub_date_idx'),
+        ]
+
+
+class UserCounter(models.Model):
+    """Счётчики пользователя, чтобы не считать их COUNT(*) на каждой
+    странице. Ведутся сигналами, сверяются командой reconcile_counters."""
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="counters"
+    )
+    posts = models.IntegerField('Записей', default=0)
+    followers = models.IntegerField('Подписчиков', default=0)
+    following = models.IntegerField('Подписан', default=0)
+
+    def __str__(self):
+        return (f"{self.user_id}: "
+                f"{self.posts}/{self.followers}/{self.following}")
+
+
+class RankingEntry(models.Model):
+    """Пост в таблице лидеров за скользящее окно (см. rankings).
+
+    Для доски ``rating`` счёт — оценка поста, а ``updated`` — дата его
+    публикации; для ``comments`` — число комментариев за окно и время
+    последнего из них.
+    """
+    RATING = 'rating'
+    COMMENTS = 'comments'
+    BOARDS = (
+        (RATING, 'Лучшие по оценке'),
+        (COMMENTS, 'Самые обсуждаемые'),
+    )
+    board = models.CharField('Доска', max_length=16, choices=BOARDS)
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name="ranking_entries"
+    )
+    # Копия группы поста: доски групп без соединения с постами.
+    group = models.ForeignKey(
+        Group,
+        on_delete=models.SET_NULL,
+        related_name="+",
+        blank=True,
+        null=True,
+    )
+    score = models.IntegerField('Счёт', default=0)
+    updated = models.DateTimeField('Последнее событие')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['board', 'post'],
+                                    name='unique_ranking_entry'),
+        ]
+        indexes = [
+            models.Index(fields=['board', 'score'],
+                         name='ranking_board_score_idx'),
+            models.Index(fields=['board', 'group', 'score'],
+                         name='ranking_group_score_idx'),
+        ]
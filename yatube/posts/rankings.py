@@ -0,0 +1,126 @@
+"""Таблицы лидеров: лучшие по оценке и самые обсуждаемые посты.
+
+Сортировать ради них всю таблицу постов или считать комментарии на
+каждый запрос дорого, поэтому счёт хранится заранее в ``RankingEntry``:
+по строке на пост и доску, только для постов и комментариев из
+скользящего окна ``RANKING_WINDOW_DAYS``. Сигналы поправляют строки
+при каждой записи поста или комментария; выпадение из окна старых
+событий и записи в обход сигналов исправляет ``rebuild()`` —
+команда ``rebuild_rankings``, которую запускают по расписанию.
+
+Доска группы — те же строки с фильтром по копии группы поста.
+"""
+import datetime
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Max
+from django.utils import timezone
+
+from .models import Comment, Post, RankingEntry
+
+BOARDS = dict(RankingEntry.BOARDS)
+
+
+def window_start():
+    return timezone.now() - datetime.timedelta(
+        days=settings.RANKING_WINDOW_DAYS
+    )
+
+
+def record_post(post):
+    """Оценка и группа поста после его сохранения."""
+    RankingEntry.objects.filter(post=post).exclude(
+        group_id=post.group_id
+    ).update(group_id=post.group_id)
+    if post.pub_date < window_start():
+        return
+    RankingEntry.objects.update_or_create(
+        board=RankingEntry.RATING, post=post,
+        defaults={'score': post.rating, 'group_id': post.group_id,
+                  'updated': post.pub_date},
+    )
+
+
+def record_comment(comment, delta):
+    """Сдвигает счёт обсуждаемости поста на ``delta`` комментариев."""
+    if comment.created < window_start():
+        # Комментарий вне окна не входил в счёт и не уменьшает его.
+        return
+    entries = RankingEntry.objects.filter(board=RankingEntry.COMMENTS,
+                                          post_id=comment.post_id)
+    if delta < 0:
+        entries.update(score=F('score') + delta)
+        entries.filter(score__lte=0).delete()
+        return
+    changes = {'score': F('score') + delta, 'updated': comment.created}
+    if entries.update(**changes):
+        return
+    group_id = (Post.objects.filter(pk=comment.post_id)
+                .values_list('group_id', flat=True).first())
+    try:
+        with transaction.atomic():
+            RankingEntry.objects.create(
+                board=RankingEntry.COMMENTS, post_id=comment.post_id,
+                group_id=group_id, score=delta, updated=comment.created,
+            )
+    except IntegrityError:
+        # Строку успел создать параллельный запрос.
+        entries.update(**changes)
+
+
+def rebuild():
+    """Пересчитывает доски за текущее окно, возвращает число строк."""
+    start = window_start()
+    rated = (
+        Post.objects.filter(pub_date__gte=start)
+        .values_list('pk', 'group_id', 'rating', 'pub_date')
+    )
+    discussed = (
+        Comment.objects.filter(created__gte=start).order_by()
+        .values('post_id', 'post__group_id')
+        .annotate(score=Count('pk'), updated=Max('created'))
+    )
+    # Чтение в той же транзакции, что и замена строк: иначе записи,
+    # сделанные между ними, пропали бы до следующего пересчёта.
+    with transaction.atomic():
+        entries = [
+            RankingEntry(board=RankingEntry.RATING, post_id=pk,
+                         group_id=group_id, score=rating, updated=pub_date)
+            for pk, group_id, rating, pub_date in rated.iterator()
+        ]
+        entries += [
+            RankingEntry(board=RankingEntry.COMMENTS,
+                         post_id=row['post_id'],
+                         group_id=row['post__group_id'], score=row['score'],
+                         updated=row['updated'])
+            for row in discussed.iterator()
+        ]
+        RankingEntry.objects.all().delete()
+        RankingEntry.objects.bulk_create(entries, batch_size=1000)
+    return len(entries)
+
+
+def top(board, group=None, limit=None):
+    """Посты доски ``board`` по убыванию счёта, с ``post.ranking_score``.
+
+    Строки, чьё последнее событие вышло из окна, не показываются и до
+    пересчёта.
+    """
+    entries = RankingEntry.objects.filter(board=board,
+                                          updated__gte=window_start())
+    if group is not None:
+        entries = entries.filter(group=group)
+    limit = limit or settings.RANKING_SIZE
+    scores = list(
+        entries.order_by('-score', '-updated')
+        .values_list('post_id', 'score')[:limit]
+    )
+    posts = Post.objects.for_feed().in_bulk([pk for pk, _ in scores])
+    ranked = []
+    for pk, score in scores:
+        post = posts.get(pk)
+        if post is not None:
+            post.ranking_score = score
+            ranked.append(post)
+    return ranked
@@ -0,0 +1,124 @@
+"""Варианты картинки поста для разных экранов и форматов.
+
+Картинка обрезается под пропорции ленты и сохраняется в нескольких
+ширинах и форматах: AVIF и WebP, если их умеет Pillow, и JPEG для
+остальных браузеров. Описание вариантов хранится в ``Post.renditions``,
+шаблоны выводят его как ``<picture>`` с ``srcset`` и ``sizes``.
+"""
+import hashlib
+import json
+import os
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+from .models import Post
+
+# Пропорции, в которых лента показывала миниатюру 960x339.
+ASPECT = 339 / 960
+WIDTHS = (480, 960, 1440)
+# Колонка ленты занимает всю ширину экрана телефона и не больше 960px.
+SIZES = '(max-width: 992px) 100vw, 960px'
+QUALITY = 80
+DIRECTORY = 'renditions'
+
+Image.init()
+# Форматы в порядке предпочтения; JPEG — запасной для <img>.
+FORMATS = [
+    (name, mime, extension)
+    for name, mime, extension in (
+        ('AVIF', 'image/avif', 'avif'),
+        ('WEBP', 'image/webp', 'webp'),
+        ('JPEG', 'image/jpeg', 'jpg'),
+    )
+    if name in Image.SAVE
+]
+
+
+def _target_widths(width):
+    # Не раздуваем маленькие картинки, но хотя бы один вариант строим.
+    return [target for target in WIDTHS if target <= width] or [WIDTHS[0]]
+
+
+def _save(name, image, format_):
+    buffer = BytesIO()
+    image.save(buffer, format=format_, quality=QUALITY)
+    if default_storage.exists(name):
+        default_storage.delete(name)
+    return default_storage.save(name, ContentFile(buffer.getvalue()))
+
+
+def build(name):
+    """Строит варианты картинки ``name`` и возвращает их описание."""
+    with default_storage.open(name) as source:
+        image = Image.open(source)
+        image = ImageOps.exif_transpose(image).convert('RGB')
+    digest = hashlib.md5(name.encode()).hexdigest()
+    directory = os.path.join(DIRECTORY, digest[:2], digest)
+    widths = _target_widths(image.width)
+    sizes = [(width, round(width * ASPECT)) for width in widths]
+    crops = {size: ImageOps.fit(image, size, Image.LANCZOS) for size in sizes}
+    formats = []
+    for format_, mime, extension in FORMATS:
+        files = [
+            [width, _save(os.path.join(directory, f'{width}.{extension}'),
+                          crops[(width, height)], format_)]
+            for width, height in sizes
+        ]
+        formats.append({'type': mime, 'files': files})
+    width, height = sizes[-1]
+    return {'width': width, 'height': height, 'formats': formats}
+
+
+def store(name):
+    """Строит варианты и записывает их во все посты с этой картинкой.
+
+    Возвращает ``(pk, author_id, group_id)`` изменённых постов: update()
+    не шлёт сигналов, и ленты с ними сбрасывает вызывающий.
+    """
+    renditions = json.dumps(build(name))
+    posts = Post.objects.filter(image=name)
+    affected = list(posts.values_list('pk', 'author_id', 'group_id'))
+    posts.update(renditions=renditions)
+    return affected
+
+
+def parse(value):
+    """Описание вариантов из ``Post.renditions`` или ``None``."""
+    try:
+        renditions = json.loads(value) if value else None
+    except ValueError:
+        return None
+    if not isinstance(renditions, dict) or not renditions.get('formats'):
+        return None
+    return renditions
+
+
+def picture(value):
+    """Контекст для ``<picture>``: источники по форматам и запасной JPEG."""
+    renditions = parse(value)
+    if renditions is None:
+        return None
+    sources = [
+        {
+            'type': item['type'],
+            'srcset': ', '.join(
+                f'{default_storage.url(file)} {width}w'
+                for width, file in item['files']
+            ),
+        }
+        for item in renditions['formats']
+    ]
+    fallback = sources.pop()
+    return {
+        'sources': sources,
+        'srcset': fallback['srcset'],
+        'src': default_storage.url(
+            renditions['formats'][-1]['files'][-1][1]
+        ),
+        'sizes': SIZES,
+        'width': renditions['width'],
+        'height': renditions['height'],
+    }
@@ -0,0 +1,144 @@
+"""Полнотекстовый поиск по постам и комментариям на SQLite FTS5.
+
+Индекс ``posts_search`` заполняют триггеры базы (миграция 0012), так что
+он не расходится с таблицами даже при ``bulk_create`` и ``update()``.
+Пост хранится в строке с rowid ``2 * id``, комментарий — ``2 * id + 1``:
+триггеры обновляют и удаляют строки индекса по rowid, без поиска.
+
+SQLite меняет схему, пересоздавая таблицу, и триггеры при этом
+пропадают: миграция, которая меняет posts_post или posts_comment, должна
+создать их заново (как 0013_counters).
+"""
+import re
+
+from django.db import connections, models, router
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+from core.paginator import CURSOR_PARAM, PAGE_PARAM, CursorPaginator
+
+from .models import Post
+
+TABLE = 'posts_search'
+SNIPPET_TOKENS = 16
+
+# Границы совпадения в сниппете: символы, которых нет в тексте постов.
+_START, _END = '\x02', '\x03'
+_WORD = re.compile(r'\w+')
+
+
+def match_expression(query):
+    """Запрос пользователя в синтаксисе FTS5: все слова, последнее — как
+    префикс. Операторы и кавычки FTS5 из запроса не попадают."""
+    words = _WORD.findall(query.lower())
+    if not words:
+        return ''
+    terms = [f'"{word}"' for word in words]
+    terms[-1] += '*'
+    return ' '.join(terms)
+
+
+def highlight(snippet):
+    """Экранирует сниппет и размечает совпадения тегом ``<mark>``."""
+    return mark_safe(
+        escape(snippet).replace(_START, '<mark>').replace(_END, '</mark>')
+    )
+
+
+def filter_posts(queryset, query):
+    """Посты ``queryset``, в тексте которых или в комментариях есть
+    ``query``, — без ранжирования, как фильтр."""
+    expression = match_expression(query)
+    if not expression:
+        return queryset.none()
+    # RawSQL в pk__in даёт «IN ((SELECT ...))», а SQLite читает это
+    # как скалярный подзапрос из одной строки.
+    table = queryset.model._meta.db_table
+    return queryset.extra(
+        where=[f'{table}.id IN (SELECT post_id FROM {TABLE} '
+               f'WHERE {TABLE} MATCH %s)'],
+        params=[expression],
+    )
+
+
+class SearchPaginator(CursorPaginator):
+    """Курсорная навигация по результатам поиска.
+
+    Посты упорядочены по убыванию релевантности (``-bm25``) лучшего из
+    совпадений — в самом посте или в комментарии к нему.
+    """
+
+    def __init__(self, query, per_page):
+        super().__init__(Post.objects.for_feed(), per_page,
+                         fields=('search_rank', 'pk'))
+        self.expression = match_expression(query)
+
+    def _get_field(self, name):
+        if name == 'search_rank':
+            return models.FloatField()
+        return super()._get_field(name)
+
+    def _rows(self, descending, limit, offset=0, after=None):
+        if not self.expression:
+            return []
+        order = 'DESC' if descending else 'ASC'
+        sign = '<' if descending else '>'
+        params = [self.expression]
+        having = ''
+        if after is not None:
+            having = (f'HAVING score {sign} %s '
+                      f'OR (score = %s AND post_id {sign} %s)')
+            params += [after[0], after[0], after[1]]
+        params += [limit, offset]
+        # Сначала страница по одной оценке: ``rank`` — это bm25() без
+        # аргументов, и на совпадение не тратится ничего, кроме неё.
+        sql = f'''
+            SELECT post_id, MAX(-rank) AS score
+            FROM {TABLE} WHERE {TABLE} MATCH %s
+            GROUP BY post_id {having}
+            ORDER BY score {order}, post_id {order}
+            LIMIT %s OFFSET %s
+        '''
+        # Сырой SQL роутер не видит: реплику выбираем сами.
+        alias = router.db_for_read(Post)
+        with connections[alias].cursor() as cursor:
+            cursor.execute(sql, params)
+            hits = cursor.fetchall()
+            snippets = self._snippets(cursor, [post_id for post_id, _ in hits])
+        posts = self.object_list.in_bulk([post_id for post_id, _ in hits])
+        rows = []
+        for post_id, score in hits:
+            post = posts.get(post_id)
+            if post is None:
+                continue
+            post.search_rank = score
+            post.search_snippet = highlight(snippets.get(post_id, ''))
+            rows.append(post)
+        return rows
+
+    def _snippets(self, cursor, post_ids):
+        """Сниппет лучшего совпадения для каждого поста страницы."""
+        if not post_ids:
+            return {}
+        placeholders = ', '.join(['%s'] * len(post_ids))
+        # snippet() считается только для строк, прошедших WHERE, то есть
+        # для совпадений в постах этой страницы.
+        cursor.execute(
+            f'''
+            SELECT post_id, snippet({TABLE}, 0, %s, %s, %s, {SNIPPET_TOKENS})
+            FROM {TABLE} WHERE {TABLE} MATCH %s
+              AND post_id IN ({placeholders})
+            ORDER BY rank DESC
+            ''',
+            [_START, _END, '…', self.expression, *post_ids],
+        )
+        # Строки идут от худшей к лучшей: остаётся сниппет лучшей.
+        return dict(cursor.fetchall())
+
+
+def search(request, query, per_page):
+    """Страница результатов поиска ``query`` по параметрам запроса."""
+    paginator = SearchPaginator(query, per_page)
+    return paginator.get_page(
+        request.GET.get(PAGE_PARAM), request.GET.get(CURSOR_PARAM)
+    )
@@ -0,0 +1,169 @@
+from django.db import connection, transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from core.cache import bump_versions
+
+from . import counters, rankings, thumbnails, timeline
+from .cache import (DIRECTORY, follow_namespace, group_namespace,
+                    invalidate_post, user_namespace)
+from .models import Comment, Follow, Group, Post
+
+
+def _twice(invalidate, *args, **kwargs):
+    invalidate(*args, **kwargs)
+    if connection.in_atomic_block:
+        # Повторный сдвиг после фиксации: иначе параллельный запрос
+        # мог успеть собрать фрагмент из ещё не видимых ему данных.
+        transaction.on_commit(lambda: invalidate(*args, **kwargs))
+
+
+def invalidate_feeds(author_id, *group_ids, post_id=None):
+    _twice(invalidate_post, author_id, *group_ids, post_id=post_id)
+
+
+@receiver(pre_save, sender=Post)
+def remember_previous_values(sender, instance, **kwargs):
+    previous = None
+    if instance.pk:
+        previous = (
+            Post.objects.filter(pk=instance.pk)
+            .values('group_id', 'image').first()
+        )
+    previous = previous or {}
+    instance._previous_group_id = previous.get('group_id')
+    instance._previous_image = previous.get('image')
+    if (instance.image.name or '') != (instance._previous_image or ''):
+        # Варианты старой картинки новой не подходят.
+        instance.renditions = ''
+
+
+@receiver(post_save, sender=Post)
+def fan_out_post(sender, instance, created, **kwargs):
+    if created and timeline.is_enabled():
+        timeline.fan_out(instance)
+
+
+@receiver(post_save, sender=Post)
+def count_post(sender, instance, created, **kwargs):
+    if created:
+        counters.bump_user(instance.author_id, posts=1)
+
+
+@receiver(post_delete, sender=Post)
+def uncount_post(sender, instance, **kwargs):
+    counters.bump_user(instance.author_id, posts=-1)
+
+
+@receiver(post_save, sender=Post)
+def enqueue_thumbnails(sender, instance, **kwargs):
+    name = instance.image.name if instance.image else ''
+    if name and name != getattr(instance, '_previous_image', None):
+        thumbnails.enqueue_on_commit(name)
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def invalidate_post_feeds(sender, instance, **kwargs):
+    invalidate_feeds(
+        instance.author_id,
+        instance.group_id,
+        getattr(instance, '_previous_group_id', None),
+        post_id=instance.pk,
+    )
+
+
+@receiver(post_save, sender=Post)
+def invalidate_directory(sender, instance, created, **kwargs):
+    # Каталог считает посты групп: важны появление поста в группе и
+    # переход между группами, а не правка текста.
+    previous = (None if created
+                else getattr(instance, '_previous_group_id', None))
+    if instance.group_id != previous:
+        _twice(bump_versions, DIRECTORY)
+
+
+@receiver(post_delete, sender=Post)
+def invalidate_directory_on_delete(sender, instance, **kwargs):
+    if instance.group_id:
+        _twice(bump_versions, DIRECTORY)
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def invalidate_directory_groups(sender, instance, **kwargs):
+    # Название и описание видны и на странице самой группы.
+    _twice(bump_versions, DIRECTORY, group_namespace(instance.pk))
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def invalidate_comment_feeds(sender, instance, **kwargs):
+    # В лентах показывается число комментариев к посту.
+    post = (
+        Post.objects.filter(pk=instance.post_id)
+        .values('author_id', 'group_id').first()
+    )
+    if post:
+        invalidate_feeds(post['author_id'], post['group_id'],
+                         post_id=instance.post_id)
+
+
+@receiver(post_save, sender=Comment)
+def count_comment(sender, instance, created, **kwargs):
+    if created:
+        counters.bump_comments(instance.post_id, 1)
+
+
+@receiver(post_delete, sender=Comment)
+def uncount_comment(sender, instance, **kwargs):
+    counters.bump_comments(instance.post_id, -1)
+
+
+@receiver(post_save, sender=Post)
+def rank_post(sender, instance, **kwargs):
+    rankings.record_post(instance)
+
+
+@receiver(post_save, sender=Comment)
+def rank_comment(sender, instance, created, **kwargs):
+    if created:
+        rankings.record_comment(instance, 1)
+
+
+@receiver(post_delete, sender=Comment)
+def unrank_comment(sender, instance, **kwargs):
+    rankings.record_comment(instance, -1)
+
+
+@receiver(post_save, sender=Follow)
+def count_follow(sender, instance, created, **kwargs):
+    if created:
+        counters.bump_user(instance.user_id, following=1)
+        counters.bump_user(instance.author_id, followers=1)
+
+
+@receiver(post_delete, sender=Follow)
+def uncount_follow(sender, instance, **kwargs):
+    counters.bump_user(instance.user_id, following=-1)
+    counters.bump_user(instance.author_id, followers=-1)
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def invalidate_follow_feed(sender, instance, **kwargs):
+    bump_versions(follow_namespace(instance.user_id),
+                  user_namespace(instance.user_id),
+                  user_namespace(instance.author_id))
+
+
+@receiver(post_save, sender=Follow)
+def backfill_timeline(sender, instance, created, **kwargs):
+    if created and timeline.is_enabled():
+        timeline.backfill(instance.user, instance.author)
+
+
+@receiver(post_delete, sender=Follow)
+def prune_timeline(sender, instance, **kwargs):
+    if timeline.is_enabled():
+        timeline.prune(instance.user, instance.author)
@@ -0,0 +1,143 @@
+"""Ленты Atom и JSON Feed: главная, группы и авторы.
+
+Ленты опрашивают роботы и агрегаторы — часто и почти всегда впустую.
+На неизменившуюся ленту отвечает условный GET (``posts.conditional``).
+Если лента изменилась, из той же выборки ``for_feed()`` сначала берутся
+только ключи последних ``SYNDICATION_SIZE`` постов с именами авторов и
+названиями групп. Готовые записи обоих
+форматов лежат в кэше под версией поста (``post_namespace``): из базы
+дочитываются и сериализуются лишь новые и изменённые посты.
+"""
+import hashlib
+import io
+import json
+
+from django.conf import settings
+from django.http import HttpResponse
+from django.urls import reverse
+from django.utils.feedgenerator import Atom1Feed
+from django.utils.html import escape, linebreaks
+from django.utils.text import Truncator
+from django.utils.xmlutils import SimplerXMLGenerator
+
+from core.cache import HIT, MISS, get_cache, get_versions, record
+
+from .cache import post_namespace
+
+FORMATS = {
+    'atom': 'application/atom+xml; charset=utf-8',
+    'json': 'application/feed+json; charset=utf-8',
+}
+JSON_FEED_VERSION = 'https://jsonfeed.org/version/1.1'
+ENTRY_PREFIX = 'syndication:'
+TITLE_LENGTH = 60
+
+
+class CachedAtomFeed(Atom1Feed):
+    """Atom, в который записи вставляются готовыми фрагментами XML."""
+
+    def write_items(self, handler):
+        for item in self.items:
+            handler.ignorableWhitespace(item['atom'])
+
+
+def _atom_entry(item):
+    feed = Atom1Feed('', '', '')
+    feed.add_item(**item)
+    stream = io.StringIO()
+    handler = SimplerXMLGenerator(stream, 'utf-8')
+    handler.startElement('entry', {})
+    feed.add_item_elements(handler, feed.items[0])
+    handler.endElement('entry')
+    return stream.getvalue()
+
+
+def serialize(request, post):
+    """Запись поста сразу в обоих форматах."""
+    link = request.build_absolute_uri(
+        reverse('posts:post_detail', args=[post.pk])
+    )
+    author_link = request.build_absolute_uri(
+        reverse('posts:profile', args=[post.author.username])
+    )
+    author_name = post.author.get_full_name() or post.author.username
+    title = Truncator(post.text).chars(TITLE_LENGTH)
+    content = linebreaks(escape(post.text))
+    image = request.build_absolute_uri(post.image.url) if post.image else None
+    categories = [post.group.title] if post.group else []
+    item = {
+        'id': link,
+        'url': link,
+        'title': title,
+        'content_html': content,
+        'date_published': post.pub_date.isoformat(),
+        'authors': [{'name': author_name, 'url': author_link}],
+    }
+    if image:
+        item['image'] = image
+    if categories:
+        item['tags'] = categories
+    return {
+        'pubdate': post.pub_date,
+        'json': item,
+        'atom': _atom_entry({
+            'title': title, 'link': link, 'unique_id': link,
+            'description': content, 'pubdate': post.pub_date,
+            'author_name': author_name, 'author_link': author_link,
+            'categories': categories,
+        }),
+    }
+
+
+def entries(request, posts):
+    """Записи последних постов выборки ``posts`` из кэша или заново."""
+    rows = posts.values_list(
+        'pk', 'author__username', 'author__first_name', 'author__last_name',
+        'group__title',
+    )[:settings.SYNDICATION_SIZE]
+    # Имя автора и название группы сигналы поста не сдвигают, поэтому
+    # они входят в ключ записи: переименование даёт новую запись.
+    names = {pk: hashlib.md5(repr(row).encode()).hexdigest()
+             for pk, *row in rows}
+    ids = list(names)
+    versions = get_versions([post_namespace(pk) for pk in ids])
+    # Ссылки в записях абсолютные, поэтому ключ зависит и от адреса сайта.
+    origin = request.build_absolute_uri('/')
+    keys = {pk: f'{ENTRY_PREFIX}{origin}:{pk}:{version}:{names[pk]}'
+            for pk, version in zip(ids, versions)}
+    cache = get_cache()
+    found = cache.get_many(list(keys.values()))
+    missing = [pk for pk in ids if keys[pk] not in found]
+    for pk in ids:
+        record('syndication', MISS if pk in missing else HIT)
+    if missing:
+        built = {keys[post.pk]: serialize(request, post)
+                 for post in posts.filter(pk__in=missing)}
+        cache.set_many(built, settings.FEED_CACHE_TIMEOUT)
+        found.update(built)
+    # Пост, удалённый между запросами, просто пропускается.
+    return [found[keys[pk]] for pk in ids if keys[pk] in found]
+
+
+def render(request, feed_format, title, link, posts, description=''):
+    """Ответ с лентой ``posts`` в формате ``feed_format``."""
+    items = entries(request, posts)
+    link = request.build_absolute_uri(link)
+    feed_url = request.build_absolute_uri(request.path)
+    if feed_format == 'json':
+        body = json.dumps({
+            'version': JSON_FEED_VERSION,
+            'title': title,
+            'home_page_url': link,
+            'feed_url': feed_url,
+            'description': description,
+            'language': settings.LANGUAGE_CODE,
+            'items': [item['json'] for item in items],
+        }, ensure_ascii=False)
+    else:
+        feed = CachedAtomFeed(title=title, link=link,
+                              description=description, feed_url=feed_url,
+                              language=settings.LANGUAGE_CODE)
+        feed.items = items
+        body = feed.writeString('utf-8')
+    return HttpResponse(body, content_type=FORMATS[feed_format])
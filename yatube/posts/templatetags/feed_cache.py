@@ -0,0 +1,57 @@
+import hashlib
+
+from django import template
+from django.conf import settings
+
+from core.cache import get_or_build, get_versions
+from core.paginator import CURSOR_PARAM, PAGE_PARAM
+from posts.cache import feed_namespaces
+
+register = template.Library()
+
+
+class FeedCacheNode(template.Node):
+    def __init__(self, nodelist, feed, key, vary_on):
+        self.nodelist = nodelist
+        self.feed = feed
+        self.key = key
+        self.vary_on = vary_on
+
+    def render(self, context):
+        feed = self.feed.resolve(context)
+        key = self.key.resolve(context) if self.key else None
+        vary_on = ':'.join(str(var.resolve(context)) for var in self.vary_on)
+        request = context['request']
+        position = (request.GET.get(CURSOR_PARAM)
+                    or request.GET.get(PAGE_PARAM) or '1')
+        digest = hashlib.md5(f'{position}:{vary_on}'.encode()).hexdigest()
+        return get_or_build(
+            f'fragment:{feed}:{key}:{digest}',
+            get_versions(feed_namespaces(feed, key)),
+            lambda: self.nodelist.render(context),
+            timeout=settings.FEED_CACHE_TIMEOUT,
+            name=f'fragment:{feed}',
+        )
+
+
+@register.tag
+def feed_cache(parser, token):
+    """Кэширует фрагмент ленты до изменения её постов.
+
+    {% feed_cache 'group' group.pk %} ... {% endfeed_cache %}
+
+    Ключ фрагмента складывается из названия ленты, её ключа (группа,
+    автор, читатель ленты подписок), курсора или номера страницы и
+    остальных аргументов тега, от которых зависит разметка.
+    """
+    bits = token.split_contents()
+    if len(bits) < 2:
+        raise template.TemplateSyntaxError(
+            f"'{bits[0]}' принимает название ленты и её ключ."
+        )
+    nodelist = parser.parse(('endfeed_cache',))
+    parser.delete_first_token()
+    key = parser.compile_filter(bits[2]) if len(bits) > 2 else None
+    vary_on = [parser.compile_filter(bit) for bit in bits[3:]]
+    return FeedCacheNode(nodelist, parser.compile_filter(bits[1]), key,
+                         vary_on)
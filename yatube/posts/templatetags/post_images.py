@@ -0,0 +1,45 @@
+from django import template
+
+from posts import renditions, thumbnails
+
+register = template.Library()
+
+
+@register.simple_tag
+def prefetch_thumbnails(posts):
+    """Ищет миниатюры постов страницы одним запросом к хранилищу.
+
+    {% prefetch_thumbnails page_obj %}
+
+    Нужно только постам, для картинок которых ещё нет вариантов:
+    недостающие варианты ставятся в очередь одной задачей, а найденные
+    миниатюры запоминаются в постах для тега ``post_image``.
+    """
+    posts = [post for post in posts if post.image and not post.renditions]
+    geometry, options = thumbnails.FEED_THUMBNAIL
+    ready = thumbnails.get_ready_many(
+        [post.image for post in posts], geometry, options
+    )
+    thumbnails.enqueue_many(post.image.name for post in posts)
+    for post in posts:
+        post.feed_thumbnail = ready[post.image.name]
+    return ''
+
+
+@register.inclusion_tag('posts/includes/post_image.html')
+def post_image(post):
+    """Картинка поста: варианты для srcset, миниатюра или исходник."""
+    if not post.image:
+        return {}
+    picture = renditions.picture(post.renditions)
+    if picture is not None:
+        return {'picture': picture}
+    if hasattr(post, 'feed_thumbnail'):
+        thumbnail = post.feed_thumbnail
+    else:
+        geometry, options = thumbnails.FEED_THUMBNAIL
+        thumbnail = thumbnails.get_ready(post.image, geometry, options)
+        thumbnails.enqueue(post.image.name)
+    if thumbnail is None:
+        return {'url': post.image.url}
+    return {'url': thumbnail.url}
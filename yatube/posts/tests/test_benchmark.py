@@ -0,0 +1,55 @@
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from posts import benchmark
+from posts.models import Comment, Follow, Post, User
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_WORKERS=0)
+class BenchmarkTest(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_percentile(self):
+        values = list(range(1, 101))
+        self.assertEqual(benchmark.percentile(values, 50), 50)
+        self.assertEqual(benchmark.percentile(values, 99), 99)
+        self.assertEqual(benchmark.percentile([7], 95), 7)
+        self.assertEqual(benchmark.percentile([], 95), 0)
+
+    def test_seed_and_run(self):
+        """Данные наполняются по параметрам, а замер даёт сводку по
+        каждому представлению без ошибок."""
+        dataset = benchmark.seed(users=10, groups=2, posts=30, comments=40,
+                                 image_share=0.2, follows=3)
+        self.assertEqual(User.objects.count(), 10)
+        self.assertEqual(Post.objects.count(), 30)
+        self.assertEqual(Comment.objects.count(), 40)
+        self.assertEqual(Follow.objects.count(), dataset['follows'])
+        self.assertTrue(Post.objects.exclude(image='').exists())
+        results = benchmark.run(requests=5, warmup=1)
+        self.assertEqual(set(results), set(benchmark.VIEWS))
+        for view, summary in results.items():
+            with self.subTest(view=view):
+                self.assertEqual(summary['errors'], 0)
+                self.assertLessEqual(summary['p50_ms'], summary['p99_ms'])
+                self.assertGreaterEqual(summary['queries_mean'], 1)
+
+    def test_compare(self):
+        lines = benchmark.compare(
+            {'index': {'p50_ms': 10, 'p95_ms': 20}},
+            {'index': {'p50_ms': 5, 'p95_ms': 20}, 'profile': {}},
+        )
+        self.assertEqual(len(lines), 2)
+        self.assertIn('-50%', lines[0])
@@ -0,0 +1,53 @@
+import os
+import tempfile
+
+from django.test import TestCase
+
+from core.cache import (LOCK_SUFFIX, bump_versions, get_cache, get_or_build,
+                        get_versions)
+from core.cache_backends import SQLiteCache
+
+
+class FeedVersionTest(TestCase):
+    def setUp(self):
+        get_cache().clear()
+
+    def test_bump_changes_only_given_namespace(self):
+        index, group = get_versions(['feed:index', 'feed:group:1'])
+        self.assertEqual(get_versions(['feed:index']), (index,))
+        bump_versions('feed:group:1')
+        self.assertEqual(get_versions(['feed:index']), (index,))
+        self.assertNotEqual(get_versions(['feed:group:1']), (group,))
+
+    def test_stale_value_served_while_rebuilding(self):
+        self.assertEqual(get_or_build('key', 1, lambda: 'старое'), 'старое')
+        self.assertEqual(get_or_build('key', 1, lambda: 'новое'), 'старое')
+        # Пока другой процесс держит блокировку, отдаётся старая копия.
+        get_cache().add('key' + LOCK_SUFFIX, True)
+        self.assertEqual(get_or_build('key', 2, lambda: 'новое'), 'старое')
+        get_cache().delete('key' + LOCK_SUFFIX)
+        self.assertEqual(get_or_build('key', 2, lambda: 'новое'), 'новое')
+
+
+class SQLiteCacheTest(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.location = os.path.join(directory.name, 'cache.sqlite3')
+        self.cache = SQLiteCache(self.location, {'TIMEOUT': 60})
+
+    def test_values_shared_between_instances(self):
+        self.cache.set_many({'a': 1, 'b': [2]})
+        # Другой процесс открывает тот же файл своим экземпляром.
+        other = SQLiteCache(self.location, {'TIMEOUT': 60})
+        self.assertEqual(other.get_many(['a', 'b', 'c']), {'a': 1, 'b': [2]})
+        self.assertEqual(other.incr('a', 2), 3)
+        self.assertEqual(self.cache.get('a'), 3)
+
+    def test_add_and_expiry(self):
+        self.assertTrue(self.cache.add('lock', 1))
+        self.assertFalse(self.cache.add('lock', 2))
+        self.cache.set('lock', 1, timeout=-1)
+        self.assertIsNone(self.cache.get('lock'))
+        self.assertTrue(self.cache.add('lock', 3))
+        self.assertEqual(self.cache.get('lock'), 3)
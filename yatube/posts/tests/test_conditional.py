@@ -0,0 +1,126 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from core.cache import bump_versions, get_cache
+from posts.cache import INDEX
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+@override_settings(CONDITIONAL_GET=True)
+class ConditionalResponseTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.group = Group.objects.create(title='Коты', slug='cats',
+                                         description='Про котов')
+        cls.leo = User.objects.create_user(username='leo')
+        cls.anna = User.objects.create_user(username='anna')
+        cls.post = Post.objects.create(author=cls.leo, group=cls.group,
+                                       text='Пост')
+
+    def setUp(self):
+        cache.clear()
+        get_cache().clear()
+
+    def revalidate(self, url, response):
+        return self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+
+    def test_not_modified_skips_view(self):
+        urls = {
+            reverse('posts:index'): 0,
+            reverse('posts:group_posts', args=['cats']): 1,
+            reverse('posts:profile', args=['leo']): 1,
+            reverse('posts:post_detail', args=[self.post.pk]): 1,
+        }
+        for url, queries in urls.items():
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+                self.assertIn('no-cache', response['Cache-Control'])
+                with self.assertNumQueries(queries):
+                    again = self.revalidate(url, response)
+                self.assertEqual(again.status_code, 304)
+                self.assertEqual(again.content, b'')
+
+    def test_if_modified_since(self):
+        url = reverse('posts:index')
+        with mock.patch('core.cache.time.time', return_value=1000.7):
+            bump_versions(INDEX)
+        response = self.client.get(url)
+        self.assertEqual(response['Last-Modified'],
+                         'Thu, 01 Jan 1970 00:16:40 GMT')
+        again = self.client.get(
+            url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified']
+        )
+        self.assertEqual(again.status_code, 304)
+
+    def test_no_last_modified_within_second(self):
+        """Правка в ту же секунду не должна получить 304 по дате."""
+        url = reverse('posts:index')
+        with mock.patch('core.cache.time.time', return_value=1000.2), \
+                mock.patch('posts.conditional.time.time',
+                           return_value=1000.5):
+            response = self.client.get(url)
+        self.assertIn('ETag', response)
+        self.assertNotIn('Last-Modified', response)
+
+    def test_new_post_changes_feeds(self):
+        urls = [reverse('posts:index'),
+                reverse('posts:group_posts', args=['cats']),
+                reverse('posts:profile', args=['leo'])]
+        responses = {url: self.client.get(url) for url in urls}
+        Post.objects.create(author=self.leo, group=self.group, text='Новый')
+        for url, response in responses.items():
+            with self.subTest(url=url):
+                again = self.revalidate(url, response)
+                self.assertEqual(again.status_code, 200)
+                self.assertContains(again, 'Новый')
+
+    def test_comment_changes_post_page(self):
+        url = reverse('posts:post_detail', args=[self.post.pk])
+        response = self.client.get(url)
+        Comment.objects.create(post=self.post, author=self.anna,
+                               text='Мяу')
+        again = self.revalidate(url, response)
+        self.assertEqual(again.status_code, 200)
+        self.assertContains(again, 'Мяу')
+
+    def test_other_post_keeps_post_page(self):
+        url = reverse('posts:post_detail', args=[self.post.pk])
+        response = self.client.get(url)
+        Post.objects.create(author=self.anna, text='Чужой')
+        self.assertEqual(self.revalidate(url, response).status_code, 304)
+
+    def test_follow_changes_profile(self):
+        url = reverse('posts:profile', args=['leo'])
+        self.client.force_login(self.anna)
+        response = self.client.get(url)
+        Follow.objects.create(user=self.anna, author=self.leo)
+        self.assertEqual(self.revalidate(url, response).status_code, 200)
+
+    def test_etag_depends_on_viewer(self):
+        url = reverse('posts:index')
+        response = self.client.get(url)
+        self.client.force_login(self.anna)
+        self.assertEqual(self.revalidate(url, response).status_code, 200)
+
+    def test_missing_object(self):
+        response = self.client.get(
+            reverse('posts:group_posts', args=['nope'])
+        )
+        self.assertEqual(response.status_code, 404)
+        self.assertFalse(response.has_header('ETag'))
+
+
+class ConditionalDisabledTest(TestCase):
+    @override_settings(CONDITIONAL_GET=False)
+    def test_plain_response(self):
+        response = self.client.get(reverse('posts:index'))
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('ETag', response)
+        self.assertNotIn('Last-Modified', response)
@@ -0,0 +1,111 @@
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db.models import F
+from django.test import TestCase, TransactionTestCase
+from django.urls import reverse
+
+from posts.counters import for_user
+from posts.forms import PostForm
+from posts.models import Comment, Follow, Post, UserCounter
+
+User = get_user_model()
+
+
+class CountersTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+
+    def counters(self, user):
+        return for_user(User.objects.get(pk=user.pk))
+
+    def test_counters_follow_changes(self):
+        """Счётчики меняются при создании и удалении объектов."""
+        post = Post.objects.create(author=self.author, text='Пост')
+        comment = Comment.objects.create(post=post, author=self.reader,
+                                         text='Комментарий')
+        follow = Follow.objects.create(user=self.reader, author=self.author)
+        post.refresh_from_db()
+        self.assertEqual(post.comment_count, 1)
+        self.assertEqual(self.counters(self.author).posts, 1)
+        self.assertEqual(self.counters(self.author).followers, 1)
+        self.assertEqual(self.counters(self.reader).following, 1)
+
+        comment.delete()
+        follow.delete()
+        post.refresh_from_db()
+        self.assertEqual(post.comment_count, 0)
+        self.assertEqual(self.counters(self.author).followers, 0)
+        self.assertEqual(self.counters(self.reader).following, 0)
+        post.delete()
+        self.assertEqual(self.counters(self.author).posts, 0)
+
+    def test_reconcile_fixes_drift(self):
+        """Команда reconcile_counters пересчитывает разошедшиеся счётчики."""
+        post = Post.objects.create(author=self.author, text='Пост')
+        Comment.objects.create(post=post, author=self.reader, text='Ок')
+        Follow.objects.create(user=self.reader, author=self.author)
+        UserCounter.objects.filter(user=self.author).update(posts=7,
+                                                            followers=0)
+        Post.objects.filter(pk=post.pk).update(comment_count=5)
+        UserCounter.objects.filter(user=self.reader).delete()
+        out = StringIO()
+        call_command('reconcile_counters', stdout=out)
+        self.assertIn('пользователей 2', out.getvalue())
+        self.assertEqual(self.counters(self.author).posts, 1)
+        self.assertEqual(self.counters(self.author).followers, 1)
+        self.assertEqual(self.counters(self.reader).following, 1)
+        post.refresh_from_db()
+        self.assertEqual(post.comment_count, 1)
+
+    def test_edit_keeps_concurrent_counters(self):
+        """Правка поста не затирает счётчик и варианты, записанные
+        после того, как пост был прочитан."""
+        post = Post.objects.create(author=self.author, text='Пост')
+        is_valid = PostForm.is_valid
+
+        def concurrent_update(form):
+            Post.objects.filter(pk=post.pk).update(
+                comment_count=F('comment_count') + 1, renditions='{}'
+            )
+            return is_valid(form)
+
+        self.client.force_login(self.author)
+        with mock.patch.object(PostForm, 'is_valid', concurrent_update):
+            self.client.post(reverse('posts:post_edit', args=[post.pk]),
+                             {'text': 'Правка', 'rating': 5})
+        post.refresh_from_db()
+        self.assertEqual(post.text, 'Правка')
+        self.assertEqual(post.comment_count, 1)
+        self.assertEqual(post.renditions, '{}')
+
+    def test_profile_shows_counters(self):
+        """Профиль показывает счётчики вместо заглушек."""
+        Post.objects.create(author=self.author, text='Пост')
+        Follow.objects.create(user=self.reader, author=self.author)
+        response = self.client.get(
+            reverse('posts:profile', kwargs={'username': 'author'})
+        )
+        self.assertContains(response, 'Подписчиков: 1')
+        self.assertContains(response, 'Подписан: 0')
+        self.assertContains(response, 'Записей: 1')
+
+
+class DeleteUserCountersTest(TransactionTestCase):
+    def test_delete_user_with_posts_and_follows(self):
+        """Удаление автора не заводит заново его строку счётчиков."""
+        author = User.objects.create_user(username='author')
+        reader = User.objects.create_user(username='reader')
+        Post.objects.create(author=author, text='Пост')
+        Follow.objects.create(user=reader, author=author)
+        Follow.objects.create(user=author, author=reader)
+        author_id = author.pk
+        author.delete()
+        self.assertFalse(UserCounter.objects.filter(user_id=author_id)
+                         .exists())
+        counters = for_user(User.objects.get(pk=reader.pk))
+        self.assertEqual((counters.followers, counters.following), (0, 0))
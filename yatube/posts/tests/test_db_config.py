@@ -0,0 +1,74 @@
+import os
+import shutil
+import tempfile
+
+from django.db import OperationalError
+from django.test import SimpleTestCase
+
+from core.db_config import PROFILES, build_databases
+from core.sqlite.base import DatabaseWrapper
+
+
+class DatabaseProfileTest(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+
+    def connect(self, profile):
+        settings = build_databases(
+            profile, os.path.join(self.directory, 'db.sqlite3')
+        )['default']
+        settings.update({'AUTOCOMMIT': True, 'ATOMIC_REQUESTS': False,
+                         'OPTIONS': {}, 'TIME_ZONE': None})
+        connection = DatabaseWrapper(settings, alias='profile')
+        self.addCleanup(connection.close)
+        return connection
+
+    def pragma(self, connection, name):
+        with connection.cursor() as cursor:
+            cursor.execute(f'PRAGMA {name}')
+            return cursor.fetchone()[0]
+
+    def test_unknown_profile(self):
+        with self.assertRaises(ValueError):
+            build_databases('fast', 'db.sqlite3')
+
+    def test_production_pragmas(self):
+        """Прагмы профиля выполняются на каждом новом соединении."""
+        connection = self.connect('production')
+        self.assertEqual(self.pragma(connection, 'journal_mode'), 'wal')
+        self.assertEqual(self.pragma(connection, 'synchronous'), 1)
+        self.assertEqual(
+            self.pragma(connection, 'busy_timeout'),
+            PROFILES['production']['PRAGMAS']['busy_timeout'],
+        )
+        self.assertEqual(
+            self.connect('default').settings_dict['CONN_MAX_AGE'], 0
+        )
+
+    def test_immediate_transactions(self):
+        """Транзакция сразу берёт блокировку записи: второй писатель
+        узнаёт о ней на BEGIN, а не посреди своей транзакции."""
+        first, second = self.connect('production'), self.connect('production')
+        second.settings_dict['PRAGMAS'] = {'busy_timeout': 0}
+        first.ensure_connection()
+        first._start_transaction_under_autocommit()
+        self.addCleanup(first.rollback)
+        with self.assertRaisesMessage(OperationalError, 'locked'):
+            second._start_transaction_under_autocommit()
+
+    def test_deferred_transactions_by_default(self):
+        """Без профиля BEGIN отложенный: обе транзакции открываются, и
+        ни одна ещё не держит блокировку записи."""
+        first, second = self.connect('default'), self.connect('default')
+        first._start_transaction_under_autocommit()
+        self.addCleanup(first.rollback)
+        second._start_transaction_under_autocommit()
+        self.addCleanup(second.rollback)
+        self.assertTrue(first.connection.in_transaction)
+        self.assertTrue(second.connection.in_transaction)
+        writer = self.connect('default')
+        writer.ensure_connection()
+        writer.connection.execute('PRAGMA busy_timeout = 0')
+        writer.connection.execute('BEGIN IMMEDIATE')
+        writer.connection.execute('ROLLBACK')
@@ -0,0 +1,109 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.contrib.sessions.models import Session
+from django.core.cache import cache
+from django.test import Client, SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from core import db_router
+from core.cache import cache_stats, get_cache
+from posts.models import Post
+
+User = get_user_model()
+
+
+@override_settings(DATABASE_REPLICAS=['replica_1', 'replica_2'])
+class ReplicaRouterTest(SimpleTestCase):
+    def setUp(self):
+        db_router._local.pinned = False
+        self.addCleanup(setattr, db_router._local, 'pinned', False)
+        self.router = db_router.ReplicaRouter()
+
+    def test_reads_outside_views_use_primary(self):
+        self.assertEqual(self.router.db_for_read(Post), 'default')
+
+    def test_read_replica_views(self):
+        with db_router.reading_replicas():
+            self.assertIn(self.router.db_for_read(Post),
+                          ('replica_1', 'replica_2'))
+
+    def test_users_and_sessions_read_primary(self):
+        """Ленивый request.user в шаблоне не уходит в реплику."""
+        with db_router.reading_replicas():
+            self.assertEqual(self.router.db_for_read(User), 'default')
+            self.assertEqual(self.router.db_for_read(Session), 'default')
+
+    def test_write_pins_to_primary(self):
+        """После записи поток читает основную базу."""
+        with db_router.reading_replicas():
+            self.assertEqual(self.router.db_for_write(Post), 'default')
+            self.assertEqual(self.router.db_for_read(Post), 'default')
+
+    def test_no_migrations_on_replicas(self):
+        self.assertTrue(self.router.allow_migrate('default', 'posts'))
+        self.assertFalse(self.router.allow_migrate('replica_1', 'posts'))
+
+
+# В тестах реплика — сама основная база, а чтение из реплики видно по
+# выбору псевдонима.
+@override_settings(DATABASE_REPLICAS=['default'])
+class ReplicaPinTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='auth')
+        cls.post = Post.objects.create(author=cls.user, text='Пост')
+
+    def setUp(self):
+        cache.clear()
+        get_cache().clear()
+        self.client = Client()
+        self.client.force_login(self.user)
+        patcher = mock.patch('core.db_router.random.choice',
+                             side_effect=lambda aliases: aliases[0])
+        self.choice = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_feeds_read_replicas(self):
+        for url in (reverse('posts:index'),
+                    reverse('posts:post_detail', args=[self.post.pk])):
+            with self.subTest(url=url):
+                self.choice.reset_mock()
+                self.assertEqual(self.client.get(url).status_code, 200)
+                self.assertTrue(self.choice.called)
+
+    def test_read_your_writes(self):
+        """После комментария перенаправление читает основную базу."""
+        response = self.client.post(
+            reverse('posts:add_comment', args=[self.post.pk]),
+            {'text': 'Комментарий'},
+        )
+        self.assertIn(db_router.PIN_COOKIE, response.cookies)
+        self.choice.reset_mock()
+        self.client.get(response.url)
+        self.assertFalse(self.choice.called)
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_no_pin_without_replicas(self):
+        response = self.client.post(
+            reverse('posts:add_comment', args=[self.post.pk]),
+            {'text': 'Комментарий'},
+        )
+        self.assertNotIn(db_router.PIN_COOKIE, response.cookies)
+
+    def test_fresh_version_not_cached_from_replica(self):
+        """Фрагмент из реплики под только что сдвинутой версией не
+        сохраняется: реплика могла не застать изменение."""
+        url = reverse('posts:index')
+
+        def hits():
+            return cache_stats().get('fragment:index', {}).get('hit', 0)
+
+        before = hits()
+        for _ in range(2):
+            self.client.get(url)
+        self.assertEqual(hits(), before)
+        with self.settings(REPLICA_PIN_SECONDS=0):
+            for _ in range(2):
+                self.client.get(url)
+        self.assertEqual(hits(), before + 1)
@@ -0,0 +1,101 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from core.cache import get_cache, get_versions
+from posts import directory
+from posts.cache import DIRECTORY
+from posts.models import Group, Post
+
+User = get_user_model()
+
+
+class GroupDirectoryTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.cats = Group.objects.create(title='Коты', slug='cats',
+                                        description='Про котов')
+        cls.dogs = Group.objects.create(title='Собаки', slug='dogs',
+                                        description='Про собак')
+        cls.leo = User.objects.create_user(username='leo',
+                                           first_name='Лев',
+                                           last_name='Толстой')
+        cls.anna = User.objects.create_user(username='anna')
+        for author in (cls.leo, cls.leo, cls.anna):
+            cls.last = Post.objects.create(author=author, group=cls.cats,
+                                           text='Пост')
+        Post.objects.create(author=cls.anna, text='Без группы')
+
+    def setUp(self):
+        cache.clear()
+        get_cache().clear()
+
+    def stats(self):
+        return {group['slug']: group for group in directory.groups()}
+
+    def test_stats(self):
+        stats = self.stats()
+        self.assertEqual(stats['cats']['post_count'], 3)
+        self.assertEqual(stats['cats']['last_activity'], self.last.pub_date)
+        self.assertEqual(
+            [(author['username'], author['name'], author['posts'])
+             for author in stats['cats']['top_authors']],
+            [('leo', 'Лев Толстой', 2), ('anna', 'anna', 1)],
+        )
+        self.assertEqual(stats['dogs']['post_count'], 0)
+        self.assertIsNone(stats['dogs']['last_activity'])
+        self.assertEqual(stats['dogs']['top_authors'], [])
+
+    def test_cached_until_group_changes(self):
+        """Каталог из кэша, пока посты не сменили группу."""
+        with self.assertNumQueries(2):
+            self.client.get(reverse('posts:groups'))
+        post = Post.objects.get(pk=self.last.pk)
+        post.text = 'Правка'
+        post.save()
+        with self.assertNumQueries(0):
+            self.assertEqual(self.stats()['cats']['post_count'], 3)
+        post.group = self.dogs
+        post.save()
+        stats = self.stats()
+        self.assertEqual(stats['cats']['post_count'], 2)
+        self.assertEqual(stats['dogs']['post_count'], 1)
+
+    def test_new_group_and_deleted_post(self):
+        self.stats()
+        Group.objects.create(title='Птицы', slug='birds', description='')
+        self.assertIn('birds', self.stats())
+        Post.objects.get(pk=self.last.pk).delete()
+        self.assertEqual(self.stats()['cats']['post_count'], 2)
+
+    def test_top_authors_limited(self):
+        for number in range(directory.TOP_AUTHORS + 1):
+            author = User.objects.create_user(username=f'dog{number}')
+            for _ in range(number + 1):
+                Post.objects.create(author=author, group=self.dogs,
+                                    text='Гав')
+        top = self.stats()['dogs']['top_authors']
+        self.assertEqual([author['username'] for author in top],
+                         ['dog3', 'dog2', 'dog1'])
+
+    def test_bumped_again_on_commit(self):
+        """После фиксации версия сдвигается ещё раз."""
+        callbacks = []
+        with mock.patch('posts.signals.transaction.on_commit',
+                        callbacks.append), \
+                mock.patch('core.cache.time.time', return_value=1.0):
+            Post.objects.create(author=self.anna, group=self.dogs,
+                                text='Гав')
+        self.assertEqual(get_versions([DIRECTORY]), (1.0,))
+        for callback in callbacks:
+            callback()
+        self.assertNotEqual(get_versions([DIRECTORY]), (1.0,))
+
+    def test_page(self):
+        response = self.client.get(reverse('posts:groups'))
+        url = reverse('posts:group_posts', args=['cats'])
+        self.assertContains(response, url)
+        self.assertContains(response, 'Лев Толстой')
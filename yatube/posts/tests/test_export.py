@@ -0,0 +1,62 @@
+import csv
+import json
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class ExportContentTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='leo')
+        cls.reader = User.objects.create_user(username='anna')
+        cls.staff = User.objects.create_user(username='staff', is_staff=True)
+        cls.group = Group.objects.create(title='Коты', slug='cats',
+                                         description='Про котов')
+        cls.post = Post.objects.create(author=cls.author, group=cls.group,
+                                       text='Пост про кота')
+        Comment.objects.create(post=cls.post, author=cls.reader,
+                               text='Мяу')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def export(self, *args):
+        out = StringIO()
+        call_command('export_content', *args, stdout=out)
+        return out.getvalue()
+
+    def test_command_exports_jsonl(self):
+        """Команда выгружает записи всех типов в формате импорта."""
+        records = [json.loads(line) for line in self.export().splitlines()]
+        self.assertEqual([record['type'] for record in records],
+                         ['group', 'post', 'comment', 'follow'])
+        post = records[1]
+        self.assertEqual(post['author'], 'leo')
+        self.assertEqual(post['group'], 'cats')
+        self.assertEqual(records[2]['post'], self.post.pk)
+
+    def test_since_limits_dated_records(self):
+        """--since отсекает старые посты и комментарии."""
+        output = self.export('post', 'comment', '--since', '2999-01-01')
+        self.assertEqual(output, '')
+
+    def test_streaming_csv_for_staff(self):
+        """Выгрузка по HTTP идёт потоком и доступна только персоналу."""
+        url = reverse('posts:export_content')
+        self.client.force_login(self.reader)
+        self.assertEqual(self.client.get(url).status_code, 302)
+        self.client.force_login(self.staff)
+        response = self.client.get(url, {'kind': 'post', 'format': 'csv'})
+        self.assertTrue(response.streaming)
+        rows = list(csv.DictReader(
+            b''.join(response.streaming_content).decode().splitlines()
+        ))
+        self.assertEqual([row['text'] for row in rows], ['Пост про кота'])
+        response = self.client.get(url, {'kind': 'secret'})
+        self.assertEqual(response.status_code, 400)
@@ -0,0 +1,125 @@
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+
+from posts.counters import for_user
+from posts.importer import Importer
+from posts.models import Comment, Group, Post
+
+User = get_user_model()
+
+
+class ImportPostsTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='leo')
+        cls.group = Group.objects.create(title='Коты', slug='cats',
+                                         description='Про котов')
+
+    def write(self, suffix, content):
+        handle, path = tempfile.mkstemp(suffix=suffix)
+        with os.fdopen(handle, 'w', encoding='utf-8') as stream:
+            stream.write(content)
+        self.addCleanup(os.remove, path)
+        return path
+
+    def run_import(self, path, *args):
+        out, err = StringIO(), StringIO()
+        call_command('import_posts', path, *args, stdout=out, stderr=err)
+        return out.getvalue(), err.getvalue()
+
+    def test_jsonl_import(self):
+        """Посты и комментарии пишутся пачками, даты сохраняются."""
+        records = [
+            {'type': 'post', 'id': 500, 'author': 'leo', 'group': 'cats',
+             'text': 'Импортированный кот', 'pub_date': '2020-01-02T03:04:05'},
+            {'type': 'post', 'author': 'anna', 'text': 'Новый автор'},
+            {'type': 'comment', 'post': 500, 'author': 'leo',
+             'text': 'Комментарий', 'created': '2020-01-03T00:00:00'},
+            {'type': 'comment', 'post': 999, 'author': 'leo', 'text': 'Нет'},
+            {'type': 'post', 'author': 'leo', 'group': 'dogs', 'text': 'Нет'},
+        ]
+        path = self.write('.jsonl', '\n'.join(
+            json.dumps(record) for record in records
+        ) + '\nне json\n')
+        cache_before = self.client.get(reverse('posts:index')).content
+        out, err = self.run_import(path, '--batch-size', '2',
+                                   '--create-authors')
+        self.assertIn('Постов: 2, комментариев: 1, пропущено: 3', out)
+        self.assertIn('Запись 6 пропущена', err)
+        post = Post.objects.get(pk=500)
+        self.assertEqual(post.pub_date.year, 2020)
+        self.assertEqual(post.group, self.group)
+        self.assertEqual(post.comment_count, 1)
+        self.assertEqual(Comment.objects.get().created.day, 3)
+        self.assertEqual(for_user(User.objects.get(username='leo')).posts, 1)
+        self.assertTrue(User.objects.filter(username='anna').exists())
+        # Ленты и поиск видят импортированные посты.
+        index = self.client.get(reverse('posts:index')).content
+        self.assertNotEqual(index, cache_before)
+        self.assertIn('Новый автор', index.decode())
+        response = self.client.get(reverse('posts:search'), {'q': 'кот'})
+        self.assertEqual([found.pk for found in response.context['page_obj']],
+                         [500])
+
+    def test_csv_import_skips_unknown_authors(self):
+        """Без --create-authors записи неизвестных авторов пропускаются."""
+        path = self.write('.csv', 'type,author,group,text\n'
+                                  'post,leo,cats,Из CSV\n'
+                                  'post,ghost,,Призрак\n')
+        out, err = self.run_import(path)
+        self.assertIn('Постов: 1', out)
+        self.assertIn('Неизвестный автор: ghost', err)
+        self.assertEqual(Post.objects.get().text, 'Из CSV')
+
+    def test_csv_ids_and_comments(self):
+        """id из CSV — строки: комментарии к постам того же файла
+        не теряются, а занятый id пропускает лишь свою запись."""
+        Post.objects.create(pk=700, author=self.author, text='Уже есть')
+        path = self.write('.csv', 'type,id,post,author,text\n'
+                                  'post,10,,leo,Из CSV\n'
+                                  'comment,,10,leo,К посту из CSV\n'
+                                  'post,700,,leo,Занят\n'
+                                  'post,x,,leo,Плохой id\n')
+        out, err = self.run_import(path)
+        self.assertIn('Постов: 1, комментариев: 1, пропущено: 2', out)
+        self.assertIn('Запись 3 пропущена: Пост 700 уже есть', err)
+        self.assertIn('Запись 4 пропущена: Неверный id: x', err)
+        self.assertEqual(Comment.objects.get().post_id, 10)
+        self.assertEqual(Post.objects.get(pk=700).text, 'Уже есть')
+
+    def test_duplicate_ids_skipped(self):
+        """Занятый или повторный id пропускает запись, а не импорт."""
+        Post.objects.create(pk=700, author=self.author, text='Уже есть')
+        records = [
+            {'type': 'post', 'id': 700, 'author': 'leo', 'text': 'Занят'},
+            {'type': 'post', 'id': 701, 'author': 'leo', 'text': 'Первый'},
+            {'type': 'post', 'id': 701, 'author': 'leo', 'text': 'Повтор'},
+        ]
+        path = self.write('.jsonl', '\n'.join(
+            json.dumps(record) for record in records
+        ))
+        out, err = self.run_import(path)
+        self.assertIn('Постов: 1, комментариев: 0, пропущено: 2', out)
+        self.assertIn('Запись 1 пропущена: Пост 700 уже есть', err)
+        self.assertEqual(Post.objects.get(pk=701).text, 'Первый')
+        self.assertEqual(for_user(User.objects.get(pk=self.author.pk)).posts,
+                         2)
+
+    def test_signals_replayed_after_failure(self):
+        """Прерванный импорт всё равно учитывает записанные пачки."""
+        def records():
+            yield {'type': 'post', 'author': 'leo', 'text': 'Записан'}
+            raise OSError('Файл обрезан')
+
+        importer = Importer(batch_size=1)
+        with self.assertRaises(OSError):
+            importer.run(records())
+        self.assertEqual(for_user(User.objects.get(pk=self.author.pk)).posts,
+                         1)
@@ -0,0 +1,52 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from core.metrics import registry
+from posts.models import Post
+
+User = get_user_model()
+
+
+class MetricsTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='auth')
+        cls.staff = User.objects.create_user(username='staff', is_staff=True)
+        Post.objects.create(author=cls.user, text='Пост')
+
+    def setUp(self):
+        cache.clear()
+        registry.clear()
+
+    def test_server_timing_header(self):
+        """Ответ несёт разбивку времени по частям."""
+        response = self.client.get(reverse('posts:index'))
+        timing = response['Server-Timing']
+        for part in ('total;dur=', 'db;dur=', 'tpl;dur=', 'cache;desc='):
+            with self.subTest(part=part):
+                self.assertIn(part, timing)
+        self.assertIn('1 queries', timing)
+
+    def test_metrics_endpoint(self):
+        """Гистограммы по представлениям видны персоналу в формате
+        Prometheus."""
+        self.client.get(reverse('posts:index'))
+        self.client.get(reverse('posts:index'))
+        self.assertEqual(self.client.get(reverse('metrics')).status_code,
+                         302)
+        self.client.force_login(self.staff)
+        body = self.client.get(reverse('metrics')).content.decode()
+        self.assertIn('# TYPE yatube_request_seconds histogram', body)
+        self.assertIn(
+            'yatube_request_seconds_count{view="posts:index"} 2', body
+        )
+        self.assertIn(
+            'yatube_request_db_queries_bucket{view="posts:index",le="1"} 2',
+            body,
+        )
+        self.assertIn(
+            'yatube_request_cache_total{outcome="hit",view="posts:index"} 1',
+            body,
+        )
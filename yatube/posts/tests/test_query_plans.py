@@ -0,0 +1,84 @@
+import re
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.db.models import Q
+from django.test import TestCase
+from django.utils import timezone
+from unittest import skipUnless
+
+from core.paginator import POSTS_PER_PAGE
+from posts import timeline
+from posts.models import Comment, Group, Post
+
+User = get_user_model()
+
+# Строка плана, в которой таблица читается целиком, без индекса.
+FULL_SCAN = re.compile(
+    r'SCAN (TABLE )?(posts_post|posts_comment)\b(?!.*USING)'
+)
+
+
+@skipUnless(connection.vendor == 'sqlite', 'EXPLAIN QUERY PLAN есть в SQLite')
+class QueryPlanTest(TestCase):
+    """Главные запросы лент и комментариев идут по индексам."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='test-username')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test_slug',
+            description='Тестовое описание',
+        )
+        cls.post = Post.objects.create(
+            author=cls.user,
+            text='Тестовый текст',
+            group=cls.group,
+        )
+
+    def assertUsesIndexes(self, queryset):
+        plan = queryset.explain()
+        self.assertIsNone(FULL_SCAN.search(plan), plan)
+        self.assertIn('INDEX', plan)
+
+    def test_feed_plans(self):
+        now = timezone.now()
+        after_cursor = Q(pub_date__lt=now) | Q(pub_date=now, pk__lt=100)
+        feeds = {
+            'index': Post.objects.for_feed(),
+            'group_posts': Post.objects.for_feed().filter(group=self.group),
+            'profile': self.user.posts.for_feed(),
+            'follow_index': Post.objects.for_feed().filter(
+                author__following__user=self.user
+            ),
+        }
+        for name, queryset in feeds.items():
+            for page in (queryset, queryset.filter(after_cursor)):
+                with self.subTest(view=name):
+                    self.assertUsesIndexes(
+                        page.order_by('-pub_date', '-pk')[:POSTS_PER_PAGE + 1]
+                    )
+
+    def test_timeline_plan(self):
+        # Лента подписок из «входящих» идёт по индексу (owner, pub_date).
+        with self.settings(FOLLOW_TIMELINE_ENABLED=True):
+            posts = timeline.follow_feed(self.user)
+        after = Q(inbox_date__lt=timezone.now()) | Q(
+            inbox_date=timezone.now(), pk__lt=100
+        )
+        for page in (posts, posts.filter(after)):
+            with self.subTest(cursor=page is not posts):
+                plan = page.order_by('-inbox_date', '-pk')[
+                    :POSTS_PER_PAGE + 1
+                ].explain()
+                self.assertIn('timeline_owner_pub_date_idx', plan)
+                # Сортируются разве что посты с одинаковой датой.
+                self.assertNotIn('TEMP B-TREE FOR ORDER BY', plan)
+
+    def test_comment_plan(self):
+        self.assertUsesIndexes(
+            Comment.objects.filter(post=self.post)
+            .order_by('-created', '-pk')[:POSTS_PER_PAGE + 1]
+        )
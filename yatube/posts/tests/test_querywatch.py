@@ -0,0 +1,81 @@
+from django.contrib.auth import get_user_model
+from django.template import Context, Template
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from core import querywatch
+from posts.models import Group, Post
+
+User = get_user_model()
+
+
+class QueryWatchTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.group = Group.objects.create(title='Группа', slug='group')
+        for i in range(3):
+            Post.objects.create(
+                author=User.objects.create_user(username=f'author-{i}'),
+                text=f'Пост {i}',
+            )
+
+    def test_fingerprint(self):
+        """Запросы, которые отличаются только значениями, совпадают."""
+        self.assertEqual(
+            querywatch.fingerprint("SELECT * FROM t WHERE id = 1 AND s = 'a'"),
+            querywatch.fingerprint(
+                "SELECT * FROM t WHERE id = 22 AND s = 'b'"
+            ),
+        )
+        self.assertEqual(
+            querywatch.fingerprint('SELECT * FROM t WHERE id IN (%s, %s)'),
+            querywatch.fingerprint('SELECT * FROM t WHERE id IN (%s)'),
+        )
+
+    def test_duplicates_point_to_template_line(self):
+        """Повторы N+1 при отрисовке указывают на строку шаблона."""
+        template = Template(
+            '{% for post in posts %}\n{{ post.author.username }}'
+            '{% endfor %}'
+        )
+        with querywatch.watch() as watcher:
+            template.render(Context({'posts': Post.objects.all()}))
+        self.assertEqual(watcher.count, 4)
+        duplicate, = watcher.duplicates
+        self.assertEqual(duplicate.count, 3)
+        self.assertIn('auth_user', duplicate.sql)
+        self.assertTrue(all(':2' in where for where in duplicate.origins))
+
+    def test_slow_queries(self):
+        with querywatch.watch(slow_ms=0) as watcher:
+            Group.objects.count()
+        (sql, _, where), = watcher.slow_queries
+        self.assertIn('COUNT', sql)
+        self.assertIn('test_querywatch.py', where)
+
+    def test_budget(self):
+        with querywatch.budget(1):
+            self.client.get(reverse('posts:index'))
+        with self.assertRaisesMessage(AssertionError, 'Бюджет 1'):
+            with querywatch.budget(1):
+                list(Post.objects.all())
+                Group.objects.count()
+
+    @override_settings(QUERY_WATCH=True)
+    def test_middleware_logs_duplicates(self):
+        with self.assertLogs('core.querywatch', 'WARNING') as logs:
+            with self.modify_settings(MIDDLEWARE={
+                'append': 'posts.tests.test_querywatch.repeat_queries',
+            }):
+                self.client.get(reverse('posts:index'))
+        self.assertIn('GET posts:index', logs.output[0])
+        self.assertIn('×2', logs.output[0])
+
+
+def repeat_queries(get_response):
+    """Middleware, которое делает один и тот же запрос дважды."""
+    def middleware(request):
+        Group.objects.filter(slug='a').exists()
+        Group.objects.filter(slug='b').exists()
+        return get_response(request)
+    return middleware
@@ -0,0 +1,110 @@
+import datetime
+import io
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from posts import rankings
+from posts.models import Comment, Group, Post, RankingEntry
+
+User = get_user_model()
+
+
+class RankingsTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(title='Группа', slug='group',
+                                         description='Описание')
+        cls.low = Post.objects.create(author=cls.author, text='Низкая',
+                                      rating=2)
+        cls.high = Post.objects.create(author=cls.author, text='Высокая',
+                                       rating=9, group=cls.group)
+
+    def setUp(self):
+        cache.clear()
+
+    def comment(self, post, **kwargs):
+        return Comment.objects.create(post=post, author=self.author,
+                                      text='Комментарий', **kwargs)
+
+    def test_rating_board(self):
+        self.assertEqual(rankings.top(RankingEntry.RATING),
+                         [self.high, self.low])
+        self.low.rating = 10
+        self.low.save()
+        top = rankings.top(RankingEntry.RATING)
+        self.assertEqual(top, [self.low, self.high])
+        self.assertEqual(top[0].ranking_score, 10)
+
+    def test_comment_board_is_incremental(self):
+        """Комментарии сдвигают счёт, удалённые — возвращают."""
+        self.comment(self.low)
+        self.comment(self.low)
+        comment = self.comment(self.high)
+        top = rankings.top(RankingEntry.COMMENTS)
+        self.assertEqual([(post, post.ranking_score) for post in top],
+                         [(self.low, 2), (self.high, 1)])
+        comment.delete()
+        self.assertEqual(rankings.top(RankingEntry.COMMENTS), [self.low])
+
+    def test_old_comment_delete_keeps_score(self):
+        """Удаление комментария старше окна не уменьшает счёт."""
+        self.comment(self.low)
+        old = self.comment(self.low)
+        Comment.objects.filter(pk=old.pk).update(
+            created=timezone.now() - datetime.timedelta(days=30)
+        )
+        rankings.rebuild()
+        Comment.objects.get(pk=old.pk).delete()
+        top = rankings.top(RankingEntry.COMMENTS)
+        self.assertEqual([(post, post.ranking_score) for post in top],
+                         [(self.low, 1)])
+
+    def test_group_board_follows_post_group(self):
+        self.assertEqual(rankings.top(RankingEntry.RATING, self.group),
+                         [self.high])
+        self.low.group = self.group
+        self.low.save()
+        self.assertEqual(rankings.top(RankingEntry.RATING, self.group),
+                         [self.high, self.low])
+
+    def test_rebuild_drops_old_events(self):
+        """Пересчёт совпадает с досками сигналов и забывает события
+        старше окна."""
+        self.comment(self.high)
+        old = timezone.now() - datetime.timedelta(days=30)
+        Comment.objects.filter(post=self.high).update(created=old)
+        self.comment(self.low)
+        expected = set(RankingEntry.objects.exclude(post=self.high,
+                                                    board='comments')
+                       .values_list('board', 'post_id', 'score'))
+        call_command('rebuild_rankings', stdout=io.StringIO())
+        self.assertEqual(set(RankingEntry.objects.values_list(
+            'board', 'post_id', 'score')), expected)
+
+    def test_views(self):
+        for url in (
+            reverse('posts:rankings', args=['rating']),
+            reverse('posts:rankings', args=['comments']),
+            reverse('posts:group_rankings', args=['group', 'rating']),
+        ):
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+        response = self.client.get(
+            reverse('posts:group_rankings', args=['group', 'rating'])
+        )
+        self.assertEqual(response.context['posts'], [self.high])
+        self.assertEqual(
+            self.client.get(reverse('posts:rankings',
+                                    args=['views'])).status_code, 404
+        )
+
+    def test_rankings_query_budget(self):
+        with self.assertNumQueries(2):
+            self.client.get(reverse('posts:rankings', args=['rating']))
@@ -0,0 +1,76 @@
+import io
+import json
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase
+
+from core import replay
+from posts.models import Comment, Post
+
+User = get_user_model()
+
+
+class ReplayTrafficTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='reader')
+        cls.post = Post.objects.create(author=cls.user, text='Пост')
+
+    def setUp(self):
+        cache.clear()
+
+    def test_read_log(self):
+        """Читаются JSONL и журнал доступа, мусор пропускается."""
+        log = io.StringIO(
+            '{"path": "/", "user": "reader"}\n'
+            'не запрос\n'
+            '127.0.0.1 - anna [10/Oct/2021:13:55:36 +0000] '
+            '"POST /create/ HTTP/1.1" 302 0 "-" "curl"\n'
+        )
+        self.assertEqual(list(replay.read_log(log)), [
+            {'method': 'GET', 'path': '/', 'user': 'reader', 'data': {}},
+            {'method': 'POST', 'path': '/create/', 'user': 'anna',
+             'data': {}},
+        ])
+
+    def test_sessions_and_writes(self):
+        """Запросы пользователя идут с его сессией и токеном CSRF."""
+        from yatube.wsgi import application
+
+        def send(record, headers):
+            return replay.call_wsgi(application, record, headers)
+
+        records = [
+            {'method': 'GET', 'path': '/follow/', 'user': 'reader',
+             'data': {}},
+            {'method': 'GET', 'path': '/follow/', 'user': None, 'data': {}},
+            {'method': 'POST', 'path': f'/posts/{self.post.pk}/comment',
+             'user': 'reader', 'data': {'text': 'Ответ'}},
+        ]
+        results = replay.replay(records, send, replay.Sessions())
+        self.assertEqual([status for _, status, _ in results],
+                         [200, 302, 302])
+        self.assertTrue(Comment.objects.filter(text='Ответ').exists())
+        self.assertEqual(results[0][0], 'posts:follow_index')
+
+    def test_command_summary(self):
+        """Сводка по маршрутам с долей ошибок."""
+        with tempfile.NamedTemporaryFile('w', suffix='.jsonl') as log, \
+                tempfile.NamedTemporaryFile('r', suffix='.json') as output:
+            for path in ('/', '/', '/profile/nobody/', '/create/'):
+                log.write(json.dumps({'path': path}) + '\n')
+            log.write(json.dumps({'method': 'POST', 'path': '/create/'}))
+            log.flush()
+            call_command('replay_traffic', log.name, output=output.name,
+                         stdout=io.StringIO())
+            summary = json.load(output)
+        self.assertEqual(summary['requests'], 4)
+        routes = summary['routes']
+        self.assertEqual(routes['posts:index']['requests'], 2)
+        self.assertEqual(routes['posts:profile']['client_error_rate'], 1)
+        self.assertEqual(routes['posts:post_create']['error_rate'], 0)
+        for key in ('p50_ms', 'p95_ms', 'p99_ms'):
+            self.assertIn(key, routes['posts:index'])
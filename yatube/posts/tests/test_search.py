@@ -0,0 +1,92 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+
+from posts.models import Comment, Post
+
+User = get_user_model()
+
+
+class SearchViewTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='auth')
+        cls.post = Post.objects.create(
+            author=cls.user,
+            text='Кошки любят спать <b>днём</b>',
+        )
+        cls.commented = Post.objects.create(
+            author=cls.user,
+            text='Пост без ключевых слов',
+        )
+        Comment.objects.create(
+            post=cls.commented,
+            author=cls.user,
+            text='А мои кошки спят ночью',
+        )
+
+    def search(self, query, **params):
+        return self.client.get(reverse('posts:search'),
+                               {'q': query, **params})
+
+    def test_finds_posts_and_comments(self):
+        """Находит посты по их тексту и по тексту комментариев."""
+        response = self.search('кошки')
+        self.assertEqual(
+            {post.pk for post in response.context['page_obj']},
+            {self.post.pk, self.commented.pk},
+        )
+
+    def test_snippet_is_highlighted_and_escaped(self):
+        """Совпадения выделены, а разметка из текста экранирована."""
+        response = self.search('днём')
+        self.assertContains(response, '<mark>днём</mark>')
+        self.assertContains(response, '&lt;b&gt;')
+        self.assertNotContains(response, '<b>днём')
+
+    def test_prefix_and_operators(self):
+        """Последнее слово ищется как префикс, операторы FTS5 не мешают."""
+        self.assertEqual(len(self.search('кош').context['page_obj']), 2)
+        response = self.search('кошки" OR NEAR(')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(self.search('').context['page_obj']), 0)
+
+    def test_index_follows_changes(self):
+        """Индекс обновляется вместе с постами и комментариями."""
+        Post.objects.filter(pk=self.post.pk).update(text='Собаки')
+        Comment.objects.filter(post=self.commented).delete()
+        self.assertEqual(len(self.search('кошки').context['page_obj']), 0)
+        self.assertEqual(len(self.search('собаки').context['page_obj']), 1)
+
+    def test_cursor_pagination(self):
+        """Курсор ведёт по страницам без повторов и пропусков."""
+        Post.objects.bulk_create(
+            Post(author=self.user, text=f'Кошки номер {number}')
+            for number in range(15)
+        )
+        first = self.search('кошки').context['page_obj']
+        second = self.search(
+            'кошки', cursor=first.next_cursor
+        ).context['page_obj']
+        self.assertEqual(len(first), 10)
+        self.assertEqual(len(second), 7)
+        self.assertFalse(second.has_next())
+        pks = [post.pk for post in first] + [post.pk for post in second]
+        self.assertEqual(len(set(pks)), 17)
+        ranks = [post.search_rank for post in first]
+        self.assertEqual(ranks, sorted(ranks, reverse=True))
+        back = self.search(
+            'кошки', cursor=second.previous_cursor
+        ).context['page_obj']
+        self.assertEqual([post.pk for post in back],
+                         [post.pk for post in first])
+
+    def test_admin_search_uses_index(self):
+        """Поиск в админке находит посты через полнотекстовый индекс."""
+        admin = User.objects.create_superuser('admin', 'a@a.ru', 'pass')
+        self.client.force_login(admin)
+        response = self.client.get('/admin/posts/post/', {'q': 'кошки'})
+        self.assertEqual(
+            {post.pk for post in response.context['cl'].result_list},
+            {self.post.pk, self.commented.pk},
+        )
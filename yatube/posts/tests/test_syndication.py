@@ -0,0 +1,144 @@
+import json
+from xml.etree import ElementTree
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from core.cache import get_cache
+from posts.models import Group, Post
+
+User = get_user_model()
+
+ATOM = '{http://www.w3.org/2005/Atom}'
+
+
+class SyndicationTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.group = Group.objects.create(title='Коты', slug='cats',
+                                         description='Про котов')
+        cls.leo = User.objects.create_user(username='leo', first_name='Лев',
+                                           last_name='Толстой')
+        cls.anna = User.objects.create_user(username='anna')
+        cls.post = Post.objects.create(author=cls.leo, group=cls.group,
+                                       text='Про <кота>')
+        Post.objects.create(author=cls.anna, text='Без группы')
+
+    def setUp(self):
+        cache.clear()
+        get_cache().clear()
+
+    def json_feed(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response['Content-Type'],
+                         'application/feed+json; charset=utf-8')
+        return json.loads(response.content)
+
+    def test_atom(self):
+        response = self.client.get(reverse('posts:feed', args=['atom']))
+        self.assertEqual(response.status_code, 200)
+        root = ElementTree.fromstring(response.content)
+        entries = root.findall(f'{ATOM}entry')
+        self.assertEqual(len(entries), 2)
+        self.assertEqual(entries[0].find(f'{ATOM}title').text, 'Без группы')
+        self.assertEqual(entries[1].find(f'{ATOM}summary').text,
+                         '<p>Про &lt;кота&gt;</p>')
+        self.assertEqual(
+            entries[1].find(f'{ATOM}author/{ATOM}name').text, 'Лев Толстой'
+        )
+
+    def test_json(self):
+        feed = self.json_feed(reverse('posts:feed', args=['json']))
+        self.assertEqual(feed['version'],
+                         'https://jsonfeed.org/version/1.1')
+        item = feed['items'][1]
+        self.assertEqual(
+            item['url'],
+            'http://testserver' + reverse('posts:post_detail',
+                                          args=[self.post.pk]),
+        )
+        self.assertEqual(item['tags'], ['Коты'])
+
+    def test_group_and_profile(self):
+        feeds = {
+            reverse('posts:group_feed', args=['cats', 'json']): 'Коты',
+            reverse('posts:profile_feed', args=['leo', 'json']):
+                'Записи Лев Толстой',
+        }
+        for url, title in feeds.items():
+            with self.subTest(url=url):
+                feed = self.json_feed(url)
+                self.assertEqual(feed['title'], title)
+                self.assertEqual([item['title'] for item in feed['items']],
+                                 ['Про <кота>'])
+
+    def test_only_new_posts_serialized(self):
+        url = reverse('posts:feed', args=['json'])
+        self.client.get(url)
+        # Ключи ленты; записи старых постов берутся из кэша.
+        with self.assertNumQueries(1):
+            self.client.get(url)
+        Post.objects.create(author=self.anna, text='Новый')
+        # Ключи и дочитка единственного нового поста.
+        with self.assertNumQueries(2):
+            feed = self.json_feed(url)
+        self.assertEqual(len(feed['items']), 3)
+        self.assertEqual(feed['items'][0]['title'], 'Новый')
+
+    def test_edited_post_reserialized(self):
+        url = reverse('posts:feed', args=['json'])
+        self.client.get(url)
+        post = Post.objects.get(pk=self.post.pk)
+        post.text = 'Про пса'
+        post.save()
+        titles = [item['title'] for item in self.json_feed(url)['items']]
+        self.assertIn('Про пса', titles)
+
+    @override_settings(CONDITIONAL_GET=True)
+    def test_conditional_get(self):
+        url = reverse('posts:group_feed', args=['cats', 'atom'])
+        response = self.client.get(url)
+        self.assertIn('public', response['Cache-Control'])
+        with self.assertNumQueries(1):
+            again = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(again.status_code, 304)
+
+    def test_renamed_author_and_group_reserialized(self):
+        url = reverse('posts:feed', args=['json'])
+        self.client.get(url)
+        User.objects.filter(pk=self.leo.pk).update(first_name='Лёва')
+        Group.objects.filter(pk=self.group.pk).update(title='Кошки')
+        item = self.json_feed(url)['items'][1]
+        self.assertEqual(item['authors'][0]['name'], 'Лёва Толстой')
+        self.assertEqual(item['tags'], ['Кошки'])
+
+    @override_settings(CONDITIONAL_GET=True)
+    def test_etag_depends_on_format(self):
+        atom = self.client.get(reverse('posts:feed', args=['atom']))
+        url = reverse('posts:feed', args=['json'])
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=atom['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'],
+                         'application/feed+json; charset=utf-8')
+
+    @override_settings(CONDITIONAL_GET=True)
+    def test_unknown_format_not_stamped(self):
+        url = reverse('posts:group_feed', args=['cats', 'rss'])
+        with self.assertNumQueries(0):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 404)
+        self.assertNotIn('ETag', response)
+
+    def test_unknown(self):
+        urls = [reverse('posts:feed', args=['rss']),
+                reverse('posts:group_feed', args=['nope', 'atom']),
+                reverse('posts:profile_feed', args=['nope', 'json'])]
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertEqual(self.client.get(url).status_code, 404)
+
+    def test_page_links_feeds(self):
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, reverse('posts:feed', args=['atom']))
@@ -0,0 +1,141 @@
+import shutil
+import tempfile
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache, caches
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from sorl.thumbnail import get_thumbnail
+
+from core.cache import get_versions
+from posts import renditions, thumbnails
+from posts.cache import post_namespace, post_namespaces
+from posts.models import Post
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_WORKERS=0)
+class ThumbnailTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.post = Post.objects.create(
+            author=self.user,
+            text='Пост с картинкой',
+            image=SimpleUploadedFile('thumb.gif', SMALL_GIF, 'image/gif'),
+        )
+        self.geometry, self.options = thumbnails.FEED_THUMBNAIL
+
+    def test_feed_shows_original_until_renditions_ready(self):
+        """Пока вариантов нет, лента показывает картинку и строит их."""
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, self.post.image.url)
+        self.assertNotContains(response, '<picture>')
+        self.post.refresh_from_db()
+        self.assertIsNotNone(renditions.parse(self.post.renditions))
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, '<picture>')
+        self.assertContains(response, f'sizes="{renditions.SIZES}"')
+        self.assertNotContains(response, self.post.image.url)
+
+    def test_ready_renditions_invalidate_feeds(self):
+        namespaces = post_namespaces(self.user.pk) + [
+            post_namespace(self.post.pk)
+        ]
+        versions = get_versions(namespaces)
+        thumbnails.generate(self.post.image.name)
+        for before, after in zip(versions, get_versions(namespaces)):
+            self.assertGreater(after, before)
+
+    def test_failed_build_not_requeued(self):
+        """Неудачная сборка не повторяется на каждой странице ленты."""
+        name = self.post.image.name
+        pending = caches[settings.THUMBNAIL_CACHE]
+        pending.delete(thumbnails.PENDING_PREFIX + name)
+        self.addCleanup(pending.delete, thumbnails.PENDING_PREFIX + name)
+        with mock.patch.object(renditions, 'store',
+                               side_effect=OSError) as store, \
+                self.assertLogs('posts.thumbnails', 'ERROR'):
+            thumbnails.enqueue(name)
+            thumbnails.enqueue(name)
+        self.assertEqual(store.call_count, 1)
+        self.assertTrue(pending.get(thumbnails.PENDING_PREFIX + name))
+
+    def test_renditions_in_every_format(self):
+        """Варианты строятся во всех форматах, которые умеет Pillow."""
+        thumbnails.generate(self.post.image.name)
+        self.post.refresh_from_db()
+        built = renditions.parse(self.post.renditions)
+        self.assertEqual(
+            [item['type'] for item in built['formats']],
+            [mime for _, mime, _ in renditions.FORMATS],
+        )
+        self.assertEqual(built['formats'][-1]['type'], 'image/jpeg')
+        for item in built['formats']:
+            for width, name in item['files']:
+                self.assertTrue(default_storage.exists(name))
+
+    def test_new_image_drops_renditions(self):
+        """Смена картинки сбрасывает варианты старой."""
+        thumbnails.generate(self.post.image.name)
+        self.post.refresh_from_db()
+        self.post.image = SimpleUploadedFile('other.gif', SMALL_GIF,
+                                             'image/gif')
+        self.post.save()
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.renditions, '')
+
+    def test_feed_shows_legacy_thumbnail(self):
+        """Миниатюра sorl-thumbnail выводится, пока нет вариантов."""
+        thumbnail = get_thumbnail(self.post.image, self.geometry,
+                                  **self.options)
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, thumbnail.url)
+        self.assertNotContains(response, self.post.image.url)
+
+    def test_page_thumbnails_fetched_in_one_query(self):
+        """Миниатюры страницы дочитываются из базы одним запросом."""
+        posts = [self.post] + [
+            Post.objects.create(
+                author=self.user,
+                text=f'Пост {number}',
+                image=SimpleUploadedFile(f'thumb{number}.gif', SMALL_GIF,
+                                         'image/gif'),
+            )
+            for number in range(3)
+        ]
+        for post in posts:
+            get_thumbnail(post.image, self.geometry, **self.options)
+        caches[settings.THUMBNAIL_CACHE].clear()
+        images = [post.image for post in posts]
+        with self.assertNumQueries(1):
+            ready = thumbnails.get_ready_many(images, self.geometry,
+                                              self.options)
+        self.assertTrue(all(ready.values()))
+        with self.assertNumQueries(0):
+            thumbnails.get_ready_many(images, self.geometry, self.options)
@@ -45,6 +45,7 @@ class PostsURLTests(TestCase):
             f'/group/{PostsURLTests.group.slug}/': HTTPStatus.OK,
             f'/profile/{PostsURLTests.user.username}/': HTTPStatus.OK,
             f'/posts/{PostsURLTests.post.id}/': HTTPStatus.OK,
+            '/search/?q=группа': HTTPStatus.OK,
             '/unexisting_page/': HTTPStatus.NOT_FOUND,
         }
         for adress, code in url_status_codes.items():
@@ -71,6 +72,7 @@ class PostsURLTests(TestCase):
             f'/group/{PostsURLTests.group.slug}/': 'posts/group_list.html',
             f'/profile/{PostsURLTests.user.username}/': 'posts/profile.html',
             f'/posts/{PostsURLTests.post.id}/': 'posts/posts.html',
+            '/search/': 'posts/search.html',
             '/create/': 'posts/create_post.html',
             f'/posts/{PostsURLTests.post.id}/edit/': 'posts/create_post.html'
         }
@@ -1,10 +1,16 @@
 # deals/tests/test_views.py
+from unittest import mock
+
 from django.contrib.auth import get_user_model
-from django.test import Client, TestCase
+from django.test import Client, TestCase, override_settings
 from django.urls import reverse
-from posts.models import Post, Group, Follow
+from posts import timeline, views
+from posts.models import Comment, Post, Group, Follow, TimelineEntry
 from django import forms
 from django.core.cache import cache
+from django.db import IntegrityError
+from core.cache import cache_stats, get_cache
+from core.paginator import POSTS_PER_PAGE
 
 
 User = get_user_model()
@@ -161,6 +167,38 @@ class PaginatorViewsTest(TestCase):
                                    )
         self.assertEqual(len(response.context['page_obj']), 10)
 
+    def test_cursor_pages(self):
+        # Проверка: переход по курсорам вперёд и назад.
+        url = reverse('posts:group_posts', kwargs={'slug': 'test_slug'})
+        first_page = self.client.get(url).context['page_obj']
+        self.assertIsNone(first_page.previous_cursor)
+        second_page = self.client.get(
+            url, {'cursor': first_page.next_cursor}
+        ).context['page_obj']
+        self.assertEqual(second_page.number, 2)
+        self.assertEqual(len(second_page), 3)
+        self.assertFalse(second_page.has_next())
+        self.assertEqual(
+            [post.pk for post in second_page],
+            [post.pk for post in reversed(self.test_posts_list[:3])]
+        )
+        back_page = self.client.get(
+            url, {'cursor': second_page.previous_cursor}
+        ).context['page_obj']
+        self.assertEqual(
+            [post.pk for post in back_page],
+            [post.pk for post in first_page]
+        )
+
+    def test_old_page_links_and_bad_cursor(self):
+        # Проверка: ?page= работает, битый курсор ведёт на первую страницу.
+        url = reverse('posts:group_posts', kwargs={'slug': 'test_slug'})
+        response = self.client.get(url, {'page': 2})
+        self.assertEqual(len(response.context['page_obj']), 3)
+        response = self.client.get(url, {'cursor': 'не-курсор'})
+        self.assertEqual(response.context['page_obj'].number, 1)
+        self.assertEqual(len(response.context['page_obj']), 10)
+
 
 class PostCreateTest(TestCase):
     # Здесь создаются фикстуры: клиент и 13 тестовых записей.
@@ -201,7 +239,6 @@ class PostCreateTest(TestCase):
                 self.assertEqual(post.author, checked_post.author)
                 self.assertEqual(post.group, checked_post.group)
 
-
     def test_post_not_in_wrong_group(self):
         # Проверка: посты не попали в другую группу.
         response_group_2 = self.guest_client.get(reverse('posts:group_posts',
@@ -214,18 +251,21 @@ class PostCreateTest(TestCase):
                 checked_post = Post.objects.get(id=post.id)
                 self.assertNotIn(checked_post, posts)
 
-
-    def test_index_page_cash(self):  
-        index_content = self.authorized_client.get(reverse('posts:index')).content
+    def test_index_page_cash(self):
+        url = reverse('posts:index')
+        index_content = self.authorized_client.get(url).content
+        # update() не шлёт сигналов: фрагмент отдаётся из кэша.
+        Post.objects.update(text='Изменённый текст')
+        index_content_cache = self.authorized_client.get(url).content
+        self.assertEqual(index_content, index_content_cache)
+        # Новый пост сдвигает версию ленты и сразу виден на главной.
         Post.objects.create(
             text='Тестовый текст',
             author=self.user,
         )
-        index_content_cache = self.authorized_client.get(reverse('posts:index')).content
-        self.assertEqual(index_content, index_content_cache)
-        cache.clear()
-        index_content_cache_clear = self.authorized_client.get(reverse('posts:index')).content
-        self.assertNotEqual(index_content, index_content_cache_clear)
+        index_content_new_post = self.authorized_client.get(url).content
+        self.assertNotEqual(index_content, index_content_new_post)
+        self.assertIn('Тестовый текст', index_content_new_post.decode())
 
 
 class FollowTest(TestCase):
@@ -255,3 +295,205 @@ class FollowTest(TestCase):
         # Проверка: контекст view-функции index работает правильно"""
         response = self.authorized_client.get(reverse('posts:follow_index'))
         self.assertEqual(len(response.context['page_obj']), 1)
+
+    def test_follow_race(self):
+        # Подписку уже создал параллельный запрос.
+        with mock.patch.object(Follow.objects, 'get_or_create',
+                               side_effect=IntegrityError):
+            response = self.authorized_client.get(reverse(
+                'posts:profile_follow', kwargs={'username': 'test-following'}
+            ))
+        self.assertRedirects(response, reverse(
+            'posts:profile', kwargs={'username': 'test-following'}
+        ))
+
+    def test_follow_fragment_not_shared(self):
+        # Проверка: фрагмент ленты подписок не достаётся главной
+        # и другому пользователю.
+        get_cache().clear()
+        self.authorized_client.get(reverse('posts:follow_index'))
+        index = self.authorized_client.get(reverse('posts:index'))
+        self.assertContains(index, 'Тестовый пост')
+        other_client = Client()
+        other_client.force_login(
+            User.objects.create_user(username='test-other')
+        )
+        response = other_client.get(reverse('posts:follow_index'))
+        self.assertNotContains(response, 'Тестовый пост')
+        hits = cache_stats()['fragment:follow'].get('hit', 0)
+        self.authorized_client.get(reverse('posts:follow_index'))
+        self.assertEqual(cache_stats()['fragment:follow']['hit'], hits + 1)
+
+
+class FeedQueriesTest(TestCase):
+    # Число запросов на страницу ленты не зависит от числа постов.
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='test-author')
+        cls.reader = User.objects.create_user(username='test-reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test_slug',
+            description='Тестовое описание',
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        for i in range(15):
+            Post.objects.create(
+                text=f'Тестовый текст {i}',
+                author=User.objects.create_user(username=f'author-{i}')
+                if i % 2 else cls.author,
+                group=cls.group,
+            )
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.reader)
+
+    @override_settings(CONDITIONAL_GET=True)
+    def test_feed_query_budget(self):
+        # Группе и профилю нужен ещё ключ для метки условного ответа.
+        feeds = {
+            reverse('posts:index'): 1,
+            reverse('posts:group_posts', kwargs={'slug': 'test_slug'}): 3,
+            reverse('posts:profile',
+                    kwargs={'username': 'test-author'}): 3,
+        }
+        for url, budget in feeds.items():
+            with self.subTest(url=url):
+                with self.assertNumQueries(budget):
+                    self.client.get(url)
+
+    def test_follow_query_budget(self):
+        # Сессия читается из кэша, пользователь и лента — два запроса.
+        with self.assertNumQueries(2):
+            self.authorized_client.get(reverse('posts:follow_index'))
+
+
+@override_settings(FOLLOW_TIMELINE_ENABLED=True)
+class FollowTimelineTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='test-following')
+        cls.reader = User.objects.create_user(username='test-follower')
+        cls.old_post = Post.objects.create(author=cls.author,
+                                           text='Старый пост')
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.reader)
+
+    def get_follow_page(self):
+        response = self.authorized_client.get(reverse('posts:follow_index'))
+        return [post.pk for post in response.context['page_obj']]
+
+    def test_follow_fan_out_and_unfollow(self):
+        self.authorized_client.get(reverse(
+            'posts:profile_follow', kwargs={'username': 'test-following'}
+        ))
+        # Подписка добавляет во «входящие» уже опубликованные посты.
+        self.assertEqual(self.get_follow_page(), [self.old_post.pk])
+        new_post = Post.objects.create(author=self.author, text='Новый пост')
+        self.assertTrue(TimelineEntry.objects.filter(
+            owner=self.reader, post=new_post).exists())
+        self.assertEqual(self.get_follow_page(),
+                         [new_post.pk, self.old_post.pk])
+        self.authorized_client.get(reverse(
+            'posts:profile_unfollow', kwargs={'username': 'test-following'}
+        ))
+        self.assertFalse(self.reader.timeline.exists())
+        self.assertEqual(self.get_follow_page(), [])
+
+    @override_settings(FOLLOW_TIMELINE_FANOUT_LIMIT=0)
+    def test_heavy_author_read_on_demand(self):
+        Follow.objects.create(user=self.reader, author=self.author)
+        new_post = Post.objects.create(author=self.author, text='Новый пост')
+        self.assertFalse(self.reader.timeline.exists())
+        self.assertEqual(self.get_follow_page(),
+                         [new_post.pk, self.old_post.pk])
+
+    @override_settings(FOLLOW_TIMELINE_FANOUT_LIMIT=1)
+    def test_author_drops_below_limit(self):
+        other = User.objects.create_user(username='other-follower')
+        Follow.objects.create(user=self.reader, author=self.author)
+        Follow.objects.create(user=other, author=self.author)
+        new_post = Post.objects.create(author=self.author, text='Новый пост')
+        self.assertFalse(TimelineEntry.objects.filter(post=new_post).exists())
+        Follow.objects.filter(user=other).delete()
+        # Посты, пропущенные при раскладке, досыпаются во «входящие».
+        self.assertTrue(TimelineEntry.objects.filter(
+            owner=self.reader, post=new_post).exists())
+        self.assertEqual(self.get_follow_page(),
+                         [new_post.pk, self.old_post.pk])
+
+    @override_settings(FOLLOW_TIMELINE_FANOUT_LIMIT=2)
+    def test_spread_is_one_query(self):
+        others = [User.objects.create_user(username=f'other-{i}')
+                  for i in range(3)]
+        for user in others:
+            Follow.objects.create(user=user, author=self.author)
+        new_post = Post.objects.create(author=self.author, text='Новый пост')
+        follow = Follow.objects.get(user=others[0])
+        follow.delete()
+        self.assertEqual(
+            set(TimelineEntry.objects.filter(post=new_post)
+                .values_list('owner', flat=True)),
+            {others[1].pk, others[2].pk},
+        )
+        with self.assertNumQueries(1):
+            timeline.spread(self.author)
+
+    def test_cursor_pages(self):
+        Follow.objects.create(user=self.reader, author=self.author)
+        for i in range(POSTS_PER_PAGE):
+            Post.objects.create(author=self.author, text=f'Пост {i}')
+        response = self.authorized_client.get(reverse('posts:follow_index'))
+        next_cursor = response.context['page_obj'].next_cursor
+        response = self.authorized_client.get(
+            reverse('posts:follow_index'), {'cursor': next_cursor}
+        )
+        self.assertEqual([post.pk for post in response.context['page_obj']],
+                         [self.old_post.pk])
+
+
+class CommentPaginationTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='test-commenter')
+        cls.post = Post.objects.create(author=cls.user, text='Пост')
+        Comment.objects.bulk_create(
+            Comment(post=cls.post, author=cls.user, text=f'Комментарий {i}')
+            for i in range(25)
+        )
+
+    def test_post_detail_shows_first_comments(self):
+        """На странице поста только первая порция, новые сверху."""
+        response = self.client.get(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        )
+        comments = response.context['comments']
+        self.assertEqual(len(comments), views.COMMENTS_PER_PAGE)
+        self.assertEqual(comments[0].text, 'Комментарий 24')
+        self.assertContains(response, 'data-more=')
+
+    def test_fragment_returns_next_batch(self):
+        """Фрагмент отдаёт следующую порцию: проверка поста и выборка."""
+        first = self.client.get(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        ).context['comments']
+        url = reverse('posts:post_comments', kwargs={'post_id': self.post.pk})
+        with self.assertNumQueries(2):
+            response = self.client.get(url, {'cursor': first.next_cursor})
+        self.assertNotContains(response, '<html')
+        self.assertEqual(
+            [comment.text for comment in response.context['comments']],
+            [f'Комментарий {i}' for i in range(4, -1, -1)],
+        )
+        self.assertNotContains(response, 'data-more=')
+
+    def test_fragment_of_missing_post(self):
+        url = reverse('posts:post_comments', kwargs={'post_id': 10 ** 6})
+        self.assertEqual(self.client.get(url).status_code, 404)
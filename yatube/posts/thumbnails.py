@@ -0,0 +1,160 @@
+"""Варианты картинок постов готовятся в фоне, а не во время запроса.
+
+После загрузки картинки её варианты (см. ``posts.renditions``) строятся
+в пуле потоков. Пока их нет, шаблоны показывают миниатюру, которую
+sorl-thumbnail построил для поста раньше, или исходную картинку.
+"""
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import SuspiciousFileOperation
+from django.db import connections, transaction
+from sorl.thumbnail import default
+from sorl.thumbnail.conf import defaults as sorl_defaults
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.images import ImageFile, deserialize_image_file
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.kvstores.cached_db_kvstore import (
+    EMPTY_VALUE, KVStore as CachedDBKVStore,
+)
+from sorl.thumbnail.models import KVStore as KVStoreModel
+
+from core import metrics
+
+from . import renditions
+from .cache import invalidate_post
+
+logger = logging.getLogger(__name__)
+
+# Миниатюра, которую шаблоны строили через sorl-thumbnail до вариантов.
+FEED_THUMBNAIL = ('960x339', {'crop': 'center', 'upscale': True})
+
+PENDING_PREFIX = 'thumbnail-pending:'
+PENDING_TIMEOUT = 60 * 5
+
+_executor = None
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.THUMBNAIL_WORKERS,
+            thread_name_prefix='thumbnails',
+        )
+    return _executor
+
+
+def thumbnail_file(image, geometry, options):
+    """Файл миниатюры, который построил бы ``get_thumbnail``.
+
+    Повторяет, как sorl-thumbnail дополняет параметры и выводит имя
+    файла, но не открывает исходную картинку.
+    """
+    backend = default.backend
+    options = dict(options)
+    for key, value in backend.default_options.items():
+        options.setdefault(key, value)
+    for key, attr in backend.extra_options:
+        value = getattr(sorl_settings, attr)
+        if value != getattr(sorl_defaults, attr):
+            options.setdefault(key, value)
+    name = backend._get_thumbnail_filename(ImageFile(image), geometry,
+                                           options)
+    return ImageFile(name, default.storage)
+
+
+def get_ready(image, geometry, options):
+    """Готовая миниатюра из хранилища sorl-thumbnail или ``None``."""
+    return default.kvstore.get(thumbnail_file(image, geometry, options))
+
+
+def get_ready_many(images, geometry, options):
+    """Готовые миниатюры нескольких картинок за один поход в хранилище.
+
+    Возвращает словарь «имя картинки — миниатюра или ``None``». Для
+    хранилища sorl-thumbnail в кэше и базе промахи кэша дочитываются из
+    базы одним запросом и тут же кладутся в кэш.
+    """
+    files = {image.name: thumbnail_file(image, geometry, options)
+             for image in images}
+    kvstore = default.kvstore
+    if not isinstance(kvstore, CachedDBKVStore):
+        return {name: kvstore.get(file) for name, file in files.items()}
+    keys = {add_prefix(file.key): name for name, file in files.items()}
+    values = kvstore.cache.get_many(list(keys))
+    missing = [key for key in keys if key not in values]
+    if missing:
+        stored = dict(
+            KVStoreModel.objects.filter(key__in=missing)
+            .values_list('key', 'value')
+        )
+        fetched = {key: stored.get(key, EMPTY_VALUE) for key in missing}
+        kvstore.cache.set_many(fetched, sorl_settings.THUMBNAIL_CACHE_TIMEOUT)
+        values.update(fetched)
+    return {
+        name: (None if values[key] in (EMPTY_VALUE, '')
+               else deserialize_image_file(values[key]))
+        for key, name in keys.items()
+    }
+
+
+def generate(name):
+    """Строит варианты картинки ``name`` и записывает их в посты."""
+    try:
+        with metrics.timer('thumbnails'):
+            affected = renditions.store(name)
+        # Готовые варианты меняют разметку лент и страниц этих постов.
+        for post_id, author_id, group_id in affected:
+            invalidate_post(author_id, group_id, post_id=post_id)
+    except Exception:
+        # Отметка остаётся до PENDING_TIMEOUT: иначе каждая лента,
+        # не нашедшая вариантов, снова ставила бы битую картинку в очередь.
+        logger.exception('Не удалось построить варианты для %s', name)
+    else:
+        caches[settings.THUMBNAIL_CACHE].delete(PENDING_PREFIX + name)
+
+
+def _run(names):
+    try:
+        for name in names:
+            generate(name)
+    finally:
+        # Поток пула открывает собственные соединения с базой.
+        connections.close_all()
+
+
+def _exists(name):
+    try:
+        return default.storage.exists(name)
+    except (SuspiciousFileOperation, OSError):
+        # Путь вне хранилища: такую картинку sorl-thumbnail не откроет.
+        return False
+
+
+def enqueue_many(names):
+    """Ставит в очередь одной задачей картинки, которые никто не строит."""
+    pending = caches[settings.THUMBNAIL_CACHE]
+    names = [
+        name for name in dict.fromkeys(names)
+        if name and _exists(name)
+        and pending.add(PENDING_PREFIX + name, True, PENDING_TIMEOUT)
+    ]
+    if not names:
+        return
+    if settings.THUMBNAIL_WORKERS:
+        get_executor().submit(_run, names)
+    else:
+        for name in names:
+            generate(name)
+
+
+def enqueue(name):
+    enqueue_many([name])
+
+
+def enqueue_on_commit(name):
+    """Очередь после фиксации транзакции, когда файл и пост сохранены."""
+    transaction.on_commit(lambda: enqueue(name))
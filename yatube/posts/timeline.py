@@ -0,0 +1,144 @@
+"""Лента подписок, разложенная по «входящим» подписчиков.
+
+Новый пост автора сразу записывается в ``TimelineEntry`` каждого его
+подписчика (fan-out on write), а лента подписок читает готовый список
+постов из своих «входящих» по индексу ``(owner, pub_date)``. Авторам,
+у которых подписчиков больше ``FOLLOW_TIMELINE_FANOUT_LIMIT``, посты не
+раскладываются: они подмешиваются в ленту при чтении (fan-out on read).
+Когда такой автор теряет подписчиков и опускается до предела, его
+последние посты раскладываются по «входящим» оставшихся подписчиков
+одним запросом (``spread``).
+"""
+from django.conf import settings
+from django.db import connections, router
+from django.db.models import Count, F, OuterRef, Q, Subquery
+
+from .models import Follow, Post, TimelineEntry
+
+INBOX_FIELDS = ('inbox_date', 'pk')
+
+
+def is_enabled():
+    return settings.FOLLOW_TIMELINE_ENABLED
+
+
+def fan_out(post):
+    """Раскладывает новый пост по «входящим» подписчиков автора."""
+    limit = settings.FOLLOW_TIMELINE_FANOUT_LIMIT
+    followers = list(
+        Follow.objects.filter(author_id=post.author_id)
+        .values_list('user_id', flat=True)[:limit + 1]
+    )
+    if len(followers) > limit:
+        return
+    TimelineEntry.objects.bulk_create(
+        [TimelineEntry(owner_id=user_id, post=post, pub_date=post.pub_date)
+         for user_id in followers],
+        ignore_conflicts=True,
+    )
+
+
+def backfill(user, author):
+    """Добавляет в ленту подписчика последние посты нового автора."""
+    if is_heavy(author):
+        return
+    posts = (
+        Post.objects.filter(author=author)
+        .order_by('-pub_date')
+        .values_list('pk', 'pub_date')[:settings.FOLLOW_TIMELINE_BACKFILL]
+    )
+    TimelineEntry.objects.bulk_create(
+        [TimelineEntry(owner=user, post_id=pk, pub_date=pub_date)
+         for pk, pub_date in posts],
+        ignore_conflicts=True,
+    )
+
+
+def prune(user, author):
+    """Убирает из ленты посты автора, от которого подписчик отписался."""
+    TimelineEntry.objects.filter(owner=user, post__author=author).delete()
+    limit = settings.FOLLOW_TIMELINE_FANOUT_LIMIT
+    if Follow.objects.filter(author=author).count() == limit:
+        # Автор только что перестал быть «тяжёлым»: его посты больше не
+        # подмешиваются при чтении и должны лежать во «входящих».
+        spread(author)
+
+
+def spread(author):
+    """Раскладывает последние посты автора по «входящим» всех его
+    подписчиков одним ``INSERT … SELECT``.
+
+    Так переход автора к раскладке при записи стоит один запрос, а не
+    выборку и вставку на каждого из ``FOLLOW_TIMELINE_FANOUT_LIMIT``
+    подписчиков внутри запроса «Отписаться».
+    """
+    entry = TimelineEntry._meta
+    follow, post = Follow._meta.db_table, Post._meta.db_table
+    sql = f'''
+        INSERT INTO {entry.db_table} (owner_id, post_id, pub_date)
+        SELECT f.user_id, p.id, p.pub_date
+        FROM {follow} f CROSS JOIN (
+            SELECT id, pub_date FROM {post}
+            WHERE author_id = %s
+            ORDER BY pub_date DESC
+            LIMIT %s
+        ) p
+        WHERE f.author_id = %s
+        ON CONFLICT (owner_id, post_id) DO NOTHING
+    '''
+    params = [author.pk, settings.FOLLOW_TIMELINE_BACKFILL, author.pk]
+    with connections[router.db_for_write(TimelineEntry)].cursor() as cursor:
+        cursor.execute(sql, params)
+
+
+def is_heavy(author):
+    limit = settings.FOLLOW_TIMELINE_FANOUT_LIMIT
+    return Follow.objects.filter(author=author)[limit:limit + 1].exists()
+
+
+def heavy_authors(user):
+    """Авторы из подписок ``user``, чьи посты читаются без «входящих»."""
+    followers = (
+        Follow.objects.filter(author=OuterRef('author'))
+        .order_by()
+        .values('author')
+        .annotate(count=Count('pk'))
+        .values('count')
+    )
+    return (
+        Follow.objects.filter(user=user)
+        .annotate(followers=Subquery(followers))
+        .filter(followers__gt=settings.FOLLOW_TIMELINE_FANOUT_LIMIT)
+        .values_list('author', flat=True)
+    )
+
+
+def follow_feed(user):
+    """Посты для ленты подписок ``user``."""
+    posts = Post.objects.for_feed()
+    if not is_enabled():
+        return posts.filter(author__following__user=user)
+    heavy = list(heavy_authors(user))
+    if heavy:
+        inbox = TimelineEntry.objects.filter(owner=user).values('post')
+        return posts.filter(Q(pk__in=inbox) | Q(author__in=heavy))
+    # Страница читается из «входящих» по дате записи в них, посты
+    # присоединяются к ней. Листать такую ленту — по ``INBOX_FIELDS``.
+    return (
+        posts.filter(timeline_entries__owner=user)
+        .annotate(inbox_date=F('timeline_entries__pub_date'))
+    )
+
+
+def feed_fields(posts):
+    """Ключ постраничной навигации для выборки ``follow_feed``."""
+    if 'inbox_date' in posts.query.annotations:
+        return INBOX_FIELDS
+    return ('pub_date', 'pk')
+
+
+def rebuild(user):
+    """Собирает «входящие» ``user`` заново по его подпискам."""
+    TimelineEntry.objects.filter(owner=user).delete()
+    for follow in Follow.objects.filter(user=user).select_related('author'):
+        backfill(user, follow.author)
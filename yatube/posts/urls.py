@@ -6,13 +6,26 @@ app_name = 'posts'
 
 urlpatterns = [
     path("", views.index, name="index"),
+    path("search/", views.search, name="search"),
+    path("feed/<slug:feed_format>/", views.feed, name="feed"),
+    path("export/", views.export_content, name="export_content"),
+    path("groups/", views.groups, name="groups"),
     path("group/<slug:slug>/", views.group_posts, name="group_posts"),
+    path("group/<slug:slug>/feed/<slug:feed_format>/", views.group_feed,
+         name="group_feed"),
+    path("top/<slug:board>/", views.rankings, name="rankings"),
+    path("group/<slug:slug>/top/<slug:board>/", views.rankings,
+         name="group_rankings"),
     path('create/', views.post_create, name='post_create'),
     path('posts/<int:post_id>/edit/', views.post_edit,
          name='post_edit'),
     path('profile/<str:username>/', views.profile, name='profile'),
+    path('profile/<str:username>/feed/<slug:feed_format>/',
+         views.profile_feed, name='profile_feed'),
     path('posts/<int:post_id>/', views.post_detail, name='post_detail'),
     path('posts/<int:post_id>/comment', views.add_comment, name='add_comment'),
+    path('posts/<int:post_id>/comments/', views.post_comments,
+         name='post_comments'),
     path('follow/', views.follow_index, name='follow_index'),    
     path('profile/<str:username>/follow/',
         views.profile_follow, 
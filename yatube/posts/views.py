@@ -1,40 +1,126 @@
+from functools import wraps
+
 from django.shortcuts import render, get_object_or_404, redirect
 from django.urls import reverse
-from .models import Post, Group, User, Follow
-from django.core.paginator import Paginator
+from .models import Comment, Post, Group, User, Follow
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.decorators import login_required
-from django.views.decorators.cache import cache_page
+from django.db import IntegrityError
+from django.http import Http404, HttpResponseBadRequest, StreamingHttpResponse
 from posts.forms import PostForm, CommentForm
+from core.db_router import read_replica
+from core.paginator import POSTS_PER_PAGE, paginate
+from posts import counters, directory, exporter, timeline
+from posts import conditional, syndication
+from posts import rankings as post_rankings, search as post_search
+
+COMMENTS_PER_PAGE = 20
 
 
-@cache_page(60 * 15)
+@read_replica
+@conditional.stamped(conditional.index_namespaces)
 def index(request):
-    post_list = Post.objects.all()
-    paginator = Paginator(post_list, 10)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
+    post_list = Post.objects.for_feed()
+    page = paginate(request, post_list)
     return render(request, 'posts/index.html', {'page_obj': page, })
 
 
+@read_replica
+def search(request):
+    query = request.GET.get('q', '').strip()
+    page = post_search.search(request, query, POSTS_PER_PAGE)
+    return render(request, 'posts/search.html', {'query': query,
+                                                 'page_obj': page,
+                                                 })
+
+
+@read_replica
+@conditional.stamped(conditional.group_namespaces)
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
-    posts = group.posts.all()
-    paginator = Paginator(posts, 10)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
+    posts = group.posts.for_feed()
+    page = paginate(request, posts)
     return render(request, "posts/group_list.html", {"group": group,
                                                "page_obj": page,
                                                }
                   )
 
 
-def profile(request, username):
+def _known_format(view):
+    """404 на неизвестный формат ленты — ещё до условного GET."""
+    @wraps(view)
+    def wrapper(request, *args, feed_format, **kwargs):
+        if feed_format not in syndication.FORMATS:
+            raise Http404
+        return view(request, *args, feed_format=feed_format, **kwargs)
+    return wrapper
+
+
+@read_replica
+@_known_format
+@conditional.stamped(conditional.index_namespaces, private=False)
+def feed(request, feed_format):
+    """Лента Atom или JSON Feed последних постов сайта."""
+    return syndication.render(
+        request, feed_format, 'Последние обновления на сайте',
+        reverse('posts:index'), Post.objects.for_feed(),
+    )
+
+
+@read_replica
+@_known_format
+@conditional.stamped(conditional.group_namespaces, private=False)
+def group_feed(request, slug, feed_format):
+    group = get_object_or_404(Group, slug=slug)
+    return syndication.render(
+        request, feed_format, group.title,
+        reverse('posts:group_posts', args=[slug]), group.posts.for_feed(),
+        group.description,
+    )
+
+
+@read_replica
+@_known_format
+@conditional.stamped(conditional.profile_namespaces, private=False)
+def profile_feed(request, username, feed_format):
     author = get_object_or_404(User, username=username)
-    posts = author.posts.all()
-    posts_number = posts.count()
-    paginator = Paginator(posts, 10)
-    page_num = request.GET.get('page')
-    page_obj = paginator.get_page(page_num)
+    return syndication.render(
+        request, feed_format,
+        f'Записи {author.get_full_name() or author.username}',
+        reverse('posts:profile', args=[username]), author.posts.for_feed(),
+    )
+
+
+@read_replica
+def groups(request):
+    """Каталог групп со статистикой."""
+    return render(request, 'posts/groups.html',
+                  {'groups': directory.groups()})
+
+
+@read_replica
+def rankings(request, board, slug=None):
+    """Доска лидеров за неделю: общая или группы ``slug``."""
+    if board not in post_rankings.BOARDS:
+        raise Http404
+    group = get_object_or_404(Group, slug=slug) if slug else None
+    return render(request, 'posts/rankings.html', {
+        'board': board,
+        'title': post_rankings.BOARDS[board],
+        'boards': post_rankings.BOARDS.items(),
+        'group': group,
+        'posts': post_rankings.top(board, group),
+    })
+
+
+@read_replica
+@conditional.stamped(conditional.profile_namespaces)
+def profile(request, username):
+    author = get_object_or_404(User.objects.select_related('counters'),
+                               username=username)
+    posts = author.posts.for_feed()
+    author_counters = counters.for_user(author)
+    page_obj = paginate(request, posts)
     full_name = author.get_full_name()
     following = None
     if request.user.is_authenticated:
@@ -43,21 +129,34 @@ def profile(request, username):
                "username": username,
                "full_name": full_name,
                'page_obj': page_obj,
-               "posts_number": posts_number,
+               "posts_number": author_counters.posts,
+               'counters': author_counters,
                 'following': following,
                }
     return render(request, 'posts/profile.html', context)
 
 
+def paginate_comments(request, post_id):
+    """Страница комментариев поста, сначала новые."""
+    comments = Comment.objects.filter(post_id=post_id).select_related('author')
+    return paginate(request, comments, COMMENTS_PER_PAGE,
+                    fields=('created', 'pk'))
+
+
+@read_replica
+@conditional.stamped(conditional.post_namespaces)
 def post_detail(request, post_id):
-    post = get_object_or_404(Post, pk=post_id)
-    all_posts = Post.objects.filter(author=post.author)
-    post_count = all_posts.count()
-    comments = post.comments.all()
+    post = get_object_or_404(
+        Post.objects.select_related('author__counters'), pk=post_id
+    )
+    author_counters = counters.for_user(post.author)
+    comments = paginate_comments(request, post_id)
     form = CommentForm()
     context = {
         'post': post,
-        'post_count': post_count,
+        'post_id': post_id,
+        'post_count': author_counters.posts,
+        'counters': author_counters,
         'comments': comments,
         'form': form,
     }
@@ -66,6 +165,18 @@ def post_detail(request, post_id):
 
 
 
+@read_replica
+def post_comments(request, post_id):
+    """Следующая порция комментариев для подгрузки на странице поста."""
+    if not Post.objects.filter(pk=post_id).exists():
+        raise Http404
+    comments = paginate_comments(request, post_id)
+    return render(request, 'includes/comment_list.html', {
+        'comments': comments,
+        'post_id': post_id,
+    })
+
+
 @login_required
 def post_create(request):
     if request.method == 'POST':
@@ -91,11 +202,17 @@ def post_create(request):
 def post_edit(request, post_id):
     post_to_edit = get_object_or_404(Post, pk=post_id)
     if request.user == post_to_edit.author:
-        form = PostForm(request.POST or None, instance=post_to_edit)
+        form = PostForm(request.POST or None, files=request.FILES or None,
+                        instance=post_to_edit)
         if form.is_valid():
             post = form.save(commit=False)
             post.author = request.user
-            form.save()
+            # Только поля формы: счётчик комментариев и варианты картинки
+            # могли измениться, пока шла правка, и старые их затёрли бы.
+            fields = list(form.fields)
+            if 'image' in form.changed_data:
+                fields.append('renditions')
+            post.save(update_fields=fields)
             return redirect('posts:post_detail', post_id)
         return render(request, 'posts/create_post.html',
                       {"form": form, 'is_edit': True})
@@ -115,12 +232,36 @@ def add_comment(request, post_id):
     return redirect('posts:post_detail', post_id=post_id) 
 
 
+@staff_member_required
+def export_content(request):
+    """Потоковая выгрузка для аналитики: ?kind=post&format=csv&since=..."""
+    kinds = request.GET.getlist('kind') or list(exporter.KINDS)
+    format_ = request.GET.get('format', 'jsonl')
+    if set(kinds) - set(exporter.KINDS) or format_ not in exporter.FORMATS:
+        return HttpResponseBadRequest('Неизвестный тип или формат.')
+    since = None
+    if request.GET.get('since'):
+        try:
+            since = exporter.parse_since(request.GET['since'])
+        except ValueError as error:
+            return HttpResponseBadRequest(str(error))
+    response = StreamingHttpResponse(
+        exporter.lines(kinds, format_, since=since),
+        content_type=('text/csv' if format_ == 'csv'
+                      else 'application/x-ndjson') + '; charset=utf-8',
+    )
+    response['Content-Disposition'] = (
+        f'attachment; filename="yatube-export.{format_}"'
+    )
+    return response
+
+
 @login_required
+@read_replica
 def follow_index(request):
-    post_list = Post.objects.filter(author__following__user=request.user)
-    paginator = Paginator(post_list, 10)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    post_list = timeline.follow_feed(request.user)
+    page_obj = paginate(request, post_list,
+                        fields=timeline.feed_fields(post_list))
     context = {
         'page_obj': page_obj,
     }
@@ -131,7 +272,11 @@ def profile_follow(request, username):
     author = get_object_or_404(User, username=username)
     user = request.user
     if user != author:
-        Follow.objects.get_or_create(user=user, author=author)
+        try:
+            Follow.objects.get_or_create(user=user, author=author)
+        except IntegrityError:
+            # Параллельный запрос успел подписать первым.
+            pass
     return redirect('posts:profile', username=author.username)
 
 @login_required
@@ -12,6 +12,9 @@ https://docs.djangoproject.com/en/2.2/ref/settings/
 
 import os
 
+from core.cache_config import build_caches
+from core.db_config import build_databases
+
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
@@ -36,7 +39,7 @@ ALLOWED_HOSTS = [
 # Application definition
 
 INSTALLED_APPS = [
-    'posts',
+    'posts.apps.PostsConfig',
     'about',
     'users.apps.UsersConfig',
     'core',
@@ -50,6 +53,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.MetricsMiddleware',
+    'core.middleware.QueryWatchMiddleware',
+    'core.db_router.ReplicaPinMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -68,7 +74,8 @@ STATIC_URL = "/static/"
 # задаём адрес директории, куда командой *collectstatic* будет собрана вся статика
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates, который замеряет отрисовку для core.metrics.
+        'BACKEND': 'core.template_backend.TimedDjangoTemplates',
         'DIRS': [TEMPLATES_DIR],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -89,12 +96,20 @@ WSGI_APPLICATION = 'yatube.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/2.2/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
-    }
-}
+# Профиль SQLite: default — настройки по умолчанию, production — WAL,
+# прагмы, постоянные соединения и BEGIN IMMEDIATE (core.db_config).
+DATABASE_PROFILE = os.environ.get('YATUBE_DB_PROFILE', 'default')
+# Файлы реплик через запятую; локальные копии обновляет sync_replicas.
+DATABASES = build_databases(
+    DATABASE_PROFILE, os.path.join(BASE_DIR, 'db.sqlite3'),
+    [path for path in os.environ.get('YATUBE_DB_REPLICAS', '').split(',')
+     if path],
+)
+# Ленты и страницы постов читают реплики (core.db_router).
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != 'default']
+DATABASE_ROUTERS = ['core.db_router.ReplicaRouter']
+# Сколько секунд после записи посетитель читает основную базу.
+REPLICA_PIN_SECONDS = 5
 
 
 # Password validation
@@ -149,8 +164,59 @@ CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
-CACHES = {
-    'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-    }
-}
\ No newline at end of file
+# Повторяющиеся и медленные запросы страниц в журнал core.querywatch
+# (core.middleware.QueryWatchMiddleware). Для отладки и стенда: обход
+# стека у каждого повтора замедляет страницы.
+QUERY_WATCH = os.environ.get('YATUBE_QUERY_WATCH') == '1'
+QUERY_WATCH_SLOW_MS = 100
+
+# Бэкенд кэша: locmem (свой у каждого процесса), file или sqlite
+# (общие для процессов на машине), redis (нужен django-redis).
+CACHE_BACKEND = os.environ.get('YATUBE_CACHE_BACKEND', 'locmem')
+# Каталог для file и sqlite, адрес сервера для redis.
+CACHE_LOCATION = os.environ.get(
+    'YATUBE_CACHE_LOCATION', os.path.join(BASE_DIR, 'cache')
+)
+# Срок жизни записей и наибольшее их число для каждого псевдонима.
+CACHE_POLICIES = {
+    'default': {'TIMEOUT': 60 * 5, 'MAX_ENTRIES': 1000},
+    # Фрагменты лент и версии, которые их сбрасывают.
+    'fragments': {'TIMEOUT': 60 * 60, 'MAX_ENTRIES': 10000},
+    'sessions': {'TIMEOUT': 60 * 60 * 24 * 14, 'MAX_ENTRIES': 10000},
+    # Сведения sorl-thumbnail о готовых миниатюрах.
+    'thumbnails': {'TIMEOUT': 60 * 60 * 24 * 30, 'MAX_ENTRIES': 50000},
+}
+CACHES = build_caches(CACHE_BACKEND, CACHE_LOCATION, CACHE_POLICIES)
+# Условный GET (posts.conditional) сверяет версии из кэша фрагментов:
+# с locmem процессы не видят чужих сдвигов и отвечали бы 304 на старое.
+CONDITIONAL_GET = CACHE_BACKEND != 'locmem'
+
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+SESSION_CACHE_ALIAS = 'sessions'
+
+THUMBNAIL_CACHE = 'thumbnails'
+THUMBNAIL_CACHE_TIMEOUT = CACHE_POLICIES['thumbnails']['TIMEOUT']
+# Потоки, в которых строятся миниатюры загруженных картинок;
+# 0 — строить сразу после сохранения поста.
+THUMBNAIL_WORKERS = 2
+
+# Фрагменты лент сбрасываются сигналами при изменении постов
+# и комментариев, срок жизни лишь ограничивает забытые ключи.
+FEED_CACHE_ALIAS = 'fragments'
+FEED_CACHE_TIMEOUT = 60 * 15
+
+# Лента подписок из заранее разложенных «входящих» (posts.timeline).
+# Выключена — лента собирается соединением Follow и Post при каждом запросе.
+FOLLOW_TIMELINE_ENABLED = False
+# Посты автора с большим числом подписчиков не раскладываются по лентам,
+# а подмешиваются при чтении.
+FOLLOW_TIMELINE_FANOUT_LIMIT = 1000
+# Сколько последних постов автора попадает в ленту при подписке.
+FOLLOW_TIMELINE_BACKFILL = 200
+
+# Доски лидеров (posts.rankings): окно в днях и длина доски.
+RANKING_WINDOW_DAYS = 7
+RANKING_SIZE = 20
+
+# Число постов в лентах Atom и JSON Feed.
+SYNDICATION_SIZE = 20
@@ -2,6 +2,7 @@ from django.conf import settings
 from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import include, path
+from core import views as core_views
 from posts import views
 
 urlpatterns = [
@@ -10,6 +11,7 @@ urlpatterns = [
     path("", include("posts.urls", namespace='posts')),
     path('create/', views.post_create, name='post_create'),
     path("admin/", admin.site.urls),
+    path('metrics/', core_views.metrics, name='metrics'),
     path('about/', include('about.urls', namespace='about')),
 ]
 